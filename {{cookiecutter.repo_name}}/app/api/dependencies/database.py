@@ -0,0 +1,27 @@
+"""Database sessions of the API routes."""
+from collections.abc import AsyncIterator
+from typing import Annotated
+
+from fastapi import Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db import session_manager
+
+# methods which must not change anything, so they can be served by a read replica
+READONLY_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+async def get_session(request: Request) -> AsyncIterator[AsyncSession]:
+    """Yield a session on a read replica for read-only methods, on the primary otherwise."""
+    async with session_manager.session(readonly=request.method in READONLY_METHODS) as session:
+        yield session
+
+
+async def get_primary_session() -> AsyncIterator[AsyncSession]:
+    """Yield a session on the primary, for reads which must see the latest writes."""
+    async with session_manager.session() as session:
+        yield session
+
+
+Session = Annotated[AsyncSession, Depends(get_session)]
+PrimarySession = Annotated[AsyncSession, Depends(get_primary_session)]
@@ -5,3 +5,8 @@ from pathlib import Path
 BASE_DIR: Path = Path(__file__).parent
 # Celery queue
 CELERY_QUEUE = "sample_queue"
+# queues of latency-sensitive and of bulk work, consumed by dedicated pools in production
+CELERY_REALTIME_QUEUE = "realtime_queue"
+CELERY_BULK_QUEUE = "bulk_queue"
+# separator of the queue name and the priority step in the Redis lists of prioritized messages
+CELERY_PRIORITY_SEPARATOR = ":"
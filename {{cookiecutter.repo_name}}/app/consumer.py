@@ -1,13 +1,20 @@
 """Consumer kafka command."""
 import asyncio
 import logging
+import multiprocessing
 import os
 import signal
+import sys
+import time
+from multiprocessing.connection import wait
+from multiprocessing.process import BaseProcess
 
 from ddtrace import tracer
+from prometheus_client import start_http_server
 
 from app.core.config import KafkaSettings, get_settings
 from app.services.kafka import KafkaService
+from app.services.kafka.producer import kafka_producer
 from app.utils.sentry import capture_exception
 from app.utils.structlog import configure_logging
 from app.utils.trace import path_kafka_trace
@@ -15,13 +22,35 @@ from app.utils.trace import path_kafka_trace
 settings: KafkaSettings = get_settings("kafka")
 logger = logging.getLogger("aiokafka.consumer.group_coordinator")
 
+# extra time given to commit offsets and leave the group once the lanes are drained
+DRAIN_GRACE_S = 5
+# a child running at least this long is considered healthy again and restarts without backoff
+HEALTHY_UPTIME_S = 60
+# signals the supervisor forwards to its children
+SHUTDOWN_SIGNALS = {signal.SIGINT, signal.SIGTERM}
 
-async def main() -> None:
-    """Kafka service."""
+
+async def main(slot: int = 0) -> bool:
+    """
+    Kafka service.
+
+    Parameters
+    ----------
+    slot : int, default 0
+        index of the consumer process, offsetting its metrics port and suffixing its static member id
+
+    Returns
+    -------
+    bool
+        True when the consumer stopped because of a shutdown signal
+    """
     with tracer.trace("kafka.consume", service=settings.dd_service):
         path_kafka_trace(settings.environment)
+        if settings.kafka_metrics_enabled:
+            start_http_server(settings.kafka_metrics_port + slot)
         shutdown_event = asyncio.Event()
-        kafka_service = KafkaService(kafka_settings=settings)
+        kafka_service = KafkaService(kafka_settings=settings, instance_index=slot)
+        await kafka_producer.start()
 
         loop = asyncio.get_event_loop()
 
@@ -30,18 +59,19 @@ async def main() -> None:
 
         await asyncio.wait([signal_handler_task, consumer_task], return_when=asyncio.FIRST_COMPLETED)
 
-        # Cancel the consumer task if it's still running
-        if not consumer_task.done():
-            consumer_task.cancel()
-            try:
-                await consumer_task  # Ensure the task has a chance to clean up
-            except asyncio.CancelledError:
-                logger.info("Consumer task cancelled during shutdown.")
+        # the consumer stops fetching once the event is set, then drains and commits within its deadline
+        try:
+            await asyncio.wait_for(consumer_task, settings.kafka_drain_timeout_ms / 1000 + DRAIN_GRACE_S)
+        except TimeoutError:
+            logger.exception("Consumer did not stop within its drain deadline, it was cancelled.")
 
         # Cancel the signal handler task if it's still running
         if not signal_handler_task.done():
             signal_handler_task.cancel()
 
+        await kafka_producer.stop()
+        return shutdown_event.is_set()
+
 
 async def shutdown_signal_handler(shutdown_event):
     """Shutdown signal handler."""
@@ -53,13 +83,144 @@ async def shutdown_signal_handler(shutdown_event):
     logger.info("Shutdown signal received.")
 
 
+def run_consumer(slot: int = 0) -> None:
+    """Run a consumer until it is shut down, exiting with a non-zero code when it stopped on its own."""
+    try:
+        stopped_by_signal = asyncio.run(main(slot))
+    except Exception as ex:
+        logger.exception("Failed to start consumer")
+        capture_exception(ex)
+        sys.exit(1)
+
+    if not stopped_by_signal:
+        sys.exit(1)
+
+
+def run_supervised_consumer(slot: int) -> None:
+    """
+    Run a consumer in a child process of the supervisor.
+
+    The child inherits the signal handler forwarding signals to the children, so it is reset first. Shutdown
+    signals are blocked while forking, one received before the consumer installs its own handler stops the
+    child right away, there is nothing to drain yet.
+    """
+    for sig in SHUTDOWN_SIGNALS:
+        signal.signal(sig, signal.SIG_DFL)
+    signal.pthread_sigmask(signal.SIG_UNBLOCK, SHUTDOWN_SIGNALS)
+    run_consumer(slot)
+
+
+def get_process_count() -> int:
+    """
+    Return the number of consumer processes to start.
+
+    Returns
+    -------
+    int
+        `KAFKA_CONSUMER_PROCESSES`, or min(CPU count, partition count) when it is 0
+    """
+    if settings.kafka_consumer_processes > 0:
+        return settings.kafka_consumer_processes
+
+    cpu_count = os.cpu_count() or 1
+    try:
+        partition_count = asyncio.run(KafkaService(kafka_settings=settings).count_partitions())
+    except Exception:
+        logger.exception("Failed to count partitions, starting one consumer per CPU")
+        return cpu_count
+
+    # extra members of the group would stay idle without partitions
+    return max(min(cpu_count, partition_count), 1)
+
+
+class ConsumerSupervisor:
+    """
+    Run consumers of the same group in child processes.
+
+    Shutdown signals are forwarded to the children so that they drain gracefully, and children which stop on
+    their own are restarted with an exponential backoff.
+    """
+
+    def __init__(self, processes: int, max_backoff: float = 60) -> None:
+        self.processes = processes
+        self.max_backoff = max_backoff
+        self.children: dict[int, BaseProcess] = {}
+        self._started_at: dict[int, float] = {}
+        self._failures: dict[int, int] = {}
+        self._restart_at: dict[int, float] = {}
+        self._stopping = False
+        self._context = multiprocessing.get_context("fork")
+
+    def _spawn(self, slot: int) -> None:
+        """Start the consumer process of a slot."""
+        process = self._context.Process(
+            target=run_supervised_consumer,
+            args=(slot,),
+            name=f"kafka-consumer-{slot}",
+        )
+        # signals received while forking are handled by the supervisor once the child is known
+        signal.pthread_sigmask(signal.SIG_BLOCK, SHUTDOWN_SIGNALS)
+        try:
+            process.start()
+            self.children[slot] = process
+        finally:
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, SHUTDOWN_SIGNALS)
+        self._started_at[slot] = time.monotonic()
+        logger.info("Started consumer %s (pid %s)", slot, process.pid)
+
+    def _forward_signal(self, signum, _) -> None:
+        """Stop supervising and forward the signal to the children."""
+        self._stopping = True
+        self._restart_at.clear()
+        for process in self.children.values():
+            if process.is_alive() and process.pid:
+                os.kill(process.pid, signum)
+
+    def _reap(self, slot: int, process: BaseProcess) -> None:
+        """Handle a stopped child, scheduling its restart unless shutting down."""
+        del self.children[slot]
+        if self._stopping:
+            logger.info("Consumer %s stopped with exit code %s", slot, process.exitcode)
+            return
+
+        if time.monotonic() - self._started_at[slot] >= HEALTHY_UPTIME_S:
+            self._failures[slot] = 0
+        backoff = min(self.max_backoff, 2 ** self._failures.get(slot, 0) - 1)
+        self._failures[slot] = self._failures.get(slot, 0) + 1
+        self._restart_at[slot] = time.monotonic() + backoff
+        logger.error("Consumer %s exited with code %s, restarting in %ss", slot, process.exitcode, backoff)
+
+    def run(self) -> None:
+        """Start the children and supervise them until they all stopped after a shutdown signal."""
+        for sig in SHUTDOWN_SIGNALS:
+            signal.signal(sig, self._forward_signal)
+
+        for slot in range(self.processes):
+            self._spawn(slot)
+
+        while self.children or self._restart_at:
+            wait([process.sentinel for process in self.children.values()], timeout=1)
+            for slot, process in list(self.children.items()):
+                if not process.is_alive():
+                    process.join()
+                    self._reap(slot, process)
+
+            now = time.monotonic()
+            for slot, restart_at in list(self._restart_at.items()):
+                if restart_at <= now:
+                    del self._restart_at[slot]
+                    self._spawn(slot)
+
+        logger.info("All consumers stopped.")
+
+
 if __name__ == "__main__":
     configure_logging(
         debug=False,
         enable_json=os.getenv("JSON_LOG_ENABLED", "0").lower() not in ("false", "0"),
     )
-    try:
-        asyncio.run(main())
-    except Exception as ex:
-        logger.exception("Failed to start consumer")
-        capture_exception(ex)
+    process_count = get_process_count()
+    if process_count > 1:
+        ConsumerSupervisor(process_count, settings.kafka_consumer_restart_max_backoff_s).run()
+    else:
+        run_consumer()
@@ -7,6 +7,8 @@ from app.core.config.application import AppSettings
 from app.core.config.celery import CelerySettings
 from app.core.config.database import DatabaseSettings
 from app.core.config.kafka import KafkaSettings
+from app.core.config.outbox import OutboxSettings
+from app.core.config.rate_limit import RateLimitSettings
 from app.core.config.sentry import SentrySettings
 
 load_dotenv()
@@ -20,7 +22,7 @@ def get_settings(app_type="app") -> Any:
     Parameters
     ----------
     app_type : str, default "app"
-        "app" | "celery" | "database" | "kafka" | "sentry"
+        "app" | "celery" | "database" | "kafka" | "outbox" | "rate_limit" | "sentry"
 
     Returns
     -------
@@ -32,6 +34,8 @@ def get_settings(app_type="app") -> Any:
         "celery": CelerySettings,
         "database": DatabaseSettings,
         "kafka": KafkaSettings,
+        "outbox": OutboxSettings,
+        "rate_limit": RateLimitSettings,
         "sentry": SentrySettings,
     }
 
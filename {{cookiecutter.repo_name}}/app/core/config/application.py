@@ -8,3 +8,7 @@ class AppSettings(BaseSettings):
     environment: str = "development"
     debug: bool = False
     json_log_enabled: bool = True
+    # start the shared Kafka producer with the web app
+    kafka_producer_enabled: bool = False
+    # serve Prometheus metrics, such as the database pool usage, on /metrics
+    metrics_enabled: bool = False
@@ -1,4 +1,7 @@
 """Celery configurations."""
+from typing import Any, Literal
+
+from pydantic import Field
 from pydantic_settings import BaseSettings
 
 
@@ -12,3 +15,26 @@ class CelerySettings(BaseSettings):
     celery_result_backend: str | None = None
     celery_result_expires: int = 3600
     celery_proc_alive_timeout: str = "600"
+    # tasks needing their result opt in with `ignore_result=False`
+    celery_task_ignore_result: bool = True
+    # "zmsgpack" is msgpack with the compression and claim-check below, "json" is the Celery default
+    celery_serializer: Literal["json", "zmsgpack"] = "zmsgpack"
+    # zstd-compress message bodies larger than this, unset to disable
+    celery_compression_threshold: int | None = 4096
+    celery_compression_level: int = 3
+    # keep message bodies larger than this many KB in Redis and send only their key, unset to disable
+    celery_claim_check_threshold_kb: int | None = 256
+    # Redis holding claim-checked bodies, the broker by default
+    celery_claim_check_url: str | None = None
+    celery_claim_check_ttl_s: int = 86400
+    # serve Prometheus metrics of the tasks from the worker, set PROMETHEUS_MULTIPROC_DIR with the prefork pool
+    celery_metrics_enabled: bool = False
+    celery_metrics_port: int = 9103
+    # JSON `task_routes` mapping task names or glob patterns to publishing options such as queue and priority
+    celery_task_routes: dict[str, dict[str, Any]] = Field(default_factory=dict)
+    # Redis keeps a list per queue and priority step, 0 being the highest priority
+    celery_priority_steps: list[int] = Field(default_factory=lambda: list(range(10)))
+    # priority of tasks published without one, leaving room for more and less urgent work
+    celery_default_priority: int = 5
+    # messages reserved by each pool process, 1 for long or latency-sensitive tasks
+    celery_worker_prefetch_multiplier: int = 4
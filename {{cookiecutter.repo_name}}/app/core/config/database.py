@@ -7,6 +7,10 @@ class DatabaseSettings(BaseSettings):
     """Database settings for the application."""
 
     database_url: str = ""
+    # read replicas serving read-only sessions, as a JSON list of URLs
+    database_replica_urls: list[str] = []
+    # seconds a replica which cannot be reached gets no sessions
+    db_replica_ejection_s: float = 30
     # for debugging purposes
     echo_sql: bool = False
     # for testing
@@ -16,6 +20,17 @@ class DatabaseSettings(BaseSettings):
     lock_timeout: int = 10000
     # statement timeout settings, default to 10s
     statement_timeout: int = 10000
+    # connections kept open per process, and opened beyond them under load
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    # seconds to wait for a connection before failing
+    db_pool_timeout: float = 30
+    # reopen connections older than this many seconds, before the server or a proxy drops them (-1 never)
+    db_pool_recycle: int = 1800
+    # check connections are alive before using them
+    db_pool_pre_ping: bool = True
+    # open `db_pool_size` connections when the web app starts
+    db_pool_prewarm: bool = True
 
     @property
     def db_uri(self) -> str:
@@ -29,3 +44,10 @@ class DatabaseSettings(BaseSettings):
             raise ValidationError("DATABASE_URL is required.")
 
         return self.database_url
+
+    @property
+    def replica_uris(self) -> list[str]:
+        """Return the read replica uris, none when testing."""
+        if self.testing:
+            return []
+        return self.database_replica_urls
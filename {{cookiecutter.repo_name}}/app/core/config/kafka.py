@@ -1,7 +1,32 @@
 """Kafka configurations."""
+import os
+from typing import Literal
+
+from pydantic import BaseModel, Field, model_validator
 from pydantic_settings import BaseSettings
 
 
+class KafkaRouteRule(BaseModel):
+    """Drop records, or send them to another Celery queue, by topic, headers and key."""
+
+    # topic the rule applies to, every topic when None
+    topic: str | None = None
+    # header values the record must carry
+    headers: dict[str, str] = Field(default_factory=dict)
+    # glob pattern matched against the UTF-8 key, e.g. "tenant-42:*"
+    key: str | None = None
+    action: Literal["drop", "route"] = "route"
+    # Celery queue of the routed records
+    queue: str | None = None
+
+    @model_validator(mode="after")
+    def check_queue(self) -> "KafkaRouteRule":
+        """Ensure routed records have a queue."""
+        if self.action == "route" and not self.queue:
+            raise ValueError("A queue is required to route records.")
+        return self
+
+
 class KafkaSettings(BaseSettings):
     """Kafka settings for the application."""
 
@@ -17,7 +42,69 @@ class KafkaSettings(BaseSettings):
     kafka_consumer_timeout: str = "60000"
     kafka_auto_commit_interval_ms: str = "1000"
     kafka_max_poll_records: str = "100"
-    kafka_session_time_out_ms: str = "600000"
+    # a member missing heartbeats this long is removed from the group and its partitions reassigned
+    kafka_session_time_out_ms: str = "45000"
+    kafka_heartbeat_interval_ms: int = 3000
+    # "sticky" keeps partitions on their owner across rebalances, "range" is also offered as a fallback so that
+    # members of a rolling deploy still agree on a strategy
+    kafka_partition_assignment_strategy: Literal["range", "roundrobin", "sticky"] = "sticky"
+    # static membership: restarts within the session timeout keep their partitions without a rebalance,
+    # defaults to the POD_NAME environment variable
+    kafka_group_instance_id: str | None = None
+    # "message" dispatches records one by one, "batch" polls with `getmany` and publishes per handler in bulk
+    kafka_consume_mode: Literal["message", "batch"] = "message"
+    kafka_batch_timeout_ms: int = 1000
+    # number of lanes allowed to process records at the same time
+    kafka_concurrency: int = 1
+    # "partition" keeps one lane per partition, "key" splits partitions into lanes by key hash
+    kafka_lane_strategy: Literal["partition", "key"] = "partition"
+    # chunks of records a lane may hold before fetching waits
+    kafka_lane_max_pending: int = 10
+    # "auto" lets aiokafka commit periodically, "manual" only commits offsets of dispatched records
+    kafka_commit_mode: Literal["auto", "manual"] = "auto"
+    # manual commits happen after this many processed records or this much time, whichever comes first
+    kafka_commit_batch_size: int = 500
+    kafka_commit_interval_ms: int = 5000
+    # producer: "0", "1" or "all"
+    kafka_producer_acks: str = "1"
+    kafka_producer_linger_ms: int = 5
+    kafka_producer_max_batch_size: int = 16384
+    # "gzip", "snappy", "lz4" or "zstd", the codec library must be installed
+    kafka_producer_compression_type: str | None = None
+    # on shutdown, in-flight records get this long to finish before being abandoned (and redelivered later),
+    # keep it under the termination grace period
+    kafka_drain_timeout_ms: int = 25000
+    # on rebalance, in-flight records of revoked partitions get this long to finish, the group waits meanwhile
+    kafka_rebalance_drain_timeout_ms: int = 10000
+    # consumer processes started by `python -m app.consumer`, 0 picks min(CPU count, partition count)
+    kafka_consumer_processes: int = 0
+    # upper bound of the restart backoff of crashed consumer processes
+    kafka_consumer_restart_max_backoff_s: float = 60
+    # pause the consumer while its Celery queues hold more than the high-water mark, resume under the low one
+    kafka_backpressure_enabled: bool = False
+    kafka_backpressure_high_watermark: int = 10000
+    kafka_backpressure_low_watermark: int = 1000
+    kafka_backpressure_interval_ms: int = 1000
+    # JSON list of `KafkaRouteRule`, the first matching rule applies (see the README for an example)
+    kafka_routing_rules: list[KafkaRouteRule] = Field(default_factory=list)
+    # `async def` handlers running in the consumer: max concurrent calls and default timeout
+    kafka_async_handler_concurrency: int = 100
+    kafka_async_handler_timeout_ms: int = 30000
+    # republish failed records to "<topic>.retry.<tier>" topics, then to "<topic>.dlq", these topics must exist
+    kafka_retry_enabled: bool = False
+    kafka_retry_tiers: str = "1m,10m"
+    # skip redelivered records: "memory" is local to the process, "redis" is shared by the consumers of the group
+    kafka_dedup_backend: Literal["none", "memory", "redis"] = "none"
+    # "offset" identifies records by topic/partition/offset, "key" uses the message key as an idempotency key
+    kafka_dedup_strategy: Literal["offset", "key"] = "offset"
+    kafka_dedup_ttl_s: int = 3600
+    kafka_dedup_max_size: int = 100000
+    # defaults to the Celery broker
+    kafka_dedup_redis_url: str | None = None
+    # Prometheus endpoint of the consumer, supervised processes listen on consecutive ports
+    kafka_metrics_enabled: bool = False
+    kafka_metrics_port: int = 9102
+    kafka_lag_interval_ms: int = 5000
     dd_service: str = ""
 
     @property
@@ -31,3 +118,27 @@ class KafkaSettings(BaseSettings):
             List of string containing bootstrap server hosts.
         """
         return self.kafka_brokers_tls.split(",")
+
+    @property
+    def group_instance_id(self) -> str | None:
+        """
+        Return the static member id of the consumer.
+
+        Returns
+        -------
+        str | None
+            `KAFKA_GROUP_INSTANCE_ID`, or the pod name, None for dynamic membership
+        """
+        return self.kafka_group_instance_id or os.getenv("POD_NAME") or None
+
+    @property
+    def producer_acks(self) -> int | str:
+        """
+        Return producer acks as expected by aiokafka.
+
+        Returns
+        -------
+        int | str
+            0, 1 or "all"
+        """
+        return self.kafka_producer_acks if self.kafka_producer_acks == "all" else int(self.kafka_producer_acks)
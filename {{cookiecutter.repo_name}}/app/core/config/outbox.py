@@ -0,0 +1,14 @@
+"""Outbox relay configurations."""
+from pydantic_settings import BaseSettings
+
+
+class OutboxSettings(BaseSettings):
+    """Outbox relay settings."""
+
+    environment: str = "development"
+    # events claimed and published per transaction
+    outbox_batch_size: int = 500
+    # wait between polls once the outbox is empty
+    outbox_poll_interval_ms: int = 1000
+    # delete published events, or keep them with `published_utc` set
+    outbox_delete_published: bool = True
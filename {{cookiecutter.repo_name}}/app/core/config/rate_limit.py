@@ -0,0 +1,15 @@
+"""Rate limiting configurations."""
+from typing import Literal
+
+from pydantic_settings import BaseSettings
+
+
+class RateLimitSettings(BaseSettings):
+    """Settings of the token buckets limiting calls to downstream services."""
+
+    environment: str = "development"
+    # "redis" shares the buckets between every process, "memory" keeps them local to a process
+    rate_limit_backend: Literal["redis", "memory"] = "redis"
+    # Redis holding the buckets, the Celery broker by default
+    rate_limit_redis_url: str | None = None
+    rate_limit_key_prefix: str = "rate-limit:"
@@ -0,0 +1,47 @@
+"""Prometheus metrics of the database connection pools."""
+from prometheus_client import Counter, Gauge, Histogram
+
+POOL_SIZE = Gauge(
+    "db_pool_size",
+    "Connections the pool keeps open.",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections",
+    "Connections currently in use.",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+POOL_OVERFLOW = Gauge(
+    "db_pool_overflow_connections",
+    "Connections opened beyond the pool size.",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time to get a connection from the pool, opening it included.",
+    ["pool"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+POOL_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts",
+    "Checkouts which gave up after the pool timeout.",
+    ["pool"],
+)
+CONNECTIONS_OPENED = Counter(
+    "db_pool_connections_opened",
+    "Connections opened to the database.",
+    ["pool"],
+)
+CONNECTIONS_INVALIDATED = Counter(
+    "db_pool_connections_invalidated",
+    "Connections invalidated after an error or a failed pre-ping.",
+    ["pool"],
+)
+REPLICA_EJECTIONS = Counter(
+    "db_replica_ejections",
+    "Read replicas ejected after failing to connect.",
+    ["pool"],
+)
@@ -0,0 +1,66 @@
+"""Connection pool of the database engines, instrumented with Prometheus metrics."""
+import time
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry
+
+from app.core.db.metrics import (
+    CONNECTIONS_INVALIDATED,
+    CONNECTIONS_OPENED,
+    POOL_CHECKED_OUT,
+    POOL_CHECKOUT_WAIT,
+    POOL_OVERFLOW,
+    POOL_SIZE,
+    POOL_TIMEOUTS,
+)
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """
+    Queue pool of an async engine exporting its usage.
+
+    Checkout wait and usage are measured around getting and returning connections, opened and invalidated
+    connections are counted through pool events. Metrics are labelled with the `pool_logging_name` of the
+    engine.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.label = self._orig_logging_name or "default"
+        POOL_SIZE.labels(pool=self.label).set(self.size())
+        # a pool recreated by `dispose` inherits the listeners of the pool it replaces through `_dispatch`
+        if kwargs.get("_dispatch") is None:
+            event.listen(self, "connect", self._on_connect)
+            event.listen(self, "invalidate", self._on_invalidate)
+
+    def _on_connect(self, *_: Any) -> None:
+        """Count a new connection."""
+        CONNECTIONS_OPENED.labels(pool=self.label).inc()
+
+    def _on_invalidate(self, *_: Any) -> None:
+        """Count an invalidated connection."""
+        CONNECTIONS_INVALIDATED.labels(pool=self.label).inc()
+
+    def _report_usage(self) -> None:
+        """Export the connections in use and the overflow."""
+        POOL_CHECKED_OUT.labels(pool=self.label).set(self.checkedout())
+        POOL_OVERFLOW.labels(pool=self.label).set(self.overflow())
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        """Get a connection, measuring how long it took."""
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            POOL_TIMEOUTS.labels(pool=self.label).inc()
+            raise
+        finally:
+            POOL_CHECKOUT_WAIT.labels(pool=self.label).observe(time.perf_counter() - start)
+            self._report_usage()
+
+    def _do_return_conn(self, record: ConnectionPoolEntry) -> None:
+        """Return a connection to the pool."""
+        super()._do_return_conn(record)
+        self._report_usage()
@@ -0,0 +1,77 @@
+"""Read replicas of the database, balanced round-robin and ejected while failing."""
+import logging
+import time
+from dataclasses import dataclass
+
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from app.core.db.metrics import REPLICA_EJECTIONS
+
+logger = logging.getLogger(__name__)
+
+
+def is_unavailable(exc: BaseException) -> bool:
+    """Tell whether an error means the database cannot be reached, rather than a failing statement."""
+    if isinstance(exc, DBAPIError):
+        return exc.connection_invalidated
+    return isinstance(exc, OSError | TimeoutError)
+
+
+def cannot_connect(exc: BaseException) -> bool:
+    """
+    Tell whether an error opening a connection means the database cannot serve sessions.
+
+    Besides unreachable databases, a database starting up, in recovery or out of connection slots refuses
+    connections without invalidating any.
+    """
+    return isinstance(exc, OperationalError | InterfaceError) or is_unavailable(exc)
+
+
+@dataclass
+class Replica:
+    """Engine of a read replica."""
+
+    name: str
+    engine: AsyncEngine
+    sessionmaker: async_sessionmaker[AsyncSession]
+    # monotonic time until which the replica gets no sessions
+    ejected_until: float = 0
+
+
+class ReplicaSet:
+    """
+    Read replicas used in turn.
+
+    A replica which cannot be reached is ejected for `ejection_s` seconds, then tried again by the next
+    session.
+    """
+
+    def __init__(self, replicas: list[Replica], *, ejection_s: float = 30) -> None:
+        self.replicas = replicas
+        self.ejection_s = ejection_s
+        self._next = 0
+
+    def candidates(self) -> list[Replica]:
+        """
+        Return the replicas to try for a session.
+
+        Returns
+        -------
+        list[Replica]
+            replicas not ejected, starting from the next one in turn
+        """
+        if not self.replicas:
+            return []
+
+        start = self._next
+        self._next = (self._next + 1) % len(self.replicas)
+        now = time.monotonic()
+        rotated = self.replicas[start:] + self.replicas[:start]
+        return [replica for replica in rotated if replica.ejected_until <= now]
+
+    def eject(self, replica: Replica) -> None:
+        """Stop using a replica for a while."""
+        logger.warning("Ejecting database replica %s for %ss", replica.name, self.ejection_s, exc_info=True)
+        replica.ejected_until = time.monotonic() + self.ejection_s
+        REPLICA_EJECTIONS.labels(pool=replica.name).inc()
@@ -1,13 +1,18 @@
 """Base Repository class."""
 
 import abc
+from collections.abc import Iterator, Sequence
 from typing import Any
 
 from sqlalchemy import BinaryExpression, ColumnExpressionArgument, select
+from sqlalchemy.dialects.postgresql import Insert, insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.models import BaseModel
 
+# PostgreSQL takes at most 32767 bind parameters per statement
+MAX_BIND_PARAMS = 32767
+
 
 class AbstractRepository(abc.ABC):
     """Abstract Repository class."""
@@ -91,6 +96,86 @@ class AbstractSqlRepository(AbstractRepository):
         await self.session.refresh(instance)
         return instance
 
+    def _chunks(self, rows: Sequence[dict]) -> Iterator[list[dict]]:
+        """Split rows in chunks inserted by one statement each, staying under the bind parameter limit."""
+        # columns with a default are bound too, so count every column of the table
+        size = max(1, MAX_BIND_PARAMS // len(self.model.__table__.columns))  # type: ignore[attr-defined]
+        for start in range(0, len(rows), size):
+            yield list(rows[start : start + size])
+
+    async def _insert_returning(self, rows: Sequence[dict], statement: Insert) -> list[Any]:
+        """Run an insert statement on each chunk of rows, returning the rows written."""
+        instances: list[Any] = []
+        for chunk in self._chunks(rows):
+            result = await self.session.scalars(
+                statement.values(chunk).returning(self.model),
+                execution_options={"populate_existing": True},
+            )
+            instances.extend(result)
+        return instances
+
+    async def bulk_create(self, rows: Sequence[dict]) -> list[Any]:
+        """
+        Insert records with a multi-row `INSERT ... RETURNING`, without committing.
+
+        Parameters
+        ----------
+        rows : Sequence[dict]
+            data of the records, every row with the same keys
+
+        Returns
+        -------
+        list
+            new model instances
+        """
+        return await self._insert_returning(rows, insert(self.model))
+
+    async def bulk_upsert(
+        self,
+        rows: Sequence[dict],
+        conflict_cols: Sequence[str],
+        update_cols: Sequence[str] | None = None,
+    ) -> list[Any]:
+        """
+        Insert records, updating the existing ones, with `INSERT ... ON CONFLICT DO UPDATE`, without committing.
+
+        A statement cannot update the same record twice, so of rows with the same conflict columns only the
+        last one is written.
+
+        Parameters
+        ----------
+        rows : Sequence[dict]
+            data of the records, every row with the same keys
+        conflict_cols : Sequence[str]
+            columns of a unique constraint or index identifying existing records
+        update_cols : Sequence[str] | None
+            columns updated on existing records, by default every column of the rows but the conflict ones
+
+        Returns
+        -------
+        list
+            inserted and updated model instances
+        """
+        if not rows:
+            return []
+
+        unique_rows = list({tuple(row[col] for col in conflict_cols): row for row in rows}.values())
+        if update_cols is None:
+            update_cols = [col for col in unique_rows[0] if col not in conflict_cols]
+        if not update_cols:
+            raise ValueError("bulk_upsert needs columns to update.")
+
+        statement = insert(self.model)
+        values: dict[str, Any] = {col: statement.excluded[col] for col in update_cols}
+        # `onupdate` defaults do not apply to the update of an upsert
+        for column in self.model.__table__.columns:  # type: ignore[attr-defined]
+            if column.onupdate is not None and column.onupdate.is_clause_element and column.name not in values:
+                values[column.name] = column.onupdate.arg
+        return await self._insert_returning(
+            unique_rows,
+            statement.on_conflict_do_update(index_elements=list(conflict_cols), set_=values),
+        )
+
     async def filter_by(
         self,
         *expressions: BinaryExpression | ColumnExpressionArgument,
@@ -1,23 +1,40 @@
 """Database Session Manager."""
 
+import asyncio
 import contextlib
 from collections.abc import AsyncIterator
 from typing import Any
 
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import (
     AsyncConnection,
+    AsyncEngine,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
 
 from app.core.config import DatabaseSettings, get_settings
+from app.core.db.pool import InstrumentedAsyncPool
+from app.core.db.replicas import Replica, ReplicaSet, cannot_connect, is_unavailable
 
 
 class DatabaseSessionManager:
-    """Database Session Manager class."""
-
-    def __init__(self, db_host: str, kwargs: dict[str, Any]) -> None:
+    """
+    Database Session Manager class.
+
+    Sessions go to the primary database unless `readonly` is requested, in which case they go to the read
+    replicas in turn, or to the primary while every replica is ejected.
+    """
+
+    def __init__(
+        self,
+        db_host: str,
+        kwargs: dict[str, Any],
+        replica_hosts: list[str] | None = None,
+        *,
+        replica_ejection_s: float = 30,
+    ) -> None:
         extra_kwargs = kwargs if kwargs else {}
         self._engine = create_async_engine(
             db_host,
@@ -28,6 +45,13 @@ class DatabaseSessionManager:
             bind=self._engine,
         )
 
+        replicas = []
+        for index, replica_host in enumerate(replica_hosts or []):
+            name = f"replica-{index}"
+            engine = create_async_engine(replica_host, **{**extra_kwargs, "pool_logging_name": name})
+            replicas.append(Replica(name, engine, async_sessionmaker(autocommit=False, bind=engine)))
+        self._replicas = ReplicaSet(replicas, ejection_s=replica_ejection_s)
+
     def _validate_engine(self):
         """Ensuse `self._engine` is not None."""
         if self._engine is None:
@@ -35,15 +59,69 @@ class DatabaseSessionManager:
                 "DatabaseSessionManager is not initialized.",
             )
 
+    @staticmethod
+    async def _prewarm_engine(engine: AsyncEngine) -> int:
+        """Open the connections the pool of an engine keeps, returning how many."""
+        size = getattr(engine.pool, "size", None)
+        if size is None:
+            # pools keeping no connections, such as `NullPool`
+            return 0
+
+        async with contextlib.AsyncExitStack() as stack:
+            # hold them all at once, otherwise the same connection would be opened and returned again
+            results = await asyncio.gather(
+                *(stack.enter_async_context(engine.connect()) for _ in range(size())),
+                return_exceptions=True,
+            )
+            errors = [result for result in results if isinstance(result, BaseException)]
+            if errors:
+                raise errors[0]
+        return size()
+
+    async def prewarm(self) -> int:
+        """
+        Open the connections the pools keep, so the first requests do not pay for connecting.
+
+        Returns
+        -------
+        int
+            number of connections opened, to the primary and the replicas
+        """
+        self._validate_engine()
+        opened = await self._prewarm_engine(self._engine)
+        for replica in self._replicas.replicas:
+            try:
+                opened += await self._prewarm_engine(replica.engine)
+            except (DBAPIError, OSError, TimeoutError):
+                self._replicas.eject(replica)
+        return opened
+
+    def reset_after_fork(self) -> None:
+        """
+        Replace the pools inherited from the parent process with empty ones.
+
+        The inherited connections share their sockets with the parent, so they are dropped without being closed,
+        which would also close them for the parent. Each process then opens its own connections.
+        """
+        if self._engine is None:
+            return
+
+        self._engine.sync_engine.dispose(close=False)
+        for replica in self._replicas.replicas:
+            replica.engine.sync_engine.dispose(close=False)
+
     async def close(self):
         """Close database connection."""
         if self._engine is None:
             return
 
         await self._engine.dispose()
+        for replica in self._replicas.replicas:
+            await replica.engine.dispose()
 
         self._engine = None
         self._sessionmaker = None
+        self._replicas = ReplicaSet([])
 
     @contextlib.asynccontextmanager
     async def connect(self) -> AsyncIterator[AsyncConnection]:
@@ -57,16 +135,47 @@ class DatabaseSessionManager:
                 await conn.rollback()
                 raise
 
+    async def _replica_session(self) -> tuple[AsyncSession, Replica | None]:
+        """Open a session on the next available replica, or on the primary when none is."""
+        for replica in self._replicas.candidates():
+            session = replica.sessionmaker()
+            try:
+                # connect now, so an unavailable replica is skipped before the caller runs any statement
+                await session.connection()
+            except (DBAPIError, OSError, TimeoutError) as exc:
+                await session.close()
+                if not cannot_connect(exc):
+                    raise
+                self._replicas.eject(replica)
+            else:
+                return session, replica
+        return self._sessionmaker(), None
+
     @contextlib.asynccontextmanager  # type: ignore[arg-type]
-    async def session(self, *, scoped: bool = False) -> AsyncIterator[AsyncSession]:
-        """Get async database session."""
+    async def session(self, *, scoped: bool = False, readonly: bool = False) -> AsyncIterator[AsyncSession]:
+        """
+        Get async database session.
+
+        Parameters
+        ----------
+        scoped : bool, default False
+            dispose of the connections of the primary once the session closes
+        readonly : bool, default False
+            use a read replica, which lags behind the primary, so not for reading what was just written
+        """
         self._validate_engine()
 
-        session = self._sessionmaker()
+        replica = None
+        if readonly:
+            session, replica = await self._replica_session()
+        else:
+            session = self._sessionmaker()
 
         try:
             yield session
-        except Exception:
+        except Exception as exc:
+            if replica is not None and is_unavailable(exc):
+                self._replicas.eject(replica)
             await session.rollback()
             raise
         finally:
@@ -81,6 +190,13 @@ session_manager = DatabaseSessionManager(
     db_settings.db_uri,  # type: ignore[attr-defined]
     {
         "echo": db_settings.echo_sql,  # type: ignore[attr-defined]
+        "poolclass": InstrumentedAsyncPool,
+        "pool_logging_name": "primary",
+        "pool_size": db_settings.db_pool_size,
+        "max_overflow": db_settings.db_max_overflow,
+        "pool_timeout": db_settings.db_pool_timeout,
+        "pool_recycle": db_settings.db_pool_recycle,
+        "pool_pre_ping": db_settings.db_pool_pre_ping,
         "connect_args": {
             "server_settings": {
                 "lock_timeout": str(db_settings.lock_timeout),
@@ -88,4 +204,6 @@ session_manager = DatabaseSessionManager(
             },
         },
     },
+    db_settings.replica_uris,
+    replica_ejection_s=db_settings.db_replica_ejection_s,
 )
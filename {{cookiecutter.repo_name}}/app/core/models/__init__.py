@@ -1,3 +1,4 @@
 from app.core.models.base import BaseModel
+from app.core.models.outbox import OutboxEvent
 
-__all__ = ["BaseModel"]
+__all__ = ["BaseModel", "OutboxEvent"]
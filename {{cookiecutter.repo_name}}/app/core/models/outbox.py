@@ -0,0 +1,23 @@
+"""Outbox model."""
+from sqlalchemy import JSON, Column, DateTime, Index, LargeBinary, String
+
+from app.core.models.base import BaseModel
+
+
+class OutboxEvent(BaseModel):
+    """Kafka message written in the same transaction as the data it describes, published later by the relay."""
+
+    __tablename__ = "outbox_events"
+
+    topic = Column(String(255), nullable=False)
+    key = Column(LargeBinary, nullable=True)
+    value = Column(LargeBinary, nullable=False)
+    # header name to UTF-8 value
+    headers = Column(JSON, nullable=True)
+    # only set when the relay keeps published events
+    published_utc = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # the relay only scans pending events, in creation order
+        Index("ix_outbox_events_pending", "created_utc", postgresql_where=published_utc.is_(None)),
+    )
@@ -5,10 +5,14 @@ import structlog
 from asgi_correlation_id import CorrelationIdMiddleware
 from fastapi import FastAPI, HTTPException
 from fastapi.exception_handlers import http_exception_handler
+from prometheus_client import make_asgi_app
+from sqlalchemy.exc import SQLAlchemyError
 
 from app.api import app_router
-from app.core.config import AppSettings, get_settings
+from app.core.config import AppSettings, DatabaseSettings, get_settings
 from app.core.db import session_manager
+from app.services.kafka.producer import kafka_producer
+from app.utils.metrics import get_registry
 from app.utils.middlewares.http_middleware import LoggingMiddleware
 from app.utils.structlog import configure_logging
 from app.utils.trace import patch_tracing_middleware
@@ -17,6 +21,7 @@ from app.utils.trace import patch_tracing_middleware
 logger = structlog.stdlib.get_logger(__name__)
 
 settings: AppSettings = get_settings()
+db_settings: DatabaseSettings = get_settings("database")
 
 
 @asynccontextmanager
@@ -31,10 +36,20 @@ async def lifespan(_: FastAPI):
     """
     # configure logging for web app
     configure_logging(debug=settings.debug, enable_json=settings.json_log_enabled)
+    if db_settings.db_pool_prewarm:
+        try:
+            opened = await session_manager.prewarm()
+            logger.info("Opened %s database connections", opened)
+        except (OSError, SQLAlchemyError):
+            # the pool still connects on demand, the app can start while the database is unreachable
+            logger.exception("Failed to prewarm the database pool")
+    if settings.kafka_producer_enabled:
+        await kafka_producer.start()
 
     yield
     # close the db connection at startup and shutdown
     await session_manager.close()
+    await kafka_producer.stop()
 
 
 app = FastAPI(
@@ -48,6 +63,8 @@ app.add_middleware(CorrelationIdMiddleware)
 patch_tracing_middleware(app)
 # register routers
 app.include_router(app_router)
+if settings.metrics_enabled:
+    app.mount("/metrics", make_asgi_app(registry=get_registry()))
 
 
 # adding logging for exception handler
@@ -0,0 +1,45 @@
+"""Outbox relay command."""
+import asyncio
+import logging
+import os
+import signal
+
+from app.core.config import OutboxSettings, get_settings
+from app.core.db import session_manager
+from app.services.kafka.producer import kafka_producer
+from app.services.outbox import OutboxRelay
+from app.utils.structlog import configure_logging
+
+settings: OutboxSettings = get_settings("outbox")
+logger = logging.getLogger(__name__)
+
+
+async def main() -> None:
+    """Relay outbox events to Kafka until a shutdown signal is received."""
+    shutdown_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, shutdown_event.set)
+
+    relay = OutboxRelay(
+        session_manager,
+        kafka_producer,
+        batch_size=settings.outbox_batch_size,
+        poll_interval_ms=settings.outbox_poll_interval_ms,
+        delete_published=settings.outbox_delete_published,
+    )
+    await kafka_producer.start()
+    try:
+        await relay.run(shutdown_event)
+    finally:
+        await kafka_producer.stop()
+        await session_manager.close()
+    logger.info("Outbox relay stopped.")
+
+
+if __name__ == "__main__":
+    configure_logging(
+        debug=False,
+        enable_json=os.getenv("JSON_LOG_ENABLED", "0").lower() not in ("false", "0"),
+    )
+    asyncio.run(main())
@@ -0,0 +1,3 @@
+from app.repositories.outbox import OutboxRepository
+
+__all__ = ["OutboxRepository"]
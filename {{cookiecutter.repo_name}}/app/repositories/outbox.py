@@ -0,0 +1,101 @@
+"""Outbox repository."""
+from collections.abc import Sequence
+from typing import Any
+
+from sqlalchemy import delete, func, select, update
+
+from app.core.db.repository import AbstractSqlRepository
+from app.core.models import OutboxEvent
+
+# advisory lock held by the relay publishing events, any value unique among the advisory locks of the database
+RELAY_LOCK_ID = 0x6F7574626F78
+
+
+class OutboxRepository(AbstractSqlRepository):
+    """Write outbox events and claim them for publishing."""
+
+    model = OutboxEvent
+
+    def add(
+        self,
+        topic: str,
+        value: bytes,
+        key: bytes | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> OutboxEvent:
+        """
+        Add an event to the current transaction, without committing it.
+
+        Parameters
+        ----------
+        topic : str
+            Kafka topic
+        value : bytes
+            encoded message
+        key : bytes | None
+            message key
+        headers : dict[str, str] | None
+            message headers
+
+        Returns
+        -------
+        OutboxEvent
+            pending event, written when the transaction commits
+        """
+        event = OutboxEvent(topic=topic, value=value, key=key, headers=headers)  # type: ignore[call-arg]
+        self.session.add(event)
+        return event
+
+    async def create(self, data: dict) -> Any:
+        """Add an event to the current transaction, the caller commits it together with its data."""
+        return self.add(**data)
+
+    async def lock_relay(self) -> bool:
+        """
+        Try to become the only relay publishing events until the transaction ends.
+
+        Returns
+        -------
+        bool
+            whether the lock was acquired, another relay holds it otherwise
+        """
+        return bool(await self.session.scalar(select(func.pg_try_advisory_xact_lock(RELAY_LOCK_ID))))
+
+    async def claim_pending(self, limit: int) -> list[OutboxEvent]:
+        """
+        Lock the oldest pending events.
+
+        Parameters
+        ----------
+        limit : int
+            maximum number of events
+
+        Returns
+        -------
+        list[OutboxEvent]
+            events locked until the transaction ends
+        """
+        query = (
+            select(OutboxEvent)
+            .where(OutboxEvent.published_utc.is_(None))
+            .order_by(OutboxEvent.created_utc)
+            .limit(limit)
+            .with_for_update()
+        )
+        return list(await self.session.scalars(query))
+
+    async def mark_published(self, ids: Sequence[Any]) -> None:
+        """Mark events as published in one statement."""
+        # the database clock, as `updated_utc` which the same statement sets, rather than the clock of the relay
+        await self.session.execute(
+            update(OutboxEvent)
+            .where(OutboxEvent.id.in_(ids))
+            .values(published_utc=func.now())
+            .execution_options(synchronize_session=False),
+        )
+
+    async def delete_many(self, ids: Sequence[Any]) -> None:
+        """Delete events in one statement."""
+        await self.session.execute(
+            delete(OutboxEvent).where(OutboxEvent.id.in_(ids)).execution_options(synchronize_session=False),
+        )
@@ -0,0 +1,3 @@
+from app.services.kafka.service import KafkaService
+
+__all__ = ["KafkaService"]
@@ -0,0 +1,130 @@
+"""Pause the Kafka consumer while the Celery queues are saturated."""
+import asyncio
+import contextlib
+import logging
+from collections.abc import Iterable, Sequence
+
+from aiokafka import AIOKafkaConsumer
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.constants import CELERY_PRIORITY_SEPARATOR
+from app.services.kafka.metrics import (
+    BACKPRESSURE_PAUSED,
+    BACKPRESSURE_PAUSES,
+    BACKPRESSURE_RESUMES,
+    CELERY_QUEUE_DEPTH,
+)
+from app.services.kafka.pauses import BACKPRESSURE, PauseRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class BackpressureMonitor:
+    """
+    Watch the depth of the Celery queues and pause/resume the consumer accordingly.
+
+    Depth is read with a pipelined `LLEN` on the Redis broker, summing the lists kombu keeps for every step of
+    `priority_steps`. Above `high_watermark` every assigned partition is paused, and they are resumed once the
+    depth is back under `low_watermark`. Pauses go through `pauses`, so partitions another component holds
+    paused stay paused when backpressure resumes.
+    """
+
+    def __init__(
+        self,
+        consumer: AIOKafkaConsumer,
+        redis: Redis,
+        queues: Iterable[str],
+        *,
+        high_watermark: int,
+        low_watermark: int,
+        interval_ms: int = 1000,
+        priority_steps: Sequence[int] = (0,),
+        priority_separator: str = CELERY_PRIORITY_SEPARATOR,
+        pauses: PauseRegistry | None = None,
+    ) -> None:
+        self.consumer = consumer
+        self.pauses = pauses if pauses is not None else PauseRegistry(consumer)
+        self.redis = redis
+        self.queues = sorted(set(queues))
+        # kombu keeps the messages of priority step 0 in the queue list itself, the others in `<queue><sep><step>`
+        self.keys = {
+            queue: [queue, *(f"{queue}{priority_separator}{step}" for step in sorted(set(priority_steps)) if step)]
+            for queue in self.queues
+        }
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+        self.interval = interval_ms / 1000
+        self._task: asyncio.Task | None = None
+
+    @property
+    def paused(self) -> bool:
+        """Whether the consumer is paused by backpressure."""
+        return bool(self.pauses.held_by(BACKPRESSURE))
+
+    async def depth(self) -> int:
+        """Return the number of messages waiting in the monitored queues."""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for keys in self.keys.values():
+                for key in keys:
+                    pipe.llen(key)
+            lengths = iter(await pipe.execute())
+
+        depth = 0
+        for queue, keys in self.keys.items():
+            length = sum(next(lengths) for _ in keys)
+            CELERY_QUEUE_DEPTH.labels(queue=queue).set(length)
+            depth += length
+        return depth
+
+    def _pause(self) -> None:
+        """Pause every assigned partition, including the ones assigned since the last check."""
+        partitions = self.consumer.assignment()
+        if not partitions:
+            return
+
+        if not self.paused:
+            BACKPRESSURE_PAUSES.inc()
+            BACKPRESSURE_PAUSED.set(1)
+        self.pauses.pause(BACKPRESSURE, *partitions)
+
+    def _resume(self) -> None:
+        """Release the partitions paused by backpressure."""
+        self.pauses.resume(BACKPRESSURE, *self.pauses.held_by(BACKPRESSURE))
+        BACKPRESSURE_RESUMES.inc()
+        BACKPRESSURE_PAUSED.set(0)
+
+    async def check(self) -> None:
+        """Compare the queue depth to the watermarks and pause or resume the consumer."""
+        depth = await self.depth()
+        if depth >= self.high_watermark:
+            if not self.paused:
+                logger.warning("Celery queues hold %s messages, pausing consumption", depth)
+            self._pause()
+        elif self.paused and depth <= self.low_watermark:
+            logger.info("Celery queues hold %s messages, resuming consumption", depth)
+            self._resume()
+        elif self.paused:
+            self._pause()
+
+    async def run(self) -> None:
+        """Check the queues periodically until cancelled."""
+        while True:
+            try:
+                await self.check()
+            except RedisError:
+                logger.exception("Failed to read Celery queue depth")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start checking the queues in the background."""
+        self._task = asyncio.create_task(self.run(), name="kafka-backpressure")
+
+    async def stop(self) -> None:
+        """Stop checking the queues and close the Redis connection."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        await self.redis.aclose()
@@ -0,0 +1,171 @@
+"""Codecs used to serialize Kafka message values."""
+import json
+from collections.abc import Callable, Mapping
+from types import MappingProxyType
+from typing import Any, Protocol
+
+import msgpack
+import orjson
+from pydantic import BaseModel
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover
+    msgspec = None  # type: ignore[assignment]
+
+Decoder = Callable[[bytes], Any]
+
+
+class Codec(Protocol):
+    """Encode and decode message values."""
+
+    name: str
+
+    def encode(self, data: Any) -> bytes:
+        """Encode data to bytes."""
+
+    def decode(self, data: bytes) -> Any:
+        """Decode bytes to data."""
+
+
+class RawCodec:
+    """Pass values through untouched."""
+
+    name = "raw"
+
+    def encode(self, data: bytes) -> bytes:
+        """Return the value as is."""
+        return data
+
+    def decode(self, data: bytes) -> bytes:
+        """Return the value as is."""
+        return data
+
+
+class JsonCodec:
+    """JSON codec based on the standard library."""
+
+    name = "json"
+
+    def encode(self, data: Any) -> bytes:
+        """Encode data to JSON."""
+        return json.dumps(data).encode("utf-8")
+
+    def decode(self, data: bytes) -> Any:
+        """Decode JSON data."""
+        return json.loads(data)
+
+
+class OrjsonCodec:
+    """JSON codec based on orjson."""
+
+    name = "orjson"
+
+    def encode(self, data: Any) -> bytes:
+        """Encode data to JSON."""
+        return orjson.dumps(data)
+
+    def decode(self, data: bytes) -> Any:
+        """Decode JSON data."""
+        return orjson.loads(data)
+
+
+class MsgpackCodec:
+    """MessagePack codec."""
+
+    name = "msgpack"
+
+    def encode(self, data: Any) -> bytes:
+        """Encode data to MessagePack."""
+        return msgpack.packb(data, use_bin_type=True)
+
+    def decode(self, data: bytes) -> Any:
+        """Decode MessagePack data."""
+        return msgpack.unpackb(data, raw=False)
+
+
+_CODECS: tuple[Codec, ...] = (RawCodec(), JsonCodec(), OrjsonCodec(), MsgpackCodec())
+CODECS: Mapping[str, Codec] = MappingProxyType({codec.name: codec for codec in _CODECS})
+
+
+def get_codec(name: str) -> Codec:
+    """
+    Return a codec by name.
+
+    Parameters
+    ----------
+    name : str
+        "raw" | "json" | "orjson" | "msgpack"
+
+    Returns
+    -------
+    Codec
+        codec instance
+    """
+    if name not in CODECS:
+        raise ValueError(f"Unknown codec {name}")
+    return CODECS[name]
+
+
+def _is_msgspec_struct(schema: type) -> bool:
+    """Whether the schema is a msgspec Struct."""
+    return msgspec is not None and issubclass(schema, msgspec.Struct)
+
+
+def build_decoder(codec: Codec, schema: type | None = None) -> Decoder:
+    """
+    Build the fastest decoder for a codec and an optional schema.
+
+    JSON payloads validated by a pydantic model are parsed by pydantic-core directly, and msgspec Structs use
+    msgspec's typed decoders, so values are only parsed once.
+
+    Parameters
+    ----------
+    codec : Codec
+        codec of the message values
+    schema : type | None
+        pydantic model or msgspec Struct used to validate the decoded value
+
+    Returns
+    -------
+    Decoder
+        function turning message values into (validated) data
+    """
+    if schema is None:
+        return codec.decode
+
+    is_json = codec.name in ("json", "orjson")
+    if issubclass(schema, BaseModel):
+        if is_json:
+            return schema.model_validate_json
+        return lambda data: schema.model_validate(codec.decode(data))
+
+    if _is_msgspec_struct(schema):
+        if is_json:
+            return msgspec.json.Decoder(schema).decode
+        if codec.name == "msgpack":
+            return msgspec.msgpack.Decoder(schema).decode
+        return lambda data: msgspec.convert(codec.decode(data), schema)
+
+    raise TypeError(f"Unsupported schema {schema!r}, expected a pydantic model or a msgspec Struct")
+
+
+def to_builtins(data: Any) -> Any:
+    """
+    Convert validated data to builtin types which Celery can serialize.
+
+    Parameters
+    ----------
+    data : Any
+        decoded data
+
+    Returns
+    -------
+    Any
+        builtin representation of the data
+    """
+    if isinstance(data, BaseModel):
+        return data.model_dump(mode="json")
+    if msgspec is not None and isinstance(data, msgspec.Struct):
+        return msgspec.to_builtins(data)
+    return data
@@ -0,0 +1,99 @@
+"""Kafka client configurations shared by consumers and producers."""
+import ssl
+from functools import cache
+
+from aiokafka.coordinator.assignors.abstract import AbstractPartitionAssignor
+from aiokafka.coordinator.assignors.range import RangePartitionAssignor
+from aiokafka.coordinator.assignors.roundrobin import RoundRobinPartitionAssignor
+from aiokafka.coordinator.assignors.sticky.sticky_assignor import StickyPartitionAssignor
+from aiokafka.helpers import create_ssl_context
+
+from app.core.config.kafka import KafkaSettings
+
+ASSIGNORS: dict[str, type[AbstractPartitionAssignor]] = {
+    "range": RangePartitionAssignor,
+    "roundrobin": RoundRobinPartitionAssignor,
+    "sticky": StickyPartitionAssignor,
+}
+
+
+@cache
+def default_ssl_context() -> ssl.SSLContext:
+    """Return the SSL context used by every Kafka client of the process."""
+    return create_ssl_context()
+
+
+def default_configs(settings: KafkaSettings | None) -> dict:
+    """
+    Return connection configurations shared by every Kafka client.
+
+    Parameters
+    ----------
+    settings : KafkaSettings | None
+        Kafka settings
+
+    Returns
+    -------
+    dict
+        Kafka client configurations data.
+    """
+    if not settings:
+        return {}
+
+    return {
+        "bootstrap_servers": settings.bootstrap_servers,
+        "ssl_context": default_ssl_context(),
+        "security_protocol": settings.kafka_security_protocol,
+        "sasl_plain_username": settings.kafka_username,
+        "sasl_plain_password": settings.kafka_password,
+        "sasl_mechanism": settings.kafka_mechanism,
+    }
+
+
+def producer_configs(settings: KafkaSettings | None) -> dict:
+    """
+    Return Kafka producer configurations.
+
+    Parameters
+    ----------
+    settings : KafkaSettings | None
+        Kafka settings
+
+    Returns
+    -------
+    dict
+        Kafka producer configurations data.
+    """
+    if not settings:
+        return {}
+
+    return {
+        **default_configs(settings),
+        "acks": settings.producer_acks,
+        "linger_ms": settings.kafka_producer_linger_ms,
+        "max_batch_size": settings.kafka_producer_max_batch_size,
+        "compression_type": settings.kafka_producer_compression_type,
+    }
+
+
+def assignment_strategy(name: str) -> tuple[type[AbstractPartitionAssignor], ...]:
+    """
+    Return the partition assignors offered to the group, by preference.
+
+    The range assignor, Kafka's default, always comes last so that a group keeps working while its members are
+    switched to another strategy.
+
+    Parameters
+    ----------
+    name : str
+        "range" | "roundrobin" | "sticky"
+
+    Returns
+    -------
+    tuple[type[AbstractPartitionAssignor], ...]
+        assignor classes
+    """
+    preferred = ASSIGNORS[name]
+    if preferred is RangePartitionAssignor:
+        return (RangePartitionAssignor,)
+    return (preferred, RangePartitionAssignor)
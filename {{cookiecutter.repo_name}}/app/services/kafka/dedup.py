@@ -0,0 +1,164 @@
+"""Skip Kafka records which were already dispatched."""
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+from typing import Protocol
+
+from aiokafka.structs import ConsumerRecord
+from redis.asyncio import Redis
+
+from app.services.kafka.metrics import DEDUP_HITS, DEDUP_MISSES
+
+
+class DedupCache(Protocol):
+    """Remember the records which were dispatched."""
+
+    backend: str
+
+    async def claim(self, keys: list[str]) -> list[bool]:
+        """Mark keys as seen, returning for each whether it was new."""
+
+    async def release(self, keys: Iterable[str]) -> None:
+        """Forget keys, so that their records are processed again."""
+
+    async def close(self) -> None:
+        """Release the resources of the cache."""
+
+
+class MemoryDedupCache:
+    """
+    Bounded LRU cache of seen keys, local to the consumer process.
+
+    Keys expire after `ttl` seconds, and the least recently seen keys are evicted above `max_size`.
+    """
+
+    backend = "memory"
+
+    def __init__(self, *, ttl: float, max_size: int) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+        self._expires_at: OrderedDict[str, float] = OrderedDict()
+
+    def __len__(self) -> int:
+        """Return the number of cached keys, expired ones included."""
+        return len(self._expires_at)
+
+    async def claim(self, keys: list[str]) -> list[bool]:
+        """Mark keys as seen, returning for each whether it was new."""
+        now = time.monotonic()
+        claimed = []
+        for key in keys:
+            expires_at = self._expires_at.get(key)
+            is_new = expires_at is None or expires_at <= now
+            if is_new:
+                self._expires_at[key] = now + self.ttl
+            self._expires_at.move_to_end(key)
+            claimed.append(is_new)
+
+        while len(self._expires_at) > self.max_size:
+            self._expires_at.popitem(last=False)
+        return claimed
+
+    async def release(self, keys: Iterable[str]) -> None:
+        """Forget keys, so that their records are processed again."""
+        for key in keys:
+            self._expires_at.pop(key, None)
+
+    async def close(self) -> None:
+        """Clear the cache."""
+        self._expires_at.clear()
+
+
+class RedisDedupCache:
+    """
+    Seen keys stored in Redis with `SET NX EX`, shared by every consumer of the group.
+
+    A record redelivered to another replica after a rebalance is skipped as well.
+    """
+
+    backend = "redis"
+
+    def __init__(self, redis: Redis, *, ttl: float, prefix: str = "kafka:dedup:") -> None:
+        self.redis = redis
+        self.ttl = max(int(ttl), 1)
+        self.prefix = prefix
+
+    async def claim(self, keys: list[str]) -> list[bool]:
+        """Mark keys as seen, returning for each whether it was new."""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.set(self.prefix + key, 1, nx=True, ex=self.ttl)
+            results = await pipe.execute()
+        return [bool(result) for result in results]
+
+    async def release(self, keys: Iterable[str]) -> None:
+        """Forget keys, so that their records are processed again."""
+        names = [self.prefix + key for key in keys]
+        if names:
+            await self.redis.delete(*names)
+
+    async def close(self) -> None:
+        """Close the Redis connection."""
+        await self.redis.aclose()
+
+
+def dedup_key(msg: ConsumerRecord, strategy: str) -> str:
+    """
+    Return the key identifying a record.
+
+    Parameters
+    ----------
+    msg : ConsumerRecord
+        consumed record
+    strategy : str
+        "key" uses the message key as an idempotency key, "offset" the record position
+
+    Returns
+    -------
+    str
+        dedup key, records without a key fall back to their position
+    """
+    if strategy == "key" and msg.key is not None:
+        return f"{msg.topic}:k:{msg.key.hex()}"
+    return f"{msg.topic}:{msg.partition}:{msg.offset}"
+
+
+class Deduplicator:
+    """
+    Filter out the records of a chunk which were already dispatched.
+
+    Records are claimed atomically before their dispatch, so two consumers owning a partition in turn around a
+    rebalance do not both dispatch them. The claims of records whose dispatch failed or was cancelled are released.
+    """
+
+    def __init__(self, cache: DedupCache, strategy: str = "offset") -> None:
+        self.cache = cache
+        self.strategy = strategy
+
+    async def filter(self, records: list[ConsumerRecord]) -> list[ConsumerRecord]:
+        """
+        Claim the records and return the ones seen for the first time.
+
+        Parameters
+        ----------
+        records : list[ConsumerRecord]
+            records in partition order
+
+        Returns
+        -------
+        list[ConsumerRecord]
+            records to process
+        """
+        claimed = await self.cache.claim([dedup_key(msg, self.strategy) for msg in records])
+        fresh = [msg for msg, is_new in zip(records, claimed, strict=True) if is_new]
+        DEDUP_MISSES.labels(backend=self.cache.backend).inc(len(fresh))
+        DEDUP_HITS.labels(backend=self.cache.backend).inc(len(records) - len(fresh))
+        return fresh
+
+    async def release(self, records: Iterable[ConsumerRecord]) -> None:
+        """Forget records which failed or were not dispatched, so that a redelivery or a retry processes them."""
+        await self.cache.release(dedup_key(msg, self.strategy) for msg in records)
+
+    async def close(self) -> None:
+        """Close the cache."""
+        await self.cache.close()
@@ -0,0 +1,68 @@
+"""Report the lag of the Kafka consumer."""
+import asyncio
+import contextlib
+import logging
+from typing import TYPE_CHECKING
+
+from aiokafka import AIOKafkaConsumer
+from aiokafka.errors import KafkaError
+
+from app.services.kafka.metrics import PARTITION_LAG
+
+if TYPE_CHECKING:
+    from aiokafka.structs import TopicPartition
+
+logger = logging.getLogger(__name__)
+
+
+class LagMonitor:
+    """
+    Periodically export the lag of every assigned partition.
+
+    Lag is the high-water mark known from the last fetch minus the position of the consumer, so it needs no
+    extra request to the brokers.
+    """
+
+    def __init__(self, consumer: AIOKafkaConsumer, *, interval_ms: int = 5000) -> None:
+        self.consumer = consumer
+        self.interval = interval_ms / 1000
+        self._reported: set[TopicPartition] = set()
+        self._task: asyncio.Task | None = None
+
+    async def update(self) -> None:
+        """Export the lag of the assigned partitions and drop the revoked ones."""
+        assignment = self.consumer.assignment()
+        for tp in self._reported - assignment:
+            with contextlib.suppress(KeyError):
+                PARTITION_LAG.remove(tp.topic, str(tp.partition))
+        self._reported &= assignment
+
+        for tp in assignment:
+            highwater = self.consumer.highwater(tp)
+            if highwater is None:
+                # nothing fetched from the partition yet
+                continue
+            position = await self.consumer.position(tp)
+            PARTITION_LAG.labels(topic=tp.topic, partition=str(tp.partition)).set(max(highwater - position, 0))
+            self._reported.add(tp)
+
+    async def run(self) -> None:
+        """Update the lag periodically until cancelled."""
+        while True:
+            try:
+                await self.update()
+            except KafkaError:
+                logger.exception("Failed to compute consumer lag")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start updating the lag in the background."""
+        self._task = asyncio.create_task(self.run(), name="kafka-lag")
+
+    async def stop(self) -> None:
+        """Stop updating the lag."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
@@ -0,0 +1,196 @@
+"""Ordered processing lanes for consumed Kafka records."""
+import asyncio
+import logging
+import zlib
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass, field
+
+from aiokafka.abc import ConsumerRebalanceListener
+from aiokafka.structs import ConsumerRecord, TopicPartition
+
+from app.services.kafka.metrics import DRAIN_DURATION, REBALANCES
+from app.services.kafka.offsets import OffsetCommitter
+
+logger = logging.getLogger(__name__)
+
+LaneKey = tuple[TopicPartition, int]
+RecordsProcessor = Callable[[list[ConsumerRecord]], Awaitable[None]]
+
+
+@dataclass
+class Lane:
+    """A FIFO queue of record chunks processed by a single worker task."""
+
+    queue: asyncio.Queue
+    task: asyncio.Task = field(init=False)
+
+
+class LanePool:
+    """
+    Bounded pool of ordered processing lanes.
+
+    Records of a partition always go to the same lane (or, with the "key" strategy, records sharing a key do),
+    so ordering holds per partition/key while different lanes progress independently. At most `concurrency`
+    lanes process records at the same time.
+    """
+
+    def __init__(
+        self,
+        process: RecordsProcessor,
+        *,
+        concurrency: int = 1,
+        strategy: str = "partition",
+        max_pending: int = 10,
+    ) -> None:
+        self._process = process
+        self._strategy = strategy
+        self._slots = max(concurrency, 1)
+        self._semaphore = asyncio.Semaphore(self._slots)
+        self._max_pending = max_pending
+        self._lanes: dict[LaneKey, Lane] = {}
+        self._error: Exception | None = None
+
+    @property
+    def partitions(self) -> set[TopicPartition]:
+        """Return partitions which currently own a lane."""
+        return {tp for tp, _ in self._lanes}
+
+    def _slot(self, msg: ConsumerRecord) -> int:
+        """Return the lane slot of a record within its partition."""
+        if self._strategy != "key" or msg.key is None:
+            return 0
+        return zlib.crc32(msg.key) % self._slots
+
+    def _split(self, tp: TopicPartition, records: list[ConsumerRecord]) -> dict[LaneKey, list[ConsumerRecord]]:
+        """Split the records of a partition into per-lane chunks, keeping their order."""
+        if self._strategy != "key":
+            return {(tp, 0): records}
+
+        chunks: dict[LaneKey, list[ConsumerRecord]] = {}
+        for msg in records:
+            chunks.setdefault((tp, self._slot(msg)), []).append(msg)
+        return chunks
+
+    def _open(self, key: LaneKey) -> Lane:
+        """Create the lane and its worker task."""
+        lane = Lane(queue=asyncio.Queue(maxsize=self._max_pending))
+        lane.task = asyncio.create_task(self._run(lane.queue), name=f"kafka-lane-{key[0].topic}-{key[0].partition}")
+        self._lanes[key] = lane
+        logger.debug("Opened lane %s", key)
+        return lane
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        """Process chunks of a lane one after another."""
+        while True:
+            records = await queue.get()
+            try:
+                # once a lane failed, the remaining work is discarded until the consumer stops
+                if self._error is None:
+                    async with self._semaphore:
+                        await self._process(records)
+            except Exception as ex:  # noqa: BLE001
+                self._error = self._error or ex
+            finally:
+                queue.task_done()
+
+    def raise_for_error(self) -> None:
+        """Re-raise the first error raised while processing records."""
+        if self._error is not None:
+            raise self._error
+
+    async def submit(self, tp: TopicPartition, records: list[ConsumerRecord]) -> None:
+        """
+        Queue records of a partition to their lanes.
+
+        Waits when a lane already holds `max_pending` chunks, which stops the consumer from fetching more.
+
+        Parameters
+        ----------
+        tp : TopicPartition
+            partition the records were fetched from
+        records : list[ConsumerRecord]
+            records in partition order
+        """
+        self.raise_for_error()
+        for key, chunk in self._split(tp, records).items():
+            lane = self._lanes.get(key) or self._open(key)
+            await lane.queue.put(chunk)
+
+    async def drain(
+        self,
+        partitions: Iterable[TopicPartition] | None = None,
+        timeout: float | None = None,
+    ) -> set[TopicPartition]:
+        """
+        Wait for queued work to finish and close the lanes.
+
+        Parameters
+        ----------
+        partitions : Iterable[TopicPartition] | None
+            partitions to drain, all lanes when None
+        timeout : float | None
+            seconds to wait before abandoning the remaining work, no limit when None
+
+        Returns
+        -------
+        set[TopicPartition]
+            partitions whose work was abandoned, empty when every lane drained
+        """
+        selected = None if partitions is None else set(partitions)
+        keys = [key for key in self._lanes if selected is None or key[0] in selected]
+        lanes = [self._lanes.pop(key) for key in keys]
+        joins = {asyncio.ensure_future(lane.queue.join()): key for key, lane in zip(keys, lanes, strict=True)}
+        abandoned: set[TopicPartition] = set()
+        try:
+            if joins:
+                _, pending = await asyncio.wait(joins, timeout=timeout)
+                abandoned = {joins[join][0] for join in pending}
+        finally:
+            for join in joins:
+                join.cancel()
+            for lane in lanes:
+                lane.task.cancel()
+            await asyncio.gather(*joins, *(lane.task for lane in lanes), return_exceptions=True)
+        if abandoned:
+            logger.warning("Abandoning in-flight records of %s after %ss", sorted(abandoned), timeout)
+        if keys:
+            logger.debug("Drained %s lanes", len(keys))
+        return abandoned
+
+
+class LaneRebalanceListener(ConsumerRebalanceListener):
+    """
+    Drain the lanes of revoked partitions and commit their offsets before they are handed to another consumer.
+
+    The new owner then resumes exactly where this consumer stopped, instead of redelivering in-flight records.
+    Draining is bounded by `drain_timeout` so a stuck handler cannot stall the rebalance of the whole group, the
+    offsets of partitions abandoned this way are not committed.
+    """
+
+    def __init__(
+        self,
+        lanes: LanePool,
+        committer: OffsetCommitter | None = None,
+        drain_timeout: float | None = None,
+    ) -> None:
+        self.lanes = lanes
+        self.committer = committer
+        self.drain_timeout = drain_timeout
+
+    async def on_partitions_revoked(self, revoked):
+        """Finish in-flight work of revoked partitions and commit it."""
+        logger.info("Partitions revoked: %s", revoked)
+        REBALANCES.labels(event="revoked").inc()
+        with DRAIN_DURATION.labels(reason="rebalance").time():
+            abandoned = await self.lanes.drain(revoked, timeout=self.drain_timeout)
+        if self.committer:
+            # partitions which did not drain in time are left uncommitted, the new owner redelivers their records
+            self.committer.forget(abandoned)
+            # with auto commit, aiokafka commits the consumed positions itself before rebalancing
+            await self.committer.flush()
+            self.committer.forget(revoked)
+
+    async def on_partitions_assigned(self, assigned):
+        """Log newly assigned partitions, their lanes are opened with the first records."""
+        logger.info("Partitions assigned: %s", assigned)
+        REBALANCES.labels(event="assigned").inc()
@@ -0,0 +1,77 @@
+"""Prometheus metrics of the Kafka consumer."""
+from prometheus_client import Counter, Gauge, Histogram
+
+RECORDS_CONSUMED = Counter(
+    "kafka_consumer_records_consumed",
+    "Records fetched by the consumer.",
+    ["topic"],
+)
+RECORDS_DISPATCHED = Counter(
+    "kafka_consumer_records_dispatched",
+    "Records handed to their handler successfully.",
+    ["topic"],
+)
+RECORDS_DROPPED = Counter(
+    "kafka_consumer_records_dropped",
+    "Records dropped by a routing rule without being decoded.",
+    ["topic"],
+)
+RECORDS_FAILED = Counter(
+    "kafka_consumer_records_failed",
+    "Records whose handler failed.",
+    ["topic"],
+)
+FETCH_BATCH_SIZE = Histogram(
+    "kafka_consumer_fetch_batch_size",
+    "Records returned by a fetch.",
+    buckets=(0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000),
+)
+DISPATCH_LATENCY = Histogram(
+    "kafka_consumer_dispatch_latency_seconds",
+    "Time spent handing a lane chunk to its handler.",
+    ["topic"],
+)
+PARTITION_LAG = Gauge(
+    "kafka_consumer_partition_lag",
+    "Records between the consumer position and the high-water mark of a partition.",
+    ["topic", "partition"],
+)
+DRAIN_DURATION = Histogram(
+    "kafka_consumer_drain_duration_seconds",
+    "Time spent finishing in-flight records on rebalance or shutdown.",
+    ["reason"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 20, 30, 60),
+)
+REBALANCES = Counter(
+    "kafka_consumer_rebalances",
+    "Partitions assigned to or revoked from the consumer.",
+    ["event"],
+)
+
+BACKPRESSURE_PAUSES = Counter(
+    "kafka_consumer_backpressure_pauses",
+    "Times the consumer paused its partitions because the Celery queues were saturated.",
+)
+BACKPRESSURE_RESUMES = Counter(
+    "kafka_consumer_backpressure_resumes",
+    "Times the consumer resumed its partitions after the Celery queues drained.",
+)
+BACKPRESSURE_PAUSED = Gauge(
+    "kafka_consumer_backpressure_paused",
+    "1 while the consumer is paused by backpressure.",
+)
+CELERY_QUEUE_DEPTH = Gauge(
+    "kafka_consumer_celery_queue_depth",
+    "Messages waiting in a Celery queue fed by the consumer.",
+    ["queue"],
+)
+DEDUP_HITS = Counter(
+    "kafka_consumer_dedup_hits",
+    "Records skipped because they were already dispatched.",
+    ["backend"],
+)
+DEDUP_MISSES = Counter(
+    "kafka_consumer_dedup_misses",
+    "Records seen for the first time by the dedup cache.",
+    ["backend"],
+)
@@ -0,0 +1,132 @@
+"""Manual offset management for the Kafka consumer."""
+import asyncio
+import contextlib
+import logging
+import time
+from collections import deque
+from collections.abc import Iterable
+
+from aiokafka import AIOKafkaConsumer
+from aiokafka.errors import KafkaError
+from aiokafka.structs import TopicPartition
+
+logger = logging.getLogger(__name__)
+
+
+class OffsetTracker:
+    """
+    Track processed offsets per partition.
+
+    Records may finish out of order (e.g. with per-key lanes), so only the highest offset below which every
+    record has been processed is considered committable.
+    """
+
+    def __init__(self) -> None:
+        self._pending: dict[TopicPartition, deque[int]] = {}
+        self._done: dict[TopicPartition, set[int]] = {}
+        self._committable: dict[TopicPartition, int] = {}
+
+    def track(self, tp: TopicPartition, offsets: Iterable[int]) -> None:
+        """Register fetched offsets of a partition, in fetch order."""
+        self._pending.setdefault(tp, deque()).extend(offsets)
+
+    def ack(self, tp: TopicPartition, offsets: Iterable[int]) -> int:
+        """
+        Mark offsets as processed.
+
+        Parameters
+        ----------
+        tp : TopicPartition
+            partition of the offsets
+        offsets : Iterable[int]
+            processed offsets
+
+        Returns
+        -------
+        int
+            number of offsets which became committable
+        """
+        pending = self._pending.get(tp)
+        if pending is None:
+            return 0
+
+        done = self._done.setdefault(tp, set())
+        done.update(offsets)
+        advanced = 0
+        while pending and pending[0] in done:
+            offset = pending.popleft()
+            done.discard(offset)
+            self._committable[tp] = offset + 1
+            advanced += 1
+        return advanced
+
+    def pop_committable(self) -> dict[TopicPartition, int]:
+        """Return and reset the offsets to commit, i.e. the next offset to consume per partition."""
+        offsets, self._committable = self._committable, {}
+        return offsets
+
+    def forget(self, partitions: Iterable[TopicPartition]) -> None:
+        """Stop tracking partitions, e.g. after they were revoked."""
+        for tp in partitions:
+            self._pending.pop(tp, None)
+            self._done.pop(tp, None)
+            self._committable.pop(tp, None)
+
+
+class OffsetCommitter:
+    """Commit processed offsets in the background once enough records or time have passed."""
+
+    def __init__(self, consumer: AIOKafkaConsumer, *, batch_size: int = 500, interval_ms: int = 5000) -> None:
+        self.consumer = consumer
+        self.tracker = OffsetTracker()
+        self.batch_size = batch_size
+        self.interval = interval_ms / 1000
+        self._uncommitted = 0
+        self._last_commit = time.monotonic()
+        self._task: asyncio.Task | None = None
+
+    def track(self, tp: TopicPartition, offsets: Iterable[int]) -> None:
+        """Register fetched offsets of a partition."""
+        self.tracker.track(tp, offsets)
+
+    def ack(self, tp: TopicPartition, offsets: Iterable[int]) -> None:
+        """Mark offsets as processed and commit when the size threshold is reached."""
+        self._uncommitted += self.tracker.ack(tp, offsets)
+        if self._uncommitted >= self.batch_size:
+            self._schedule()
+
+    def maybe_commit(self) -> None:
+        """Commit when the time threshold is reached, called on every poll."""
+        if self._uncommitted and time.monotonic() - self._last_commit >= self.interval:
+            self._schedule()
+
+    def _schedule(self) -> None:
+        """Start a background commit unless one is already running."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._commit())
+
+    async def _commit(self) -> None:
+        """Commit the committable offsets."""
+        offsets = self.tracker.pop_committable()
+        self._uncommitted = 0
+        self._last_commit = time.monotonic()
+        if not offsets:
+            return
+
+        try:
+            await self.consumer.commit(offsets)
+            logger.debug("Committed offsets %s", offsets)
+        except KafkaError:
+            # the records will be redelivered, which is fine for at-least-once processing
+            logger.exception("Failed to commit offsets %s", offsets)
+
+    async def flush(self) -> None:
+        """Wait for the running commit and commit everything processed since."""
+        if self._task is not None:
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+        await self._commit()
+
+    def forget(self, partitions: Iterable[TopicPartition]) -> None:
+        """Stop tracking revoked partitions."""
+        self.tracker.forget(partitions)
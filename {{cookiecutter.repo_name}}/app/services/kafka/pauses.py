@@ -0,0 +1,58 @@
+"""Partition pauses shared by the components of the consumer."""
+from typing import TYPE_CHECKING
+
+from aiokafka import AIOKafkaConsumer
+
+if TYPE_CHECKING:
+    from aiokafka.structs import TopicPartition
+
+# holders of partition pauses
+BACKPRESSURE = "backpressure"
+RETRY = "retry"
+
+
+class PauseRegistry:
+    """
+    Pause partitions on behalf of several holders.
+
+    A partition is paused by its first holder and only resumed once every holder released it, so that retries
+    held back until they are due and backpressure do not resume each other's partitions.
+    """
+
+    def __init__(self, consumer: AIOKafkaConsumer) -> None:
+        self.consumer = consumer
+        self._holders: dict[TopicPartition, set[str]] = {}
+
+    def held_by(self, holder: str) -> set["TopicPartition"]:
+        """Return the partitions a holder keeps paused."""
+        return {tp for tp, holders in self._holders.items() if holder in holders}
+
+    def pause(self, holder: str, *partitions: "TopicPartition") -> None:
+        """
+        Pause partitions on behalf of a holder.
+
+        Partitions already held are paused again when the consumer no longer pauses them, as after being
+        revoked and assigned back.
+        """
+        for tp in partitions:
+            self._holders.setdefault(tp, set()).add(holder)
+
+        paused = self.consumer.paused()
+        unpaused = [tp for tp in partitions if tp not in paused]
+        if unpaused:
+            self.consumer.pause(*unpaused)
+
+    def resume(self, holder: str, *partitions: "TopicPartition") -> None:
+        """Release partitions held by a holder, resuming the assigned ones no other holder keeps paused."""
+        released = []
+        for tp in partitions:
+            holders = self._holders.get(tp, set())
+            holders.discard(holder)
+            if not holders:
+                self._holders.pop(tp, None)
+                released.append(tp)
+
+        assigned = self.consumer.assignment()
+        resumable = [tp for tp in released if tp in assigned]
+        if resumable:
+            self.consumer.resume(*resumable)
@@ -0,0 +1,173 @@
+"""Process-wide Kafka producer."""
+import asyncio
+import logging
+from collections.abc import Callable, Iterable
+from typing import NamedTuple
+
+from aiokafka import AIOKafkaProducer
+from aiokafka.structs import RecordMetadata
+
+from app.core.config import KafkaSettings, get_settings
+from app.services.kafka.configs import producer_configs
+
+logger = logging.getLogger(__name__)
+
+Headers = list[tuple[str, bytes]]
+
+
+class ProducerMessage(NamedTuple):
+    """A message to send with `KafkaProducerManager.send_many`."""
+
+    topic: str
+    value: bytes
+    key: bytes | None = None
+    headers: Headers | None = None
+
+
+class KafkaProducerManager:
+    """
+    Long-lived Kafka producer shared by the whole process.
+
+    The producer is started once (FastAPI lifespan, consumer startup, or lazily on the first send) and keeps its
+    connections and metadata, so sends are batched by `linger_ms` instead of paying a handshake per message.
+    """
+
+    # swapped by tests and benchmarks for an in-memory producer
+    producer_class: Callable[..., AIOKafkaProducer] = AIOKafkaProducer
+
+    def __init__(self, kafka_settings: KafkaSettings | None = None) -> None:
+        self._settings = kafka_settings
+        self._producer: AIOKafkaProducer | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def settings(self) -> KafkaSettings:
+        """Return Kafka settings, loaded on first use so importing this module never requires them."""
+        if self._settings is None:
+            self._settings = get_settings("kafka")
+        return self._settings
+
+    @property
+    def started(self) -> bool:
+        """Whether the producer is running."""
+        return self._producer is not None
+
+    async def start(self) -> AIOKafkaProducer:
+        """Start the producer if it is not running yet."""
+        async with self._lock:
+            producer = self._producer
+            if producer is None:
+                producer = self.producer_class(**producer_configs(self.settings))
+                await producer.start()
+                self._producer = producer
+                logger.info("Kafka producer started")
+            return producer
+
+    async def stop(self) -> None:
+        """Flush pending messages and stop the producer."""
+        async with self._lock:
+            if self._producer is None:
+                return
+            producer, self._producer = self._producer, None
+            await producer.stop()
+            logger.info("Kafka producer stopped")
+
+    async def _get_producer(self) -> AIOKafkaProducer:
+        """Return the running producer, starting it if needed."""
+        if self._producer is not None:
+            return self._producer
+        return await self.start()
+
+    async def send(
+        self,
+        topic: str,
+        value: bytes,
+        key: bytes | None = None,
+        headers: Headers | None = None,
+    ) -> asyncio.Future:
+        """
+        Queue a message without waiting for the broker acknowledgement.
+
+        Delivery failures are logged; await the returned future to handle them yourself.
+
+        Parameters
+        ----------
+        topic : str
+            kafka topic to produce the message to
+        value : bytes
+            encoded message
+        key : bytes | None
+            message key
+        headers : Headers | None
+            message headers
+
+        Returns
+        -------
+        asyncio.Future
+            future resolved with the `RecordMetadata` once the message is acknowledged
+        """
+        producer = await self._get_producer()
+        future = await producer.send(topic, value=value, key=key, headers=headers)
+        future.add_done_callback(_log_delivery_failure)
+        return future
+
+    async def send_and_wait(
+        self,
+        topic: str,
+        value: bytes,
+        key: bytes | None = None,
+        headers: Headers | None = None,
+    ) -> RecordMetadata:
+        """
+        Send a message and wait for the broker acknowledgement.
+
+        Parameters
+        ----------
+        topic : str
+            kafka topic to produce the message to
+        value : bytes
+            encoded message
+        key : bytes | None
+            message key
+        headers : Headers | None
+            message headers
+
+        Returns
+        -------
+        RecordMetadata
+            metadata of the written record
+        """
+        producer = await self._get_producer()
+        return await producer.send_and_wait(topic, value=value, key=key, headers=headers)
+
+    async def send_many(self, messages: Iterable[ProducerMessage]) -> list[RecordMetadata]:
+        """
+        Send messages in bulk and wait until all of them are acknowledged.
+
+        Messages are queued back to back so the producer packs them into as few requests as possible.
+
+        Parameters
+        ----------
+        messages : Iterable[ProducerMessage]
+            messages to send
+
+        Returns
+        -------
+        list[RecordMetadata]
+            metadata of the written records, in the order of `messages`
+        """
+        producer = await self._get_producer()
+        futures = [
+            await producer.send(msg.topic, value=msg.value, key=msg.key, headers=msg.headers) for msg in messages
+        ]
+        return list(await asyncio.gather(*futures))
+
+
+def _log_delivery_failure(future: asyncio.Future) -> None:
+    """Log messages the broker did not acknowledge."""
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Failed to deliver Kafka message", exc_info=future.exception())
+
+
+# process-wide producer, started by the web app lifespan and the consumer
+kafka_producer = KafkaProducerManager()
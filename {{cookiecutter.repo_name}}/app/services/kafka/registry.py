@@ -0,0 +1,193 @@
+"""Registry of Kafka topic handlers."""
+import importlib
+import inspect
+import logging
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
+from typing import Any
+
+from app.services.kafka.codecs import Codec, Decoder, build_decoder, get_codec
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class KafkaHandler:
+    """A handler registered for a Kafka topic."""
+
+    topic: str
+    handler: Any
+    codec: Codec
+    schema: type | None = None
+    # seconds an in-process handler may run, the consumer default applies when None
+    timeout: float | None = None
+    # Celery queue and priority of the published tasks, overriding the ones of the task and `task_routes`
+    queue: str | None = None
+    priority: int | None = None
+    decode: Decoder = field(init=False, repr=False)
+    # `async def` handlers run in the consumer event loop instead of being published to Celery
+    is_async: bool = field(init=False)
+
+    def __post_init__(self) -> None:
+        """Build the decoder once instead of resolving codec and schema for every message."""
+        object.__setattr__(self, "decode", build_decoder(self.codec, self.schema))
+        object.__setattr__(self, "is_async", inspect.iscoroutinefunction(self.handler))
+
+    @property
+    def publish_options(self) -> dict[str, Any]:
+        """Return the Celery publishing options set for the topic."""
+        options: dict[str, Any] = {}
+        if self.queue is not None:
+            options["queue"] = self.queue
+        if self.priority is not None:
+            options["priority"] = self.priority
+        return options
+
+
+class HandlerRegistry:
+    """Topic to handler mapping filled by the `kafka_handler` decorator."""
+
+    def __init__(self) -> None:
+        self._handlers: dict[str, KafkaHandler] = {}
+
+    def __contains__(self, topic: object) -> bool:
+        """Whether a handler is registered for the topic."""
+        return topic in self._handlers
+
+    def __iter__(self) -> Iterator[KafkaHandler]:
+        """Iterate over registered handlers."""
+        return iter(self._handlers.values())
+
+    @property
+    def topics(self) -> list[str]:
+        """Return topics with a registered handler."""
+        return list(self._handlers)
+
+    def get(self, topic: str) -> KafkaHandler | None:
+        """Return the handler registered for a topic."""
+        return self._handlers.get(topic)
+
+    def register(
+        self,
+        topic: str,
+        handler: Any,
+        *,
+        codec: str = "orjson",
+        schema: type | None = None,
+        timeout: float | None = None,
+        queue: str | None = None,
+        priority: int | None = None,
+    ) -> KafkaHandler:
+        """
+        Register a handler for a topic.
+
+        Parameters
+        ----------
+        topic : str
+            Kafka topic
+        handler : Any
+            Celery task, or `async def` function run in the consumer, receiving the decoded message value
+        codec : str, default "orjson"
+            codec of the message values, see `app.services.kafka.codecs.CODECS`
+        schema : type | None
+            pydantic model or msgspec Struct validating the decoded value
+        timeout : float | None
+            seconds an `async def` handler may run for a message
+        queue : str | None
+            Celery queue the tasks of the topic are published to, instead of the queue of the task
+        priority : int | None
+            priority of the published tasks, 0 is the highest with the Redis broker
+
+        Returns
+        -------
+        KafkaHandler
+            registered handler
+        """
+        registered = self._handlers.get(topic)
+        if registered is not None and registered.handler is not handler:
+            raise ValueError(f"Topic {topic} is already handled by {registered.handler!r}")
+
+        entry = KafkaHandler(
+            topic=topic,
+            handler=handler,
+            codec=get_codec(codec),
+            schema=schema,
+            timeout=timeout,
+            queue=queue,
+            priority=priority,
+        )
+        self._handlers[topic] = entry
+        return entry
+
+
+registry = HandlerRegistry()
+
+
+def kafka_handler(
+    topic: str,
+    *,
+    codec: str = "orjson",
+    schema: type | None = None,
+    timeout: float | None = None,
+    queue: str | None = None,
+    priority: int | None = None,
+) -> Callable[[Any], Any]:
+    """
+    Register the decorated Celery task or `async def` function as the handler of a Kafka topic.
+
+    Celery tasks are published to the broker, while `async def` handlers run directly in the consumer event
+    loop, skipping the broker hop for lightweight work.
+
+    Parameters
+    ----------
+    topic : str
+        Kafka topic
+    codec : str, default "orjson"
+        codec of the message values
+    schema : type | None
+        pydantic model or msgspec Struct validating the decoded value
+    timeout : float | None
+        seconds an `async def` handler may run for a message
+    queue : str | None
+        Celery queue the tasks of the topic are published to, instead of the queue of the task
+    priority : int | None
+        priority of the published tasks, 0 is the highest with the Redis broker
+
+    Returns
+    -------
+    Callable
+        decorator returning the handler unchanged
+    """
+
+    def decorator(handler: Any) -> Any:
+        registry.register(
+            topic,
+            handler,
+            codec=codec,
+            schema=schema,
+            timeout=timeout,
+            queue=queue,
+            priority=priority,
+        )
+        return handler
+
+    return decorator
+
+
+def discover_handlers() -> HandlerRegistry:
+    """
+    Import the task modules so their `kafka_handler` decorators register.
+
+    Modules are found the same way the Celery worker finds them, and importing the worker also configures the
+    Celery app used to publish tasks from this process.
+
+    Returns
+    -------
+    HandlerRegistry
+        the populated registry
+    """
+    from app.worker import get_modules
+
+    for module in get_modules():
+        importlib.import_module(module)
+    return registry
@@ -0,0 +1,194 @@
+"""Non-blocking retries of failed Kafka records through retry and dead-letter topics."""
+import asyncio
+import logging
+import re
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from aiokafka import AIOKafkaConsumer
+from aiokafka.structs import ConsumerRecord, TopicPartition
+
+from app.services.kafka.pauses import RETRY, PauseRegistry
+from app.services.kafka.producer import Headers, ProducerMessage
+
+logger = logging.getLogger(__name__)
+
+ATTEMPT_HEADER = "x-retry-attempt"
+ERROR_HEADER = "x-retry-error"
+NOT_BEFORE_HEADER = "x-retry-not-before"
+ORIGINAL_TOPIC_HEADER = "x-original-topic"
+RETRY_HEADERS = frozenset({ATTEMPT_HEADER, ERROR_HEADER, NOT_BEFORE_HEADER, ORIGINAL_TOPIC_HEADER})
+# error messages are cut to keep headers small
+MAX_ERROR_LENGTH = 500
+
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600}
+
+
+@dataclass(frozen=True)
+class RetryTier:
+    """A retry topic suffix and the delay before its records are processed again."""
+
+    name: str
+    delay: float
+
+
+def parse_tiers(value: str) -> list[RetryTier]:
+    """
+    Parse retry tiers from a comma separated list of durations.
+
+    Parameters
+    ----------
+    value : str
+        durations such as "30s,1m,10m,1h"
+
+    Returns
+    -------
+    list[RetryTier]
+        tiers in the given order
+    """
+    tiers = []
+    for name in filter(None, (part.strip() for part in value.split(","))):
+        match = re.fullmatch(r"(\d+)([smh])", name)
+        if not match:
+            raise ValueError(f"Invalid retry tier {name}, expected a duration such as 30s, 1m or 1h")
+        tiers.append(RetryTier(name=name, delay=int(match.group(1)) * _DURATION_UNITS[match.group(2)]))
+    return tiers
+
+
+def _header(msg: ConsumerRecord, name: str) -> bytes | None:
+    """Return the value of a record header."""
+    for key, value in msg.headers or ():
+        if key == name:
+            return value
+    return None
+
+
+class RetryPolicy:
+    """
+    Route failed records to `<topic>.retry.<tier>` topics, then to `<topic>.dlq` once the tiers are exhausted.
+
+    Records keep their key and value; attempt, error, original topic and the earliest time to process them again
+    travel as headers.
+    """
+
+    def __init__(self, topics: Iterable[str], tiers: list[RetryTier]) -> None:
+        self.tiers = tiers
+        self._source_topics = {self.retry_topic(topic, tier): topic for topic in topics for tier in tiers}
+
+    @staticmethod
+    def retry_topic(topic: str, tier: RetryTier) -> str:
+        """Return the retry topic of a tier."""
+        return f"{topic}.retry.{tier.name}"
+
+    @staticmethod
+    def dlq_topic(topic: str) -> str:
+        """Return the dead-letter topic."""
+        return f"{topic}.dlq"
+
+    @property
+    def retry_topics(self) -> list[str]:
+        """Return every retry topic, to subscribe to."""
+        return list(self._source_topics)
+
+    def is_retry_topic(self, topic: str) -> bool:
+        """Whether the topic is a retry topic."""
+        return topic in self._source_topics
+
+    def source_topic(self, topic: str) -> str:
+        """Return the topic whose handler processes records of `topic`."""
+        return self._source_topics.get(topic, topic)
+
+    @staticmethod
+    def attempt(msg: ConsumerRecord) -> int:
+        """Return how many times the record already failed."""
+        value = _header(msg, ATTEMPT_HEADER)
+        return int(value) if value else 0
+
+    @staticmethod
+    def not_before(msg: ConsumerRecord) -> int | None:
+        """Return the timestamp (ms) before which the record must not be processed."""
+        value = _header(msg, NOT_BEFORE_HEADER)
+        return int(value) if value else None
+
+    def next_message(self, msg: ConsumerRecord, error: Exception) -> ProducerMessage:
+        """
+        Build the message republishing a failed record to its next tier, or to the dead-letter topic.
+
+        Parameters
+        ----------
+        msg : ConsumerRecord
+            failed record
+        error : Exception
+            processing error
+
+        Returns
+        -------
+        ProducerMessage
+            message to produce
+        """
+        topic = self.source_topic(msg.topic)
+        attempt = self.attempt(msg) + 1
+        headers: Headers = [(key, value) for key, value in msg.headers or () if key not in RETRY_HEADERS]
+        headers += [
+            (ATTEMPT_HEADER, str(attempt).encode()),
+            (ERROR_HEADER, f"{type(error).__name__}: {error}"[:MAX_ERROR_LENGTH].encode()),
+            (ORIGINAL_TOPIC_HEADER, topic.encode()),
+        ]
+
+        if attempt > len(self.tiers):
+            return ProducerMessage(topic=self.dlq_topic(topic), value=msg.value, key=msg.key, headers=headers)
+
+        tier = self.tiers[attempt - 1]
+        not_before = int((time.time() + tier.delay) * 1000)
+        headers.append((NOT_BEFORE_HEADER, str(not_before).encode()))
+        return ProducerMessage(topic=self.retry_topic(topic, tier), value=msg.value, key=msg.key, headers=headers)
+
+
+class RetryGate:
+    """
+    Hold back retry records until their backoff elapsed.
+
+    Records of a retry topic are ordered by their retry time, so the partition is rewound to the first record
+    which is not due yet and paused until it is. The partition stays paused after that while another component,
+    such as backpressure, holds it in `pauses`.
+    """
+
+    def __init__(self, consumer: AIOKafkaConsumer, policy: RetryPolicy, pauses: PauseRegistry | None = None) -> None:
+        self.consumer = consumer
+        self.policy = policy
+        self.pauses = pauses if pauses is not None else PauseRegistry(consumer)
+
+    def admit(self, tp: TopicPartition, records: list[ConsumerRecord]) -> list[ConsumerRecord]:
+        """
+        Return the records which are due, pausing the partition when some are not.
+
+        Parameters
+        ----------
+        tp : TopicPartition
+            partition the records were fetched from
+        records : list[ConsumerRecord]
+            records in partition order
+
+        Returns
+        -------
+        list[ConsumerRecord]
+            records to process now
+        """
+        if not self.policy.is_retry_topic(tp.topic):
+            return records
+
+        now = time.time() * 1000
+        for index, msg in enumerate(records):
+            not_before = self.policy.not_before(msg)
+            if not_before is not None and not_before > now:
+                self.consumer.seek(tp, msg.offset)
+                self.pauses.pause(RETRY, tp)
+                asyncio.get_running_loop().call_later((not_before - now) / 1000, self._resume, tp)
+                logger.debug("Delaying %s until %s", tp, not_before)
+                return records[:index]
+        return records
+
+    def _resume(self, tp: TopicPartition) -> None:
+        """Release a delayed partition once its next record is due."""
+        self.pauses.resume(RETRY, tp)
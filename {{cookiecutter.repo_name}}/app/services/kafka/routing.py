@@ -0,0 +1,82 @@
+"""Route Kafka records by headers and key, before their value is decoded."""
+import fnmatch
+import re
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from aiokafka.structs import ConsumerRecord
+
+from app.core.config.kafka import KafkaRouteRule
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    """A routing rule with its header values encoded and its key pattern compiled."""
+
+    rule: KafkaRouteRule
+    headers: tuple[tuple[str, bytes], ...]
+    key: re.Pattern[bytes] | None
+
+    @classmethod
+    def compile(cls, rule: KafkaRouteRule) -> "CompiledRule":
+        """Prepare a rule for matching raw records."""
+        key = re.compile(fnmatch.translate(rule.key).encode()) if rule.key is not None else None
+        headers = tuple((name, value.encode()) for name, value in rule.headers.items())
+        return cls(rule=rule, headers=headers, key=key)
+
+    def matches(self, msg: ConsumerRecord) -> bool:
+        """Whether the record matches the topic, headers and key of the rule."""
+        if self.rule.topic is not None and self.rule.topic != msg.topic:
+            return False
+        if self.key is not None and (msg.key is None or not self.key.match(msg.key)):
+            return False
+        if self.headers:
+            record_headers = dict(msg.headers or ())
+            return all(record_headers.get(name) == value for name, value in self.headers)
+        return True
+
+
+class Router:
+    """
+    Apply routing rules to consumed records.
+
+    Rules only look at the topic, headers and key, so records which are dropped are never decoded.
+    """
+
+    def __init__(self, rules: Iterable[KafkaRouteRule]) -> None:
+        self._rules = [CompiledRule.compile(rule) for rule in rules]
+
+    @property
+    def queues(self) -> set[str]:
+        """Return the Celery queues records can be routed to."""
+        return {compiled.rule.queue for compiled in self._rules if compiled.rule.queue}
+
+    def match(self, msg: ConsumerRecord) -> KafkaRouteRule | None:
+        """Return the first rule matching the record."""
+        for compiled in self._rules:
+            if compiled.matches(msg):
+                return compiled.rule
+        return None
+
+    def split(self, records: list[ConsumerRecord]) -> dict[str | None, list[ConsumerRecord]]:
+        """
+        Group records by destination queue, leaving dropped records out.
+
+        Parameters
+        ----------
+        records : list[ConsumerRecord]
+            records in partition order
+
+        Returns
+        -------
+        dict[str | None, list[ConsumerRecord]]
+            records per Celery queue, in order, None being the queue of the handler
+        """
+        routes: dict[str | None, list[ConsumerRecord]] = {}
+        for msg in records:
+            rule = self.match(msg)
+            if rule is None:
+                routes.setdefault(None, []).append(msg)
+            elif rule.action == "route":
+                routes.setdefault(rule.queue, []).append(msg)
+        return routes
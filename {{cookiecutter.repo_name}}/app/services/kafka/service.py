@@ -0,0 +1,548 @@
+"""Kafka Service."""
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from collections.abc import Callable, Mapping
+from types import MappingProxyType
+
+from aiokafka import AIOKafkaConsumer
+from aiokafka.structs import ConsumerRecord, TopicPartition
+from celery import Task, group
+from redis.asyncio import Redis
+from sentry_sdk import capture_exception
+
+from app.constants import CELERY_QUEUE
+from app.core.config import CelerySettings, get_settings
+from app.core.config.kafka import KafkaSettings
+from app.services.kafka.backpressure import BackpressureMonitor
+from app.services.kafka.codecs import get_codec, to_builtins
+from app.services.kafka.configs import assignment_strategy, default_configs
+from app.services.kafka.dedup import DedupCache, Deduplicator, MemoryDedupCache, RedisDedupCache
+from app.services.kafka.lag import LagMonitor
+from app.services.kafka.lanes import LanePool, LaneRebalanceListener
+from app.services.kafka.metrics import (
+    DISPATCH_LATENCY,
+    DRAIN_DURATION,
+    FETCH_BATCH_SIZE,
+    RECORDS_CONSUMED,
+    RECORDS_DISPATCHED,
+    RECORDS_DROPPED,
+    RECORDS_FAILED,
+)
+from app.services.kafka.offsets import OffsetCommitter
+from app.services.kafka.pauses import PauseRegistry
+from app.services.kafka.producer import kafka_producer
+from app.services.kafka.registry import HandlerRegistry, KafkaHandler, discover_handlers
+from app.services.kafka.retry import RetryGate, RetryPolicy, parse_tiers
+from app.services.kafka.routing import Router
+
+logger = logging.getLogger(__name__)
+
+# a record which could not be processed, with the error
+Failure = tuple[ConsumerRecord, Exception]
+
+
+class KafkaService:
+    """Kafka Service."""
+
+    # swapped by tests and benchmarks for an in-memory consumer
+    consumer_class: Callable[..., AIOKafkaConsumer] = AIOKafkaConsumer
+
+    def __init__(
+        self,
+        kafka_settings: KafkaSettings | None,
+        registry: HandlerRegistry | None = None,
+        *,
+        instance_index: int = 0,
+    ) -> None:
+        self.settings = kafka_settings
+        # consumer processes of a pod need distinct static member ids
+        self.instance_index = instance_index
+        self.registry: HandlerRegistry = registry if registry is not None else discover_handlers()
+        self.committer: OffsetCommitter | None = None
+        self.retry_policy: RetryPolicy | None = None
+        self.retry_gate: RetryGate | None = None
+        self.deduplicator: Deduplicator | None = None
+        self.router: Router | None = None
+        if kafka_settings and kafka_settings.kafka_routing_rules:
+            self.router = Router(kafka_settings.kafka_routing_rules)
+        if kafka_settings and kafka_settings.kafka_retry_enabled:
+            self.retry_policy = RetryPolicy(self.registry.topics, parse_tiers(kafka_settings.kafka_retry_tiers))
+        self._async_handler_semaphore = asyncio.Semaphore(
+            kafka_settings.kafka_async_handler_concurrency if kafka_settings else 1,
+        )
+
+    @property
+    def handlers(self) -> Mapping[str, Task]:
+        """Return the Celery task registered for every topic, in-process handlers excluded."""
+        return MappingProxyType({entry.topic: entry.handler for entry in self.registry if not entry.is_async})
+
+    @property
+    def subscribed_topics(self):
+        """Get subscribed topics, retry topics included."""
+        if self.retry_policy:
+            return self.registry.topics + self.retry_policy.retry_topics
+        return self.registry.topics
+
+    @property
+    def is_batch_mode(self) -> bool:
+        """Whether records are polled and dispatched in batches."""
+        return self.settings is not None and self.settings.kafka_consume_mode == "batch"
+
+    @property
+    def default_configs(self):
+        """Return kafka default configurations.
+
+        Returns
+        -------
+        dict
+            Kafka consumer configurations data.
+        """
+        return default_configs(self.settings)
+
+    @property
+    def consumer_configs(self) -> dict:
+        """
+        Returning kafka consumer configurations.
+
+        Returns
+        -------
+        dict
+            Kafka consumer configurations data.
+        """
+        if not self.settings:
+            return {}
+
+        extra_configs = {
+            "group_id": self.settings.kafka_group_id,
+            "enable_auto_commit": self.settings.kafka_commit_mode == "auto",
+            "consumer_timeout_ms": int(self.settings.kafka_consumer_timeout),
+            "auto_commit_interval_ms": int(self.settings.kafka_auto_commit_interval_ms),
+            "max_poll_records": int(self.settings.kafka_max_poll_records),
+            "session_timeout_ms": int(self.settings.kafka_session_time_out_ms),
+            "heartbeat_interval_ms": self.settings.kafka_heartbeat_interval_ms,
+            "partition_assignment_strategy": assignment_strategy(self.settings.kafka_partition_assignment_strategy),
+        }
+        if self.settings.group_instance_id:
+            extra_configs["group_instance_id"] = f"{self.settings.group_instance_id}-{self.instance_index}"
+
+        return {
+            **self.default_configs,
+            **extra_configs,
+        }
+
+    @property
+    def dispatch_queues(self) -> set[str]:
+        """Return the Celery queues the handlers and routing rules publish to."""
+        queues = {
+            entry.queue or getattr(entry.handler, "queue", None) or CELERY_QUEUE
+            for entry in self.registry
+            if not entry.is_async
+        }
+        if self.router:
+            queues |= self.router.queues
+        return queues
+
+    def _build_monitors(
+        self,
+        consumer: AIOKafkaConsumer,
+        settings: KafkaSettings,
+        pauses: PauseRegistry,
+    ) -> list[BackpressureMonitor | LagMonitor]:
+        """Create the enabled background monitors of the consumer."""
+        monitors: list[BackpressureMonitor | LagMonitor] = []
+        if settings.kafka_backpressure_enabled:
+            celery_settings: CelerySettings = get_settings("celery")
+            monitors.append(
+                BackpressureMonitor(
+                    consumer,
+                    Redis.from_url(celery_settings.celery_broker_url),
+                    self.dispatch_queues,
+                    high_watermark=settings.kafka_backpressure_high_watermark,
+                    low_watermark=settings.kafka_backpressure_low_watermark,
+                    interval_ms=settings.kafka_backpressure_interval_ms,
+                    priority_steps=celery_settings.celery_priority_steps,
+                    pauses=pauses,
+                ),
+            )
+        if settings.kafka_metrics_enabled:
+            monitors.append(LagMonitor(consumer, interval_ms=settings.kafka_lag_interval_ms))
+        return monitors
+
+    def _build_deduplicator(self, settings: KafkaSettings) -> Deduplicator | None:
+        """Create the cache of dispatched records, if enabled."""
+        if settings.kafka_dedup_backend == "none":
+            return None
+
+        cache: DedupCache
+        if settings.kafka_dedup_backend == "memory":
+            cache = MemoryDedupCache(ttl=settings.kafka_dedup_ttl_s, max_size=settings.kafka_dedup_max_size)
+        else:
+            celery_settings: CelerySettings = get_settings("celery")
+            redis_url = settings.kafka_dedup_redis_url or celery_settings.celery_broker_url
+            cache = RedisDedupCache(
+                Redis.from_url(redis_url),
+                ttl=settings.kafka_dedup_ttl_s,
+                prefix=f"kafka:dedup:{settings.kafka_group_id}:",
+            )
+        return Deduplicator(cache, settings.kafka_dedup_strategy)
+
+    async def count_partitions(self) -> int:
+        """
+        Count the partitions of the subscribed topics.
+
+        Returns
+        -------
+        int
+            total number of partitions, 0 when the topics do not exist yet
+        """
+        consumer = self.consumer_class(**self.default_configs)
+        await consumer.start()
+        try:
+            # fetch metadata of every topic, partitions are unknown until then
+            await consumer.topics()
+            return sum(len(consumer.partitions_for_topic(topic) or ()) for topic in self.subscribed_topics)
+        finally:
+            await consumer.stop()
+
+    async def consume(self, shutdown_event: asyncio.Event) -> None:
+        """Kafka service consume message."""
+        if self.settings is None:
+            raise RuntimeError("Kafka settings are required to consume messages.")
+
+        settings = self.settings
+        topics = list(self.subscribed_topics)
+        lanes = LanePool(
+            self._process_records,
+            concurrency=settings.kafka_concurrency,
+            strategy=settings.kafka_lane_strategy,
+            max_pending=settings.kafka_lane_max_pending,
+        )
+        consumer = self.consumer_class(**self.consumer_configs)
+        # backpressure and retry delays pause partitions independently, a partition resumes once both released it
+        pauses = PauseRegistry(consumer)
+        self.deduplicator = self._build_deduplicator(settings)
+        if settings.kafka_commit_mode == "manual":
+            self.committer = OffsetCommitter(
+                consumer,
+                batch_size=settings.kafka_commit_batch_size,
+                interval_ms=settings.kafka_commit_interval_ms,
+            )
+        if self.retry_policy:
+            self.retry_gate = RetryGate(consumer, self.retry_policy, pauses)
+        listener = LaneRebalanceListener(
+            lanes,
+            self.committer,
+            drain_timeout=settings.kafka_rebalance_drain_timeout_ms / 1000,
+        )
+        consumer.subscribe(topics=topics, listener=listener)
+        await consumer.start()
+        logger.debug("Starting consuming messages from topics %s", topics)
+        monitors = self._build_monitors(consumer, settings, pauses)
+        for monitor in monitors:
+            monitor.start()
+        stopping = asyncio.ensure_future(shutdown_event.wait())
+        try:
+            while not shutdown_event.is_set():
+                await self._fetch(consumer, lanes, settings, stopping)
+        except Exception as ex:
+            logger.exception("Error while consuming topic %s", topics)
+            capture_exception(ex)
+        finally:
+            logger.info("Stopping consumer for topic %s, draining in-flight records", topics)
+            stopping.cancel()
+            for monitor in monitors:
+                await monitor.stop()
+            started_at = time.monotonic()
+            await lanes.drain(timeout=settings.kafka_drain_timeout_ms / 1000)
+            drain_duration = time.monotonic() - started_at
+            DRAIN_DURATION.labels(reason="shutdown").observe(drain_duration)
+            await self._close(consumer)
+            logger.info("Consumer stopped after draining for %.3fs", drain_duration)
+
+    async def _fetch(
+        self,
+        consumer: AIOKafkaConsumer,
+        lanes: LanePool,
+        settings: KafkaSettings,
+        stopping: asyncio.Future,
+    ) -> None:
+        """Fetch records and queue them to the lanes, returning early on shutdown."""
+        fetch = asyncio.ensure_future(
+            consumer.getmany(
+                timeout_ms=settings.kafka_batch_timeout_ms,
+                max_records=int(settings.kafka_max_poll_records),
+            ),
+        )
+        await asyncio.wait((fetch, stopping), return_when=asyncio.FIRST_COMPLETED)
+        if not fetch.done():
+            # unreturned records stay buffered, their positions are not advanced
+            fetch.cancel()
+            return
+
+        batches = fetch.result()
+        FETCH_BATCH_SIZE.observe(sum(len(records) for records in batches.values()))
+        for tp, records in batches.items():
+            # a rebalance while submitting earlier partitions may have revoked this one, the new owner fetches
+            # its records again and a lane opened now would outlive the revocation
+            if tp not in consumer.assignment():
+                continue
+            RECORDS_CONSUMED.labels(topic=tp.topic).inc(len(records))
+            await self._submit(lanes, tp, records)
+        lanes.raise_for_error()
+        if self.committer:
+            self.committer.maybe_commit()
+
+    async def _close(self, consumer: AIOKafkaConsumer) -> None:
+        """Commit the processed offsets and stop the consumer, once the lanes are drained."""
+        if self.committer:
+            await self.committer.flush()
+        if self.deduplicator:
+            await self.deduplicator.close()
+        await consumer.stop()
+
+    async def _submit(self, lanes: LanePool, tp: TopicPartition, records: list[ConsumerRecord]) -> None:
+        """Queue fetched records to their lanes, holding back retries which are not due yet."""
+        if self.retry_gate:
+            records = self.retry_gate.admit(tp, records)
+            if not records:
+                return
+
+        if self.committer:
+            self.committer.track(tp, (msg.offset for msg in records))
+        await lanes.submit(tp, records)
+
+    async def _process_records(self, records: list[ConsumerRecord]) -> None:
+        """
+        Process an ordered chunk of records from a lane.
+
+        `async def` handlers run in the event loop. Celery publishing is blocking, so it runs in a worker thread
+        to keep the other lanes moving.
+
+        Parameters
+        ----------
+        records : list[ConsumerRecord]
+            records of a single lane, in partition order
+        """
+        topic = records[0].topic
+        logger.debug(
+            "Processing %s records from topic %s: partition %s offsets %s-%s",
+            len(records),
+            topic,
+            records[0].partition,
+            records[0].offset,
+            records[-1].offset,
+        )
+
+        # dropped records and duplicates are skipped, but their offsets are still committed below
+        routes = self.router.split(records) if self.router else {None: records}
+        routed = sum(len(chunk) for chunk in routes.values())
+        if routed < len(records):
+            RECORDS_DROPPED.labels(topic=topic).inc(len(records) - routed)
+        for queue, chunk in routes.items():
+            await self._process_route(topic, chunk, queue)
+
+        # only published records become committable, so a crash redelivers instead of losing them
+        if self.committer:
+            tp = TopicPartition(topic, records[0].partition)
+            self.committer.ack(tp, (msg.offset for msg in records))
+
+    async def _process_route(self, topic: str, records: list[ConsumerRecord], queue: str | None) -> None:
+        """Dispatch the records routed to a queue, republishing the ones which failed."""
+        fresh = await self.deduplicator.filter(records) if self.deduplicator else records
+        if not fresh:
+            return
+
+        try:
+            with DISPATCH_LATENCY.labels(topic=topic).time():
+                failures = await self._dispatch(fresh, queue)
+        except BaseException:
+            # a dispatch raising or cancelled by the drain timeout leaves its records to the redelivery
+            if self.deduplicator:
+                await self.deduplicator.release(fresh)
+            raise
+
+        RECORDS_DISPATCHED.labels(topic=topic).inc(len(fresh) - len(failures))
+        if failures:
+            RECORDS_FAILED.labels(topic=topic).inc(len(failures))
+            if self.deduplicator:
+                await self.deduplicator.release(msg for msg, _ in failures)
+            await self._handle_failures(failures)
+
+    async def _dispatch(self, records: list[ConsumerRecord], queue: str | None = None) -> list[Failure]:
+        """Hand records to their handler, publishing Celery tasks to `queue` when set."""
+        # a lane chunk comes from a single partition, hence from a single topic
+        try:
+            handler = self._get_handler(records[0].topic)
+        except ValueError as ex:
+            return [(msg, ex) for msg in records]
+
+        if handler.is_async:
+            return await self._run_async_handler(handler, records)
+        # a routing rule sends records to another queue, keeping the priority of their topic
+        options = {**handler.publish_options, "queue": queue} if queue else handler.publish_options
+        if self.is_batch_mode:
+            return await asyncio.to_thread(self._process_batch, handler, records, options)
+        return await asyncio.to_thread(self._process_messages, handler, records, options)
+
+    async def _handle_failures(self, failures: list[Failure]) -> None:
+        """
+        Republish failed records to their retry or dead-letter topic.
+
+        The records are acknowledged by Kafka before their offsets become committable. Without a retry policy
+        the first error is raised, which stops the consumer.
+
+        Parameters
+        ----------
+        failures : list[Failure]
+            failed records with their error
+        """
+        if self.retry_policy is None:
+            raise failures[0][1]
+
+        messages = [self.retry_policy.next_message(msg, error) for msg, error in failures]
+        for (msg, error), message in zip(failures, messages, strict=True):
+            logger.warning(
+                "Failed to process message from topic %s: partition %s offset %s, republishing to %s: %r",
+                msg.topic,
+                msg.partition,
+                msg.offset,
+                message.topic,
+                error,
+            )
+        await kafka_producer.send_many(messages)
+
+    def _get_handler(self, topic: str) -> KafkaHandler:
+        """Return the handler registered for a topic, or for the source topic of a retry topic."""
+        if self.retry_policy:
+            topic = self.retry_policy.source_topic(topic)
+        handler = self.registry.get(topic)
+        if not handler:
+            raise ValueError(f"Handler not found for topic {topic}")
+        return handler
+
+    async def _run_async_handler(self, handler: KafkaHandler, records: list[ConsumerRecord]) -> list[Failure]:
+        """
+        Run an in-process handler for a chunk of records.
+
+        Records sharing a key are handled one after another to keep their order, while different keys run
+        concurrently, bounded by `kafka_async_handler_concurrency` across the whole consumer.
+
+        Parameters
+        ----------
+        handler : KafkaHandler
+            `async def` handler of the topic
+        records : list[ConsumerRecord]
+            records of a single lane, in partition order
+
+        Returns
+        -------
+        list[Failure]
+            records the handler failed on
+        """
+        timeout = handler.timeout
+        if timeout is None and self.settings:
+            timeout = self.settings.kafka_async_handler_timeout_ms / 1000
+        failures: list[Failure] = []
+
+        async def run_in_order(messages: list[ConsumerRecord]) -> None:
+            for msg in messages:
+                try:
+                    payload = handler.decode(msg.value)
+                    async with self._async_handler_semaphore:
+                        await asyncio.wait_for(handler.handler(payload), timeout)
+                except Exception as ex:  # noqa: BLE001
+                    failures.append((msg, ex))
+
+        by_key: dict[bytes | None, list[ConsumerRecord]] = defaultdict(list)
+        for msg in records:
+            by_key[msg.key].append(msg)
+
+        await asyncio.gather(*(run_in_order(messages) for messages in by_key.values()))
+        return failures
+
+    def _process_messages(
+        self,
+        handler: KafkaHandler,
+        records: list[ConsumerRecord],
+        options: dict | None = None,
+    ) -> list[Failure]:
+        """Publish consumed messages one by one, returning the ones which failed."""
+        failures: list[Failure] = []
+        for msg in records:
+            try:
+                handler.handler.apply_async((to_builtins(handler.decode(msg.value)),), **(options or {}))
+            except Exception as ex:  # noqa: BLE001
+                failures.append((msg, ex))
+        return failures
+
+    def _process_batch(
+        self,
+        handler: KafkaHandler,
+        records: list[ConsumerRecord],
+        options: dict | None = None,
+    ) -> list[Failure]:
+        """
+        Process a batch of consumed messages.
+
+        The batch is published as a single Celery `group`, so it goes through one broker connection instead of
+        one pool checkout per message.
+
+        Parameters
+        ----------
+        handler : KafkaHandler
+            handler of the topic
+        records : list[ConsumerRecord]
+            consumed records, in partition order
+        options : dict | None
+            Celery publishing options, such as the queue
+
+        Returns
+        -------
+        list[Failure]
+            records which could not be decoded or published
+        """
+        failures: list[Failure] = []
+        published: list[ConsumerRecord] = []
+        payloads = []
+        for msg in records:
+            try:
+                payloads.append(to_builtins(handler.decode(msg.value)))
+                published.append(msg)
+            except Exception as ex:  # noqa: BLE001
+                failures.append((msg, ex))
+
+        if payloads:
+            try:
+                group(handler.handler.s(payload).set(**(options or {})) for payload in payloads).apply_async()
+            except Exception as ex:  # noqa: BLE001
+                failures.extend((msg, ex) for msg in published)
+        return failures
+
+    async def produce_message(self, topic: str, msg_data: dict, key: str):
+        """
+        Produce message to Kafka through the process-wide producer.
+
+        Parameters
+        ----------
+        topic : str
+            kafka topic to produce the message to
+        msg_data : dict
+            content data, encoded with the codec of the topic handler (orjson by default)
+        key : str
+            unique key
+        """
+        try:
+            logger.debug("Starting to produce message on topic %s", topic)
+            handler = self.registry.get(topic)
+            codec = handler.codec if handler else get_codec("orjson")
+            await kafka_producer.send_and_wait(
+                topic=topic,
+                value=codec.encode(msg_data),
+                key=key.encode("utf-8"),
+            )
+            logger.debug("Sent message to topic %s", topic)
+        except Exception as ex:
+            logger.exception("Sent message fail to topic %s", topic)
+            capture_exception(ex)
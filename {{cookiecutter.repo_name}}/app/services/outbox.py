@@ -0,0 +1,102 @@
+"""Relay outbox events to Kafka."""
+import asyncio
+import contextlib
+import logging
+
+from aiokafka.errors import KafkaError
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.db.session import DatabaseSessionManager
+from app.core.models import OutboxEvent
+from app.repositories.outbox import OutboxRepository
+from app.services.kafka.producer import KafkaProducerManager, ProducerMessage
+
+logger = logging.getLogger(__name__)
+
+
+def to_message(event: OutboxEvent) -> ProducerMessage:
+    """Build the Kafka message of an outbox event."""
+    headers = [(name, value.encode()) for name, value in (event.headers or {}).items()]
+    return ProducerMessage(
+        topic=event.topic,  # type: ignore[arg-type]
+        value=event.value,  # type: ignore[arg-type]
+        key=event.key,  # type: ignore[arg-type]
+        headers=headers or None,
+    )
+
+
+class OutboxRelay:
+    """
+    Publish outbox events to Kafka in batches.
+
+    Each batch is sent through the long-lived producer, then deleted or marked as published in the same
+    transaction. Delivery is at least once: a crash between publishing and committing publishes the batch again.
+
+    Events are published in creation order, which keeps the order of the events sharing a key. Relays running
+    side by side would publish batches concurrently and break that order, so a transaction-level advisory lock
+    lets a single relay publish at a time, the others standing by.
+    """
+
+    def __init__(
+        self,
+        session_manager: DatabaseSessionManager,
+        producer: KafkaProducerManager,
+        *,
+        batch_size: int = 500,
+        poll_interval_ms: int = 1000,
+        delete_published: bool = True,
+    ) -> None:
+        self.session_manager = session_manager
+        self.producer = producer
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval_ms / 1000
+        self.delete_published = delete_published
+
+    async def relay_batch(self) -> int:
+        """
+        Publish one batch of pending events.
+
+        Returns
+        -------
+        int
+            number of published events
+        """
+        async with self.session_manager.session() as session, session.begin():
+            repository = OutboxRepository(session)
+            if not await repository.lock_relay():
+                logger.debug("Another relay is publishing outbox events")
+                return 0
+
+            events = await repository.claim_pending(self.batch_size)
+            if not events:
+                return 0
+
+            await self.producer.send_many(to_message(event) for event in events)
+            ids = [event.id for event in events]
+            if self.delete_published:
+                await repository.delete_many(ids)
+            else:
+                await repository.mark_published(ids)
+
+        logger.debug("Relayed %s outbox events", len(events))
+        return len(events)
+
+    async def run(self, shutdown_event: asyncio.Event) -> None:
+        """
+        Relay events until shutdown, polling again right away while full batches come back.
+
+        Parameters
+        ----------
+        shutdown_event : asyncio.Event
+            set to stop the relay after the current batch
+        """
+        while not shutdown_event.is_set():
+            try:
+                count = await self.relay_batch()
+            except (KafkaError, SQLAlchemyError):
+                logger.exception("Failed to relay outbox events")
+                count = 0
+
+            if count < self.batch_size:
+                with contextlib.suppress(TimeoutError):
+                    await asyncio.wait_for(shutdown_event.wait(), self.poll_interval)
@@ -0,0 +1,312 @@
+"""Token buckets limiting the calls to downstream services across every worker and consumer."""
+import asyncio
+import contextlib
+import functools
+import inspect
+import logging
+import threading
+import time
+from collections.abc import AsyncIterator, Callable
+from typing import Any, Protocol
+
+from celery import current_task
+from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+from redis.exceptions import RedisError
+
+from app.core.config import CelerySettings, RateLimitSettings, get_settings
+
+logger = logging.getLogger(__name__)
+
+# refill the bucket from the time elapsed since the last call and take the tokens if there are enough,
+# returning how long to wait for them otherwise. The Redis clock is used so callers need no synchronized clocks.
+BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+
+local wait = 0
+if tokens >= requested then
+    tokens = tokens - requested
+else
+    wait = (requested - tokens) / rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+-- a bucket left alone refills completely, so it can expire then
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class RateLimitError(Exception):
+    """Tokens were not available within the allowed wait."""
+
+    def __init__(self, name: str, retry_after: float) -> None:
+        super().__init__(f"Rate limit {name} exceeded, retry after {retry_after:.3f}s")
+        self.retry_after = retry_after
+
+
+class TokenBucketBackend(Protocol):
+    """Storage of token buckets."""
+
+    def take(self, key: str, rate: float, capacity: float, tokens: float) -> float:
+        """Take tokens, returning 0 on success or the seconds to wait for them."""
+
+    async def atake(self, key: str, rate: float, capacity: float, tokens: float) -> float:
+        """Take tokens from async code, returning 0 on success or the seconds to wait for them."""
+
+
+class MemoryTokenBucketBackend:
+    """Buckets local to the process, for tests and as a fallback while Redis is unavailable."""
+
+    def __init__(self) -> None:
+        # key to (tokens, monotonic time of the last update)
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, capacity: float, tokens: float) -> float:
+        """Take tokens, returning 0 on success or the seconds to wait for them."""
+        with self._lock:
+            now = time.monotonic()
+            available, updated = self._buckets.get(key, (capacity, now))
+            available = min(capacity, available + (now - updated) * rate)
+            wait = 0.0
+            if available >= tokens:
+                available -= tokens
+            else:
+                wait = (tokens - available) / rate
+            self._buckets[key] = (available, now)
+            return wait
+
+    async def atake(self, key: str, rate: float, capacity: float, tokens: float) -> float:
+        """Take tokens from async code, returning 0 on success or the seconds to wait for them."""
+        return self.take(key, rate, capacity, tokens)
+
+
+class RedisTokenBucketBackend:
+    """
+    Buckets shared through Redis, updated atomically by a Lua script.
+
+    While Redis is unavailable each process falls back to its own in-memory buckets, limiting the rate per
+    process instead of failing the calls.
+    """
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.fallback = MemoryTokenBucketBackend()
+
+    @functools.cached_property
+    def _script(self) -> Any:
+        """Return the script registered on a sync client, connected on first use."""
+        return Redis.from_url(self.url).register_script(BUCKET_SCRIPT)
+
+    @functools.cached_property
+    def _async_script(self) -> Any:
+        """Return the script registered on an async client, connected on first use."""
+        return AsyncRedis.from_url(self.url).register_script(BUCKET_SCRIPT)
+
+    def take(self, key: str, rate: float, capacity: float, tokens: float) -> float:
+        """Take tokens, returning 0 on success or the seconds to wait for them."""
+        try:
+            return float(self._script(keys=[key], args=[rate, capacity, tokens]))
+        except RedisError:
+            logger.warning("Rate limit %s falls back to a local bucket", key, exc_info=True)
+            return self.fallback.take(key, rate, capacity, tokens)
+
+    async def atake(self, key: str, rate: float, capacity: float, tokens: float) -> float:
+        """Take tokens from async code, returning 0 on success or the seconds to wait for them."""
+        try:
+            return float(await self._async_script(keys=[key], args=[rate, capacity, tokens]))
+        except RedisError:
+            logger.warning("Rate limit %s falls back to a local bucket", key, exc_info=True)
+            return self.fallback.take(key, rate, capacity, tokens)
+
+
+@functools.lru_cache
+def get_backend() -> TokenBucketBackend:
+    """Return the configured token bucket backend."""
+    settings: RateLimitSettings = get_settings("rate_limit")
+    if settings.rate_limit_backend == "memory":
+        return MemoryTokenBucketBackend()
+
+    celery_settings: CelerySettings = get_settings("celery")
+    return RedisTokenBucketBackend(settings.rate_limit_redis_url or celery_settings.celery_broker_url)
+
+
+class TokenBucket:
+    """
+    Rate limit shared by every process using the same name.
+
+    The bucket holds up to `capacity` tokens and refills at `rate` tokens per second, so calls can burst up to
+    the capacity and then go on at the rate.
+
+    Examples
+    --------
+    >>> crm_api = TokenBucket("crm-api", rate=50, capacity=100)
+    >>> async with crm_api.limit():
+    ...     await client.post(...)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        capacity: float | None = None,
+        *,
+        backend: TokenBucketBackend | None = None,
+    ) -> None:
+        if rate <= 0:
+            raise ValueError("The rate of a token bucket must be positive.")
+
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._backend = backend
+
+    @property
+    def backend(self) -> TokenBucketBackend:
+        """Return the backend of the bucket, the configured one by default."""
+        if self._backend is None:
+            self._backend = get_backend()
+        return self._backend
+
+    @property
+    def key(self) -> str:
+        """Return the storage key of the bucket."""
+        settings: RateLimitSettings = get_settings("rate_limit")
+        return f"{settings.rate_limit_key_prefix}{self.name}"
+
+    def _check(self, tokens: float) -> None:
+        """Ensure the bucket can ever hold the tokens, else callers would wait forever."""
+        if tokens > self.capacity:
+            raise ValueError(f"Cannot take {tokens} tokens from {self.name}, which holds {self.capacity}.")
+
+    def take(self, tokens: float = 1) -> float:
+        """
+        Take tokens if available.
+
+        Returns
+        -------
+        float
+            0 when the tokens were taken, else the seconds until they are available
+        """
+        self._check(tokens)
+        return self.backend.take(self.key, self.rate, self.capacity, tokens)
+
+    async def atake(self, tokens: float = 1) -> float:
+        """
+        Take tokens if available, from async code.
+
+        Returns
+        -------
+        float
+            0 when the tokens were taken, else the seconds until they are available
+        """
+        self._check(tokens)
+        return await self.backend.atake(self.key, self.rate, self.capacity, tokens)
+
+    @contextlib.asynccontextmanager
+    async def limit(self, tokens: float = 1, *, max_wait: float | None = None) -> AsyncIterator[None]:
+        """
+        Wait for tokens before running the block.
+
+        Parameters
+        ----------
+        tokens : float, default 1
+            tokens the block costs
+        max_wait : float | None
+            seconds to wait at most, `RateLimitError` is raised when the tokens would take longer
+
+        Raises
+        ------
+        RateLimitError
+            the tokens are not available within `max_wait`
+        """
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+        while (wait := await self.atake(tokens)) > 0:
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise RateLimitError(self.name, wait)
+            await asyncio.sleep(wait)
+        yield
+
+
+def _defer(bucket: TokenBucket, wait: float) -> bool:
+    """
+    Publish the running task again once tokens are available.
+
+    The task is published with its id, arguments and routing, like a retry, but without counting as one.
+
+    Returns
+    -------
+    bool
+        whether the task was deferred, False outside a worker, where the caller has to wait itself
+    """
+    task = current_task
+    if task is None or task.request.called_directly or task.request.is_eager:
+        return False
+
+    logger.info("Rate limit %s exceeded, deferring %s by %.3fs", bucket.name, task.name, wait)
+    task.signature_from_request().apply_async(countdown=wait)
+    return True
+
+
+def rate_limited(bucket: TokenBucket, tokens: float = 1) -> Callable[[Callable], Callable]:
+    """
+    Limit a Celery task with a token bucket.
+
+    A task out of tokens is deferred with a countdown computed from the bucket instead of sleeping in the
+    worker. Called directly or eagerly, it waits for the tokens instead. Apply it under `shared_task`, on sync
+    or `async def` (with `AsyncTask`) functions.
+
+    Parameters
+    ----------
+    bucket : TokenBucket
+        bucket shared by the calls to the same downstream service
+    tokens : float, default 1
+        tokens a run costs
+
+    Returns
+    -------
+    Callable
+        decorator of the task function
+
+    Examples
+    --------
+    >>> @shared_task(queue=CELERY_QUEUE)
+    ... @rate_limited(crm_api)
+    ... def sync_contact(data):
+    ...     ...
+    """
+
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs) -> Any:
+                while (wait := await bucket.atake(tokens)) > 0:
+                    if _defer(bucket, wait):
+                        return None
+                    await asyncio.sleep(wait)
+                return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs) -> Any:
+            while (wait := bucket.take(tokens)) > 0:
+                if _defer(bucket, wait):
+                    return None
+                time.sleep(wait)
+            return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -6,6 +6,7 @@ from typing import Any
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.db.repository import AbstractSqlRepository
+from app.repositories.outbox import OutboxRepository
 
 
 class UnitOfWork:
@@ -16,6 +17,8 @@ class UnitOfWork:
     def __init__(self, session: AsyncSession) -> None:
         self.session = session
         self.repositories: dict[str, AbstractSqlRepository] = {}
+        # events added here are committed atomically with the repositories' changes
+        self.outbox = OutboxRepository(session)
 
     async def __aenter__(self) -> "UnitOfWork":
         """Prepare repositories before entering the context."""
@@ -27,6 +30,14 @@ class UnitOfWork:
         """Clean up before exiting the context."""
         await self.session.close()
 
+    async def commit(self) -> None:
+        """Commit the changes of every repository and the outbox events in one transaction."""
+        await self.session.commit()
+
+    async def rollback(self) -> None:
+        """Discard the changes of every repository and the outbox events."""
+        await self.session.rollback()
+
     def get_repository(self, name: str) -> Any:
         """
         Get reporitoy for a given model.
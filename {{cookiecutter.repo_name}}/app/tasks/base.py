@@ -0,0 +1,272 @@
+"""Base classes of Celery tasks."""
+import asyncio
+import inspect
+import logging
+import threading
+from collections.abc import Awaitable
+from typing import Any
+
+from billiard.einfo import ExceptionInfo
+from celery import Task, group, states
+from celery._state import _task_stack
+from celery.signals import task_failure, task_postrun, task_prerun, task_received
+from celery.utils import uuid
+from celery.utils.time import timezone
+from celery.worker.request import Request
+from celery.worker.strategy import proto1_to_proto2
+from kombu.asynchronous.timer import to_timestamp
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerEventLoop:
+    """
+    Event loop kept for the lifetime of a worker process.
+
+    Async resources bound to a loop, such as the database engine pool, are created once and reused by every task
+    of the process instead of being rebuilt by `asyncio.run` for each task.
+    """
+
+    def __init__(self) -> None:
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Return the loop of the process, created on first use."""
+        if self._loop is None or self._loop.is_closed():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+        return self._loop
+
+    def reset(self) -> None:
+        """Forget a loop inherited from the parent process, a forked child must not share it."""
+        self._loop = None
+
+    def run(self, awaitable: Awaitable[Any]) -> Any:
+        """Run a coroutine or future to completion on the loop of the process."""
+        return self.loop.run_until_complete(awaitable)
+
+    def close(self) -> None:
+        """Finish async generators and close the loop."""
+        if self._loop is None or self._loop.is_closed():
+            return
+
+        self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+        self._loop.close()
+        self._loop = None
+
+
+# event loop of the current worker process, set up by the `worker_process_init` signal in `app.worker`
+worker_loop = WorkerEventLoop()
+
+
+class AsyncTask(Task):
+    """
+    Task whose `async def` body runs on the event loop of the worker process.
+
+    Use it with `@shared_task(base=AsyncTask)` on an `async def` function. Tasks of a process run one at a time
+    on its loop, so use the prefork or solo pool.
+    """
+
+    def __call__(self, *args, **kwargs) -> Any:
+        """Run the task, awaiting its coroutine on the worker loop."""
+        result = super().__call__(*args, **kwargs)
+        if inspect.isawaitable(result):
+            return worker_loop.run(result)
+        return result
+
+
+def _run_batch(task: "BatchTask", payloads: list[Any], delivery_info: dict | None = None) -> str | None:
+    """
+    Run a batch in a pool process.
+
+    The batch bypasses the Celery tracer, so its request is pushed as the tracer does, with the delivery info of
+    its first message, and the `task_prerun`, `task_failure` and `task_postrun` signals are sent here, once per
+    batch under an id of its own.
+
+    Returns
+    -------
+    str | None
+        the error of a failed batch, None on success
+    """
+    batch_id = uuid()
+    args = (payloads,)
+    _task_stack.push(task)
+    task.push_request(
+        id=batch_id,
+        args=args,
+        kwargs={},
+        called_directly=False,
+        is_eager=False,
+        delivery_info=delivery_info or {},
+    )
+    task_prerun.send(sender=task, task_id=batch_id, task=task, args=args, kwargs={})
+    state, retval, error = states.SUCCESS, None, None
+    try:
+        retval = task(payloads)
+    except Exception as ex:
+        logger.exception("Batch of %s %s messages failed", len(payloads), task.name)
+        einfo = ExceptionInfo()
+        task_failure.send(
+            sender=task,
+            task_id=batch_id,
+            exception=ex,
+            args=args,
+            kwargs={},
+            traceback=einfo.tb,
+            einfo=einfo,
+        )
+        state, error = states.FAILURE, repr(ex)
+    finally:
+        task_postrun.send(
+            sender=task,
+            task_id=batch_id,
+            task=task,
+            args=args,
+            kwargs={},
+            retval=retval,
+            state=state,
+        )
+        task.pop_request()
+        _task_stack.pop()
+    return error
+
+
+class BatchTask(AsyncTask):
+    """
+    Task buffering its messages in the worker and running once per batch, with the list of their first argument.
+
+    A batch runs once `flush_every` messages are buffered or every `flush_interval` seconds. Messages are only
+    acknowledged once their batch succeeded, so the messages of a crashed worker are redelivered. A failed batch
+    is rejected, and only requeued when `requeue_on_failure` is set, as a message failing on every delivery would
+    otherwise fail its batches forever.
+
+    Revoked and expired messages are skipped, and messages published with a countdown or an ETA join a batch once
+    due, as with the default strategy of Celery.
+
+    The worker prefetch limit (`worker_prefetch_multiplier` x concurrency) must be at least `flush_every`, as
+    buffered messages stay unacknowledged. `async def` batch functions run on the worker loop like `AsyncTask`.
+
+    Examples
+    --------
+    >>> @shared_task(base=BatchTask, flush_every=500, flush_interval=1, queue=CELERY_QUEUE)
+    ... def save_events(payloads):
+    ...     ...
+    >>> save_events.delay({"id": 1})
+    """
+
+    flush_every: int = 100
+    flush_interval: float = 1
+    requeue_on_failure: bool = False
+    acks_late = True
+
+    def __init__(self) -> None:
+        self._buffer: list[Request] = []
+        self._lock = threading.Lock()
+        self._timer: Any = None
+        self._pool: Any = None
+
+    def apply(self, args=None, kwargs=None, *options, **kwoptions):
+        """Run eagerly as a batch of one message."""
+        return super().apply(([*(args or ())],), kwargs, *options, **kwoptions)
+
+    def signature_from_request(self, request=None, args=None, kwargs=None, queue=None, **extra_options):
+        """
+        Return the signatures publishing the payloads of the running batch again, one message each.
+
+        Retries and the deferrals of `rate_limited` republish the batch through it, so its payloads are buffered
+        again as separate messages instead of as a single list.
+        """
+        request = self.request if request is None else request
+        payloads = (request.args if args is None else args)[0]
+        signatures = []
+        for payload in payloads:
+            signature = super().signature_from_request(request, (payload,), kwargs, queue, **extra_options)
+            # every message gets an id of its own, not the one of the batch
+            signature.options.pop("task_id", None)
+            signatures.append(signature)
+        return group(signatures)
+
+    def Strategy(self, task, app, consumer):  # noqa: N802
+        """Buffer received messages instead of executing them one by one."""
+        self._pool = consumer.pool
+        timer = consumer.timer
+
+        def buffer_due(request: Request) -> None:
+            consumer.qos.decrement_eventually()
+            self._buffer_request(request, timer)
+
+        def task_message_handler(message, body, ack, reject, *_, **__):
+            if body is None and "args" not in message.payload:
+                body, headers, decoded, utc = message.body, message.headers, False, app.uses_utc_timezone()
+            else:
+                body, headers, decoded, utc = proto1_to_proto2(message, body)
+
+            request = Request(
+                message,
+                on_ack=ack,
+                on_reject=reject,
+                app=app,
+                hostname=consumer.hostname,
+                eventer=consumer.event_dispatcher,
+                task=task,
+                body=body,
+                headers=headers,
+                decoded=decoded,
+                utc=utc,
+                connection_errors=consumer.connection_errors,
+            )
+            if request.revoked():
+                return
+            task_received.send(sender=consumer, request=request)
+
+            if request.eta:
+                # held unacknowledged until due, beyond the prefetch limit as Celery does for ETA tasks
+                eta = to_timestamp(timezone.to_system(request.eta) if request.utc else request.eta, app.timezone)
+                consumer.qos.increment_eventually()
+                timer.call_at(eta, buffer_due, (request,), priority=6)
+                return
+            self._buffer_request(request, timer)
+
+        return task_message_handler
+
+    def _buffer_request(self, request: Request, timer: Any) -> None:
+        """Add a message to the next batch, flushing it once full."""
+        with self._lock:
+            self._buffer.append(request)
+            size = len(self._buffer)
+            if self._timer is None:
+                self._timer = timer.call_repeatedly(self.flush_interval, self._flush)
+        if size >= self.flush_every:
+            self._flush()
+
+    def _flush(self) -> None:
+        """Send the buffered messages to the pool as one batch."""
+        with self._lock:
+            requests, self._buffer = self._buffer, []
+            if not requests and self._timer is not None:
+                # nothing received since the last flush, the next message restarts the timer
+                self._timer.cancel()
+                self._timer = None
+        if not requests:
+            return
+
+        def on_return(error: str | None) -> None:
+            for request in requests:
+                if error is None:
+                    request.acknowledge()
+                else:
+                    request.reject(requeue=self.requeue_on_failure)
+
+        def on_error(exc: BaseException) -> None:
+            # the pool process died or timed out before returning, the messages would otherwise stay unacknowledged
+            logger.error("Batch of %s %s messages was lost: %r", len(requests), self.name, exc)
+            on_return(repr(exc))
+
+        logger.debug("Flushing a batch of %s %s messages", len(requests), self.name)
+        self._pool.apply_async(
+            _run_batch,
+            (self, [request.args[0] if request.args else None for request in requests], requests[0].delivery_info),
+            callback=on_return,
+            error_callback=on_error,
+        )
@@ -4,11 +4,13 @@ import logging
 from celery import shared_task
 
 from app.constants import CELERY_QUEUE
+from app.services.kafka.registry import kafka_handler
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 
+@kafka_handler("Sample.Topic", codec="orjson")
 @shared_task(queue=CELERY_QUEUE)
 def simple_task(data):
     """Return Simple task."""
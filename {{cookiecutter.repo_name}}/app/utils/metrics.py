@@ -0,0 +1,72 @@
+"""Prometheus metrics of the Celery tasks, and exposition of the metrics of a process."""
+import logging
+import os
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram, multiprocess, start_http_server
+
+logger = logging.getLogger(__name__)
+
+# header stamped on every task message when it is published, in seconds since the epoch
+ENQUEUED_AT_HEADER = "enqueued_at"
+
+TASK_QUEUE_WAIT = Histogram(
+    "celery_task_queue_wait_seconds",
+    "Time between publishing a task and a worker starting to run it.",
+    ["task"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+TASK_RUNTIME = Histogram(
+    "celery_task_runtime_seconds",
+    "Time spent running a task, by final state.",
+    ["task", "state"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+TASK_PAYLOAD_SIZE = Histogram(
+    "celery_task_payload_bytes",
+    "Size of the serialized body of received task messages.",
+    ["task"],
+    buckets=(128, 512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+TASK_RETRIES = Counter(
+    "celery_task_retries",
+    "Task executions ending with a retry.",
+    ["task"],
+)
+
+
+def get_registry() -> CollectorRegistry:
+    """
+    Return the registry to expose.
+
+    When `PROMETHEUS_MULTIPROC_DIR` is set, the metrics of every process writing to it are aggregated, which
+    forked pools such as the Celery prefork pool or several uvicorn workers need.
+
+    Returns
+    -------
+    CollectorRegistry
+        registry of the process, or collecting the processes of `PROMETHEUS_MULTIPROC_DIR`
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def start_metrics_server(port: int) -> None:
+    """
+    Serve the metrics of the worker.
+
+    Pool processes record their own metrics, so with the prefork pool `PROMETHEUS_MULTIPROC_DIR` must point to
+    an empty directory for the server to aggregate them. Without it only the metrics of the main process, such
+    as payload sizes, are served.
+
+    Parameters
+    ----------
+    port : int
+        port of the HTTP server
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        logger.warning("PROMETHEUS_MULTIPROC_DIR is not set, metrics of the pool processes are not served")
+    start_http_server(port, registry=get_registry())
@@ -0,0 +1,158 @@
+"""Compact serialization of Celery messages."""
+import hashlib
+from collections.abc import Callable
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, cast
+from uuid import UUID
+
+import msgpack
+from kombu.serialization import register
+from redis import Redis
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None  # type: ignore[assignment]
+
+SERIALIZER = "zmsgpack"
+CONTENT_TYPE = "application/x-zmsgpack"
+
+# first byte of an encoded body
+RAW = b"\x00"
+COMPRESSED = b"\x01"
+CLAIM_CHECK = b"\x02"
+
+# msgpack extension types of the values kombu's json serializer also round-trips, encoded as text
+EXT_TYPES: dict[int, tuple[type, Callable[[Any], str], Callable[[str], Any]]] = {
+    1: (datetime, datetime.isoformat, datetime.fromisoformat),
+    2: (date, date.isoformat, date.fromisoformat),
+    3: (time, time.isoformat, time.fromisoformat),
+    4: (UUID, str, UUID),
+    5: (Decimal, str, Decimal),
+}
+
+
+def encode_ext(obj: Any) -> msgpack.ExtType:
+    """Encode a value msgpack has no type for."""
+    # datetime is a subclass of date, so it is matched first
+    for code, (cls, encode, _) in EXT_TYPES.items():
+        if isinstance(obj, cls):
+            return msgpack.ExtType(code, encode(obj).encode())
+    raise TypeError(f"Cannot serialize {type(obj).__name__} object")
+
+
+def decode_ext(code: int, data: bytes) -> Any:
+    """Decode a value encoded by `encode_ext`."""
+    if code not in EXT_TYPES:
+        return msgpack.ExtType(code, data)
+    return EXT_TYPES[code][2](data.decode())
+
+
+class ClaimCheckError(LookupError):
+    """The body referenced by a message is no longer in the claim-check store."""
+
+
+class ClaimCheckStore:
+    """
+    Redis store holding large message bodies, which messages reference by key.
+
+    Keys are the hash of the body, so a body sent many times is stored once. Bodies are kept until their TTL
+    expires rather than deleted once read, as a message can be delivered again.
+    """
+
+    prefix = "claim-check:"
+
+    def __init__(self, url: str, *, ttl_s: int = 86400) -> None:
+        self.url = url
+        self.ttl_s = ttl_s
+        self._redis: Redis | None = None
+
+    @property
+    def redis(self) -> Redis:
+        """Return the Redis client, connected on first use."""
+        if self._redis is None:
+            self._redis = Redis.from_url(self.url)
+        return self._redis
+
+    def put(self, data: bytes) -> bytes:
+        """
+        Store a body.
+
+        Returns
+        -------
+        bytes
+            key of the body
+        """
+        key = f"{self.prefix}{hashlib.sha256(data).hexdigest()}".encode()
+        self.redis.set(key, data, ex=self.ttl_s)
+        return key
+
+    def get(self, key: bytes) -> bytes:
+        """Return a stored body."""
+        data = cast(bytes | None, self.redis.get(key))
+        if data is None:
+            raise ClaimCheckError(f"Message body {key.decode()} expired from the claim-check store")
+        return data
+
+
+class MessageCodec:
+    """
+    msgpack codec of Celery message bodies.
+
+    Datetimes, dates, times, UUIDs and decimals are kept as such through msgpack extension types, as with the
+    json serializer of kombu.
+
+    Bodies larger than `compress_above` bytes are compressed with zstd, and encoded bodies still larger than
+    `claim_check_above` bytes are put in the claim-check store so only their key goes through the broker.
+    A leading byte tells how a body was encoded, so any worker decodes it whatever the settings of the sender.
+    """
+
+    def __init__(
+        self,
+        *,
+        compress_above: int | None = None,
+        compression_level: int = 3,
+        claim_check_above: int | None = None,
+        store: ClaimCheckStore | None = None,
+    ) -> None:
+        if compress_above is not None and zstandard is None:
+            raise ImportError("zstandard must be installed to compress Celery messages")
+        if claim_check_above is not None and store is None:
+            raise ValueError("A claim-check store is required to claim-check Celery messages")
+
+        self.compress_above = compress_above
+        self.compression_level = compression_level
+        self.claim_check_above = claim_check_above
+        self.store = store
+
+    def dumps(self, data: Any) -> bytes:
+        """Encode a message body."""
+        body = msgpack.packb(data, use_bin_type=True, default=encode_ext)
+        if self.compress_above is not None and len(body) > self.compress_above:
+            body = COMPRESSED + zstandard.compress(body, self.compression_level)
+        else:
+            body = RAW + body
+
+        if self.store is not None and self.claim_check_above is not None and len(body) > self.claim_check_above:
+            return CLAIM_CHECK + self.store.put(body)
+        return body
+
+    def loads(self, body: bytes) -> Any:
+        """Decode a message body."""
+        if body[:1] == CLAIM_CHECK:
+            if self.store is None:
+                raise ClaimCheckError("Received a claim-checked message without a claim-check store")
+            body = self.store.get(body[1:])
+
+        flag, body = body[:1], body[1:]
+        if flag == COMPRESSED:
+            if zstandard is None:
+                raise ImportError("zstandard must be installed to decompress Celery messages")
+            body = zstandard.decompress(body)
+        return msgpack.unpackb(body, raw=False, ext_hook=decode_ext)
+
+
+def register_serializer(codec: MessageCodec) -> None:
+    """Register the codec as the `zmsgpack` serializer of kombu."""
+    register(SERIALIZER, codec.dumps, codec.loads, content_type=CONTENT_TYPE, content_encoding="binary")
@@ -1,13 +1,26 @@
 """Worker to handle celery tasks."""
 
+import time
+from datetime import datetime
 from pathlib import Path
 
 import structlog
 from celery import Celery, signals
 from celery.concurrency import asynpool
 
+from app.constants import CELERY_PRIORITY_SEPARATOR
 from app.core.config import CelerySettings, get_settings
+from app.tasks.base import worker_loop
+from app.utils.metrics import (
+    ENQUEUED_AT_HEADER,
+    TASK_PAYLOAD_SIZE,
+    TASK_QUEUE_WAIT,
+    TASK_RETRIES,
+    TASK_RUNTIME,
+    start_metrics_server,
+)
 from app.utils.sentry import capture_exception
+from app.utils.serialization import SERIALIZER, ClaimCheckStore, MessageCodec, register_serializer
 from app.utils.structlog import configure_logging
 
 settings: CelerySettings = get_settings("celery")
@@ -21,6 +34,24 @@ def get_modules() -> list[str]:
     return ["app.tasks." + m.name[:-3] for m in modules if not m.name.endswith("__init__.py")]
 
 
+# registered in every process, workers decode claim-checked messages even when they do not send any
+register_serializer(
+    MessageCodec(
+        compress_above=settings.celery_compression_threshold,
+        compression_level=settings.celery_compression_level,
+        claim_check_above=(
+            settings.celery_claim_check_threshold_kb * 1024
+            if settings.celery_claim_check_threshold_kb is not None
+            else None
+        ),
+        store=ClaimCheckStore(
+            settings.celery_claim_check_url or settings.celery_broker_url,
+            ttl_s=settings.celery_claim_check_ttl_s,
+        ),
+    ),
+)
+
+
 celery_app = Celery(
     __name__,
     broker_url=settings.celery_broker_url,
@@ -30,8 +61,69 @@ celery_app = Celery(
 )
 celery_app.conf.update(
     result_expires=settings.celery_result_expires,
+    task_ignore_result=settings.celery_task_ignore_result,
+    task_serializer=settings.celery_serializer,
+    result_serializer=settings.celery_serializer,
+    # json stays accepted so messages queued before switching serializer are still consumed
+    accept_content=["json", SERIALIZER],
+    result_accept_content=["json", SERIALIZER],
+    task_routes=settings.celery_task_routes,
+    task_default_priority=settings.celery_default_priority,
+    # Redis emulates priorities with a list per step, consumed in step order
+    broker_transport_options={
+        "priority_steps": settings.celery_priority_steps,
+        "sep": CELERY_PRIORITY_SEPARATOR,
+    },
+    worker_prefetch_multiplier=settings.celery_worker_prefetch_multiplier,
 )
-celery_app.control.enable_events()
+
+
+@signals.worker_init.connect
+def on_worker_init(*_, **__):
+    """Enable task events once the worker starts, processes only publishing tasks import this module too."""
+    celery_app.control.enable_events()
+    if settings.celery_metrics_enabled:
+        start_metrics_server(settings.celery_metrics_port)
+
+
+@signals.worker_process_init.connect
+def on_worker_process_init(*_, **__):
+    """
+    Give each pool process its own event loop and database pools.
+
+    Connections opened by the parent before forking are left to it, the pools of the process fill on its own loop
+    with the first async task.
+    """
+    from app.core.db import session_manager
+
+    worker_loop.reset()
+    session_manager.reset_after_fork()
+
+
+@signals.worker_process_shutdown.connect
+def on_worker_process_shutdown(*_, **__):
+    """Close the database connections of the pool process, then its event loop."""
+    from app.core.db import session_manager
+
+    worker_loop.run(session_manager.close())
+    worker_loop.close()
+
+
+# start time of the tasks running in this process
+_task_started: dict[str, float] = {}
+
+
+@signals.before_task_publish.connect
+def on_before_task_publish(headers=None, **__):
+    """Stamp the publishing time on the message, from the consumer, the API or a retrying task alike."""
+    if headers is not None:
+        headers[ENQUEUED_AT_HEADER] = time.time()
+
+
+@signals.task_received.connect
+def on_task_received(request, **__):
+    """Record the size of the message body, before it is decoded."""
+    TASK_PAYLOAD_SIZE.labels(task=request.task_name).observe(len(request.body or b""))
 
 
 @signals.task_prerun.connect
@@ -41,9 +133,33 @@ def on_task_prerun(
     *_,
     **__,
 ):
-    """Bind task information into logging context."""
+    """Bind task information into logging context and record how long the task waited in the queue."""
     structlog.contextvars.bind_contextvars(task_id=task_id, task_name=task.name)
 
+    _task_started[task_id] = time.perf_counter()
+    enqueued_at = getattr(task.request, ENQUEUED_AT_HEADER, None)
+    if enqueued_at is not None:
+        # a scheduled task only starts waiting once its ETA is reached
+        eta = task.request.eta
+        if eta is not None:
+            enqueued_at = max(enqueued_at, datetime.fromisoformat(eta).timestamp())
+        TASK_QUEUE_WAIT.labels(task=task.name).observe(max(time.time() - enqueued_at, 0))
+
+
+@signals.task_postrun.connect
+def on_task_postrun(task_id, task, state=None, **__):
+    """Record how long the task ran."""
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        TASK_RUNTIME.labels(task=task.name, state=state or "UNKNOWN").observe(time.perf_counter() - started)
+
+
+@signals.task_retry.connect
+def on_task_retry(sender=None, **__):
+    """Count the retries of the task."""
+    if sender is not None:
+        TASK_RETRIES.labels(task=sender.name).inc()
+
 
 @signals.setup_logging.connect
 def config_logger(*_, **__):
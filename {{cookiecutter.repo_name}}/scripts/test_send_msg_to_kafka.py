@@ -3,6 +3,7 @@ import uuid
 
 from app.core.config import KafkaSettings, get_settings
 from app.services.kafka import KafkaService
+from app.services.kafka.producer import kafka_producer
 
 settings: KafkaSettings = get_settings("kafka")
 
@@ -10,11 +11,14 @@ settings: KafkaSettings = get_settings("kafka")
 async def main(message_data):
     msg_id = str(uuid.uuid4())
     kafka_svc = KafkaService(kafka_settings=settings)
-    await kafka_svc.produce_message(
-        topic="Sample.Topic",
-        msg_data=message_data,
-        key=msg_id,
-    )
+    try:
+        await kafka_svc.produce_message(
+            topic="Sample.Topic",
+            msg_data=message_data,
+            key=msg_id,
+        )
+    finally:
+        await kafka_producer.stop()
 
 
 if __name__ == "__main__":
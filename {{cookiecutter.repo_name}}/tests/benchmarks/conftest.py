@@ -0,0 +1,34 @@
+"""Benchmark setups."""
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+BASELINES_FILE = Path(__file__).parent / "baselines.json"
+
+
+@pytest.fixture(scope="session", autouse=True)
+async def _setup_test_db():
+    """Benchmarks run against in-memory stand-ins and need no database."""
+    return
+
+
+@pytest.fixture(scope="session")
+def baselines():
+    """
+    Load the stored baselines, and save the measured ones when `BENCHMARK_UPDATE_BASELINES` is set.
+
+    Yields
+    ------
+    dict
+        stored and measured case names to their messages per second, dispatch p99 and peak memory, and whether
+        the baselines are being updated
+    """
+    stored = json.loads(BASELINES_FILE.read_text()) if BASELINES_FILE.exists() else {}
+    measured: dict[str, dict[str, float]] = {}
+    updating = os.getenv("BENCHMARK_UPDATE_BASELINES", "0").lower() not in ("false", "0")
+    yield {"stored": stored, "measured": measured, "updating": updating}
+
+    if updating and measured:
+        BASELINES_FILE.write_text(json.dumps({**stored, **measured}, indent=2, sort_keys=True) + "\n")
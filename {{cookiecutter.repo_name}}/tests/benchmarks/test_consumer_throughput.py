@@ -0,0 +1,117 @@
+"""Benchmark the consume → dispatch path of the Kafka consumer."""
+import asyncio
+import os
+import statistics
+import time
+import tracemalloc
+
+import orjson
+import pytest
+from aiokafka.structs import ConsumerRecord
+
+from app.core.config.kafka import KafkaSettings
+from app.services.kafka import KafkaService
+from app.services.kafka.registry import HandlerRegistry
+from tests.fakes import CelerySink, FakeBroker
+
+pytestmark = pytest.mark.benchmark
+
+TOPIC = "Benchmark.Topic"
+# the stored baselines, memory included, are recorded with the default count
+MESSAGES = int(os.getenv("BENCHMARK_MESSAGES", "20000"))
+# a run worse than the baseline by more than this ratio fails
+TOLERANCE = float(os.getenv("BENCHMARK_TOLERANCE", "0.3"))
+# throughput and latency depend on the machine, they are only compared on the hardware the baselines come from
+ENFORCE_TIMINGS = os.getenv("BENCHMARK_ENFORCE_TIMINGS", "false").lower() not in ("false", "0")
+# in CI every case must have a baseline to compare to
+REQUIRE_BASELINES = os.getenv("CI", "false").lower() not in ("false", "0")
+
+
+class TimedKafkaService(KafkaService):
+    """Kafka service recording how long every lane chunk takes to dispatch."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.latencies: list[float] = []
+
+    async def _dispatch(self, records: list[ConsumerRecord], queue: str | None = None):
+        """Dispatch records and record the elapsed time."""
+        start = time.perf_counter()
+        try:
+            return await super()._dispatch(records, queue)
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+
+def percentile(values: list[float], percent: int) -> float:
+    """Return a percentile of the values."""
+    return statistics.quantiles(values, n=100)[percent - 1] if len(values) > 1 else values[0]
+
+
+@pytest.mark.parametrize("consume_mode", ["message", "batch"])
+@pytest.mark.parametrize("batch_size", [10, 100, 500])
+@pytest.mark.parametrize("payload_size", [100, 10_000])
+async def test_consumer_throughput(baselines, consume_mode: str, batch_size: int, payload_size: int):
+    """Measure messages/sec, dispatch latency and memory, and compare them to the stored baseline."""
+    case = f"{consume_mode}-batch{batch_size}-payload{payload_size}"
+    broker = FakeBroker(default_partitions=4)
+    value = orjson.dumps({"data": "x" * payload_size})
+    for index in range(MESSAGES):
+        broker.append(TOPIC, value, key=str(index).encode())
+
+    sink = CelerySink()
+    registry = HandlerRegistry()
+    registry.register(TOPIC, sink.task("benchmark"))
+    settings = KafkaSettings(
+        kafka_brokers_tls="fake:9092",
+        kafka_group_id="benchmark",
+        kafka_consume_mode=consume_mode,
+        kafka_max_poll_records=str(batch_size),
+        kafka_batch_timeout_ms=10,
+        kafka_concurrency=4,
+    )
+    service = TimedKafkaService(settings, registry=registry)
+    service.consumer_class = broker.consumer
+    shutdown_event = asyncio.Event()
+
+    # baselines are measured with tracemalloc on as well, so its overhead does not skew the comparison
+    tracemalloc.start()
+    start = time.perf_counter()
+    task = asyncio.create_task(service.consume(shutdown_event))
+    while sink.count < MESSAGES and not task.done():
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    shutdown_event.set()
+    await task
+
+    assert sink.count == MESSAGES
+    throughput = MESSAGES / elapsed
+    print(  # noqa: T201
+        f"\n{case}: {throughput:,.0f} msg/s, "
+        f"dispatch p50 {percentile(service.latencies, 50) * 1000:.2f}ms "
+        f"p99 {percentile(service.latencies, 99) * 1000:.2f}ms, "
+        f"peak memory {peak_memory / 1024 / 1024:.1f}MiB",
+    )
+
+    measured = {
+        "throughput": round(throughput),
+        "p99_ms": round(percentile(service.latencies, 99) * 1000, 2),
+        "peak_memory_mib": round(peak_memory / 1024 / 1024, 1),
+    }
+    baselines["measured"][case] = measured
+    baseline = baselines["stored"].get(case)
+    if baseline is None:
+        if REQUIRE_BASELINES and not baselines["updating"]:
+            pytest.fail(f"{case} has no baseline, record it with BENCHMARK_UPDATE_BASELINES=1")
+        return
+
+    # memory does not depend on the speed of the machine, so its budget always applies
+    memory, memory_budget = measured["peak_memory_mib"], baseline["peak_memory_mib"] * (1 + TOLERANCE)
+    assert memory <= memory_budget, f"{case} uses too much memory: {memory} > {memory_budget:.1f} MiB"
+    if ENFORCE_TIMINGS:
+        throughput_budget = baseline["throughput"] * (1 - TOLERANCE)
+        assert throughput >= throughput_budget, f"{case} regressed: {throughput:,.0f} < {throughput_budget:,.0f} msg/s"
+        p99, p99_budget = measured["p99_ms"], baseline["p99_ms"] * (1 + TOLERANCE)
+        assert p99 <= p99_budget, f"{case} dispatch p99 regressed: {p99} > {p99_budget:.2f} ms"
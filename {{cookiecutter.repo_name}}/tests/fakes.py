@@ -0,0 +1,295 @@
+"""In-memory stand-ins for Kafka and Celery."""
+import asyncio
+import itertools
+import time
+import zlib
+from collections import defaultdict
+from typing import Any
+
+from aiokafka.abc import ConsumerRebalanceListener
+from aiokafka.structs import ConsumerRecord, RecordMetadata, TopicPartition
+from celery import Celery, Task
+
+Headers = list[tuple[str, bytes]]
+
+
+class FakeBroker:
+    """
+    In-memory Kafka cluster.
+
+    Topics are lists of partitions holding records, and committed offsets are kept per group. Consumers and
+    producers are created with `consumer` and `producer`, which take the same arguments as `AIOKafkaConsumer`
+    and `AIOKafkaProducer`.
+    """
+
+    def __init__(self, default_partitions: int = 1) -> None:
+        self.default_partitions = default_partitions
+        self.partitions: dict[str, list[list[ConsumerRecord]]] = {}
+        self.committed: dict[str | None, dict[TopicPartition, int]] = defaultdict(dict)
+        self._round_robin = itertools.count()
+        self._waiters: set[asyncio.Future] = set()
+
+    def create_topic(self, topic: str, partitions: int | None = None) -> None:
+        """Create a topic if it does not exist."""
+        self.partitions.setdefault(topic, [[] for _ in range(partitions or self.default_partitions)])
+
+    def append(
+        self,
+        topic: str,
+        value: bytes,
+        key: bytes | None = None,
+        headers: Headers | None = None,
+        partition: int | None = None,
+    ) -> RecordMetadata:
+        """
+        Write a record, picking the partition from the key hash like the Kafka default partitioner.
+
+        Returns
+        -------
+        RecordMetadata
+            metadata of the written record
+        """
+        self.create_topic(topic)
+        partitions = self.partitions[topic]
+        if partition is None:
+            seed = zlib.crc32(key) if key is not None else next(self._round_robin)
+            partition = seed % len(partitions)
+
+        log = partitions[partition]
+        timestamp = int(time.time() * 1000)
+        log.append(
+            ConsumerRecord(
+                topic,
+                partition,
+                len(log),
+                timestamp,
+                0,
+                key,
+                value,
+                None,
+                len(key) if key is not None else -1,
+                len(value),
+                tuple(headers or ()),
+            ),
+        )
+        self._notify()
+        tp = TopicPartition(topic, partition)
+        return RecordMetadata(topic, partition, tp, len(log) - 1, timestamp, 0, -1)
+
+    def records(self, topic: str) -> list[ConsumerRecord]:
+        """Return every record of a topic."""
+        return [msg for log in self.partitions.get(topic, ()) for msg in log]
+
+    def highwater(self, tp: TopicPartition) -> int:
+        """Return the offset the next record of a partition gets."""
+        return len(self.partitions[tp.topic][tp.partition])
+
+    def _notify(self) -> None:
+        """Wake up consumers waiting for records."""
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self._waiters.clear()
+
+    async def wait_for_records(self, timeout: float) -> None:
+        """Wait until a record is written, or the timeout expires."""
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except TimeoutError:
+            pass
+        finally:
+            self._waiters.discard(waiter)
+
+    def consumer(self, *_: Any, **configs: Any) -> "FakeConsumer":
+        """Create a consumer, accepting `AIOKafkaConsumer` arguments."""
+        return FakeConsumer(self, **configs)
+
+    def producer(self, *_: Any, **configs: Any) -> "FakeProducer":
+        """Create a producer, accepting `AIOKafkaProducer` arguments."""
+        return FakeProducer(self, **configs)
+
+
+class FakeConsumer:
+    """
+    `AIOKafkaConsumer` reading from a `FakeBroker`.
+
+    It is the only member of its group, so every partition of the subscribed topics is assigned to it on start.
+    """
+
+    def __init__(self, broker: FakeBroker, **configs: Any) -> None:
+        self.broker = broker
+        self.group_id = configs.get("group_id")
+        self.enable_auto_commit = configs.get("enable_auto_commit", True)
+        self.max_poll_records = configs.get("max_poll_records")
+        self._topics: list[str] = []
+        self._listener: ConsumerRebalanceListener | None = None
+        self._positions: dict[TopicPartition, int] = {}
+        self._paused: set[TopicPartition] = set()
+
+    def subscribe(self, topics: list[str], listener: ConsumerRebalanceListener | None = None) -> None:
+        """Subscribe to topics."""
+        self._topics = list(topics)
+        self._listener = listener
+
+    async def start(self) -> None:
+        """Assign every partition of the subscribed topics, starting from the committed offsets."""
+        committed = self.broker.committed[self.group_id]
+        for topic in self._topics:
+            self.broker.create_topic(topic)
+            for partition in range(len(self.broker.partitions[topic])):
+                tp = TopicPartition(topic, partition)
+                self._positions[tp] = committed.get(tp, 0)
+        if self._listener is not None:
+            await self._listener.on_partitions_assigned(self.assignment())
+
+    async def stop(self) -> None:
+        """Commit the positions when auto commit is enabled."""
+        if self.enable_auto_commit and self.group_id is not None:
+            await self.commit()
+        self._positions.clear()
+
+    async def revoke(self, partitions: set[TopicPartition]) -> None:
+        """Hand partitions over to another member of the group, as a rebalance would."""
+        if self._listener is not None:
+            await self._listener.on_partitions_revoked(partitions)
+        for tp in partitions:
+            self._positions.pop(tp, None)
+            self._paused.discard(tp)
+
+    def assignment(self) -> set[TopicPartition]:
+        """Return the assigned partitions."""
+        return set(self._positions)
+
+    def pause(self, *partitions: TopicPartition) -> None:
+        """Stop fetching from partitions."""
+        self._paused.update(partitions)
+
+    def resume(self, *partitions: TopicPartition) -> None:
+        """Fetch from partitions again."""
+        self._paused.difference_update(partitions)
+
+    def paused(self) -> set[TopicPartition]:
+        """Return the paused partitions."""
+        return set(self._paused)
+
+    def seek(self, tp: TopicPartition, offset: int) -> None:
+        """Move the position of a partition."""
+        self._positions[tp] = offset
+
+    async def position(self, tp: TopicPartition) -> int:
+        """Return the offset of the next record to fetch."""
+        return self._positions[tp]
+
+    def highwater(self, tp: TopicPartition) -> int:
+        """Return the high-water mark of a partition."""
+        return self.broker.highwater(tp)
+
+    async def commit(self, offsets: dict[TopicPartition, int] | None = None) -> None:
+        """Commit offsets, the current positions by default."""
+        self.broker.committed[self.group_id].update(offsets if offsets is not None else self._positions)
+
+    async def topics(self) -> set[str]:
+        """Return every topic of the broker."""
+        return set(self.broker.partitions)
+
+    def partitions_for_topic(self, topic: str) -> set[int] | None:
+        """Return the partitions of a topic."""
+        if topic not in self.broker.partitions:
+            return None
+        return set(range(len(self.broker.partitions[topic])))
+
+    def _fetch(self, max_records: int | None) -> dict[TopicPartition, list[ConsumerRecord]]:
+        """Return the available records of the fetchable partitions, advancing their position."""
+        remaining = max_records or self.max_poll_records or 500
+        batches: dict[TopicPartition, list[ConsumerRecord]] = {}
+        for tp, position in self._positions.items():
+            if remaining <= 0:
+                break
+            if tp in self._paused:
+                continue
+            records = self.broker.partitions[tp.topic][tp.partition][position : position + remaining]
+            if records:
+                batches[tp] = records
+                self._positions[tp] = position + len(records)
+                remaining -= len(records)
+        return batches
+
+    async def getmany(
+        self,
+        *partitions: TopicPartition,
+        timeout_ms: int = 0,
+        max_records: int | None = None,
+    ) -> dict[TopicPartition, list[ConsumerRecord]]:
+        """Return available records, waiting up to `timeout_ms` for new ones."""
+        batches = self._fetch(max_records)
+        if not batches and timeout_ms:
+            await self.broker.wait_for_records(timeout_ms / 1000)
+            batches = self._fetch(max_records)
+        if partitions:
+            return {tp: records for tp, records in batches.items() if tp in partitions}
+        return batches
+
+
+class FakeProducer:
+    """`AIOKafkaProducer` writing to a `FakeBroker`."""
+
+    def __init__(self, broker: FakeBroker, **_: Any) -> None:
+        self.broker = broker
+        self.started = False
+
+    async def start(self) -> None:
+        """Start the producer."""
+        self.started = True
+
+    async def stop(self) -> None:
+        """Stop the producer."""
+        self.started = False
+
+    async def send(
+        self,
+        topic: str,
+        value: bytes | None = None,
+        key: bytes | None = None,
+        partition: int | None = None,
+        headers: Headers | None = None,
+        **_: Any,
+    ) -> asyncio.Future:
+        """Write a record, returning a future already resolved with its metadata."""
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(self.broker.append(topic, value or b"", key=key, headers=headers, partition=partition))
+        return future
+
+    async def send_and_wait(self, topic: str, value: bytes | None = None, **kwargs: Any) -> RecordMetadata:
+        """Write a record and return its metadata."""
+        return await (await self.send(topic, value, **kwargs))
+
+
+class CelerySink:
+    """
+    Celery tasks which record their payloads instead of being published.
+
+    Tasks run eagerly in the publishing thread, so `delay` and `group(...).apply_async()` behave as with a
+    broker while costing only the Celery call overhead.
+    """
+
+    def __init__(self) -> None:
+        self.app = Celery("fake", set_as_current=False)
+        self.app.conf.task_always_eager = True
+        self.app.conf.task_store_eager_result = False
+        self.payloads: dict[str, list[Any]] = defaultdict(list)
+
+    def task(self, name: str, queue: str = "default") -> Task:
+        """Create a task recording the payloads it is called with."""
+
+        @self.app.task(name=name, queue=queue)
+        def record(payload: Any) -> None:
+            self.payloads[name].append(payload)
+
+        return record
+
+    @property
+    def count(self) -> int:
+        """Return the number of recorded payloads."""
+        return sum(len(payloads) for payloads in self.payloads.values())
@@ -0,0 +1,49 @@
+"""Test the transactional outbox."""
+from app.core.config.kafka import KafkaSettings
+from app.repositories.outbox import OutboxRepository
+from app.services.kafka.producer import KafkaProducerManager
+from app.services.outbox import OutboxRelay
+from app.services.unit_of_work import UnitOfWork
+from tests.fakes import FakeBroker
+from tests.utils import test_session_manager
+
+
+async def test_relay_publishes_committed_events_only():
+    """Committed events are published in order and removed, rolled back ones never are."""
+    async with test_session_manager.session() as session, UnitOfWork(session) as uow:
+        uow.outbox.add("Sample.Topic", b'{"id": 1}', key=b"1", headers={"source": "test"})
+        uow.outbox.add("Sample.Topic", b'{"id": 2}', key=b"2")
+        await uow.commit()
+
+        uow.outbox.add("Sample.Topic", b'{"id": 3}')
+        await uow.rollback()
+
+    broker = FakeBroker()
+    producer = KafkaProducerManager(KafkaSettings(kafka_brokers_tls="fake:9092"))
+    producer.producer_class = broker.producer
+    relay = OutboxRelay(test_session_manager, producer, batch_size=10)
+
+    assert await relay.relay_batch() == 2
+    assert await relay.relay_batch() == 0
+    records = broker.records("Sample.Topic")
+    assert [msg.value for msg in records] == [b'{"id": 1}', b'{"id": 2}']
+    assert records[0].headers == (("source", b"test"),)
+
+
+async def test_one_relay_publishes_at_a_time():
+    """A relay stands by while another one holds the relay lock, so events keep their order."""
+    async with test_session_manager.session() as session, UnitOfWork(session) as uow:
+        uow.outbox.add("Sample.Topic", b'{"id": 1}', key=b"1")
+        await uow.commit()
+
+    broker = FakeBroker()
+    producer = KafkaProducerManager(KafkaSettings(kafka_brokers_tls="fake:9092"))
+    producer.producer_class = broker.producer
+    relay = OutboxRelay(test_session_manager, producer, batch_size=10)
+
+    async with test_session_manager.session() as session, session.begin():
+        assert await OutboxRepository(session).lock_relay()
+        assert await relay.relay_batch() == 0
+
+    assert await relay.relay_batch() == 1
+    assert [msg.value for msg in broker.records("Sample.Topic")] == [b'{"id": 1}']
@@ -0,0 +1,34 @@
+"""Test the bulk writes of the SQL repositories."""
+from sqlalchemy import func, select
+
+from app.core.models import OutboxEvent
+from app.repositories.outbox import OutboxRepository
+from tests.utils import test_session_manager
+
+
+async def test_bulk_create_and_upsert():
+    """Rows are inserted in chunks, and upserted rows update the existing records by their conflict columns."""
+    async with test_session_manager.session() as session:
+        repository = OutboxRepository(session)
+        # more rows than a statement can bind
+        created = await repository.bulk_create(
+            [{"topic": "Bulk.Topic", "value": str(i).encode()} for i in range(5000)],
+        )
+        assert len(created) == 5000
+        assert len({event.id for event in created}) == 5000
+
+        upserted = await repository.bulk_upsert(
+            [
+                {"id": created[0].id, "topic": "Bulk.Topic", "value": b"updated"},
+                {"id": created[0].id, "topic": "Bulk.Topic", "value": b"updated again"},
+                {"id": created[1].id, "topic": "Other.Topic", "value": b"moved"},
+            ],
+            conflict_cols=["id"],
+        )
+        assert len(upserted) == 2
+        assert created[0].value == b"updated again"
+        assert created[1].topic == "Other.Topic"
+        count = await session.scalar(select(func.count()).where(OutboxEvent.topic == "Bulk.Topic"))
+        assert count == 4999
+        # nothing was committed, the outbox stays empty for the other tests
+        await session.rollback()
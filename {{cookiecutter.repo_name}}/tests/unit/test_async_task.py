@@ -0,0 +1,243 @@
+"""Test asyncio Celery tasks."""
+import asyncio
+import time
+from datetime import UTC, datetime, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+from billiard.exceptions import WorkerLostError
+from celery import Celery, group, signals
+from celery.app.trace import _install_stack_protection, reset_worker_optimizations
+from celery.contrib.testing.mocks import TaskMessage
+from celery.worker import state
+
+from app.services.rate_limit import MemoryTokenBucketBackend, TokenBucket, rate_limited
+from app.tasks.base import AsyncTask, BatchTask, worker_loop
+
+
+def test_async_tasks_share_the_worker_loop():
+    """Coroutines of async tasks are awaited on the same long-lived loop."""
+    app = Celery("test", set_as_current=False)
+    loops = []
+
+    @app.task(base=AsyncTask)
+    async def double(value: int) -> int:
+        loops.append(asyncio.get_running_loop())
+        return value * 2
+
+    try:
+        assert double(2) == 4
+        assert double.apply((3,)).get() == 6
+        assert loops[0] is loops[1]
+    finally:
+        worker_loop.close()
+
+
+class StubRequest:
+    """Buffered message recording how it was settled."""
+
+    def __init__(self, payload) -> None:
+        self.args = (payload,)
+        self.delivery_info = {"exchange": "", "routing_key": "batch_queue"}
+        self.settled: str | None = None
+
+    def acknowledge(self) -> None:
+        """Acknowledge the message."""
+        self.settled = "ack"
+
+    def reject(self, *, requeue: bool = False) -> None:
+        """Reject the message."""
+        self.settled = "requeue" if requeue else "reject"
+
+
+class InlinePool:
+    """Pool running targets in place."""
+
+    def apply_async(self, target, args, callback, **_):
+        """Run the target and pass its result to the callback."""
+        callback(target(*args))
+
+
+class LosingPool:
+    """Pool whose process dies while running the target."""
+
+    def apply_async(self, *_, error_callback, **__):
+        """Report the lost process to the error callback."""
+        error_callback(WorkerLostError("Worker exited prematurely: signal 9 (SIGKILL)."))
+
+
+def test_batch_task_acks_only_successful_batches():
+    """Buffered messages run as one batch, and are rejected when it fails."""
+    app = Celery("test", set_as_current=False)
+    batches = []
+
+    @app.task(base=BatchTask, flush_every=2)
+    def save(payloads):
+        if None in payloads:
+            raise ValueError("invalid payload")
+        batches.append(payloads)
+
+    save._pool = InlinePool()
+    requests = [StubRequest(1), StubRequest(2)]
+    save._buffer = list(requests)
+    save._flush()
+    assert batches == [[1, 2]]
+    assert [request.settled for request in requests] == ["ack", "ack"]
+
+    failing = [StubRequest(3), StubRequest(None)]
+    save._buffer = list(failing)
+    save._flush()
+    assert [request.settled for request in failing] == ["reject", "reject"]
+
+    save.requeue_on_failure = True
+    save._buffer = list(failing)
+    save._flush()
+    assert [request.settled for request in failing] == ["requeue", "requeue"]
+
+    app.conf.task_always_eager = True
+    save.delay(4)
+    assert batches[-1] == [4]
+
+
+def test_batch_task_sends_task_signals():
+    """Each batch sends prerun, postrun, and failure when it fails, under one id per batch."""
+    app = Celery("test", set_as_current=False)
+
+    @app.task(base=BatchTask, flush_every=2)
+    def save(payloads):
+        if None in payloads:
+            raise ValueError("invalid payload")
+
+    sent = []
+
+    def record(signal=None, sender=None, task_id=None, **kwargs):
+        if sender.name == save.name:
+            sent.append((signal.name, task_id, kwargs.get("state")))
+
+    receivers = [signals.task_prerun, signals.task_failure, signals.task_postrun]
+    for signal in receivers:
+        signal.connect(record, weak=False)
+    save._pool = InlinePool()
+    try:
+        for payloads in ([1, 2], [3, None]):
+            save._buffer = [StubRequest(payload) for payload in payloads]
+            save._flush()
+    finally:
+        for signal in receivers:
+            signal.disconnect(record)
+
+    assert [(name, state) for name, _, state in sent] == [
+        ("task_prerun", None),
+        ("task_postrun", "SUCCESS"),
+        ("task_prerun", None),
+        ("task_failure", None),
+        ("task_postrun", "FAILURE"),
+    ]
+    assert sent[0][1] == sent[1][1] != sent[2][1] == sent[3][1] == sent[4][1]
+
+
+def test_batch_task_rejects_lost_batches():
+    """Messages of a batch whose pool process died are rejected instead of staying unacknowledged."""
+    app = Celery("test", set_as_current=False)
+
+    @app.task(base=BatchTask, flush_every=2)
+    def save(_):
+        pass
+
+    save._pool = LosingPool()
+    requests = [StubRequest(1), StubRequest(2)]
+    save._buffer = list(requests)
+    save._flush()
+    assert [request.settled for request in requests] == ["reject", "reject"]
+
+
+class FakeTimer:
+    """Worker timer recording the scheduled calls."""
+
+    def __init__(self) -> None:
+        self.scheduled: list[tuple] = []
+
+    def call_at(self, eta, fun, args=(), **_):
+        """Record a call at a timestamp."""
+        self.scheduled.append((eta, fun, args))
+
+    def call_repeatedly(self, *_):
+        """Start the flush timer."""
+        return MagicMock()
+
+
+def test_batch_strategy_skips_revoked_messages_and_delays_eta_messages():
+    """Revoked messages are not run, and messages with a countdown are buffered once due."""
+    app = Celery("test", set_as_current=False)
+
+    @app.task(base=BatchTask, flush_every=10)
+    def save(_):
+        pass
+
+    consumer = MagicMock(timer=FakeTimer())
+    handler = save.Strategy(save, app, consumer)
+    received = []
+
+    def record(request=None, **_):
+        received.append(request.args[0])
+
+    signals.task_received.connect(record, weak=False)
+    revoked = TaskMessage(save.name, args=(1,))
+    state.revoked.add(revoked.headers["id"])
+    try:
+        handler(revoked, None, revoked.ack, revoked.reject)
+        message = TaskMessage(save.name, args=(2,))
+        handler(message, None, message.ack, message.reject)
+        eta = (datetime.now(UTC) + timedelta(seconds=30)).isoformat()
+        delayed = TaskMessage(save.name, args=(3,), eta=eta)
+        handler(delayed, None, delayed.ack, delayed.reject)
+    finally:
+        signals.task_received.disconnect(record)
+        state.revoked.discard(revoked.headers["id"])
+
+    assert received == [2, 3]
+    revoked.ack.assert_called_once()
+    assert [request.args[0] for request in save._buffer] == [2]
+    [(when, buffer_due, args)] = consumer.timer.scheduled
+    assert 29 < when - time.monotonic() <= 30
+    consumer.qos.increment_eventually.assert_called_once()
+
+    buffer_due(*args)
+    assert [request.args[0] for request in save._buffer] == [2, 3]
+    consumer.qos.decrement_eventually.assert_called_once()
+
+
+def test_rate_limited_batches_are_deferred_message_by_message(monkeypatch: pytest.MonkeyPatch):
+    """A batch out of tokens runs as a worker call, so its messages are published again instead of sleeping."""
+    app = Celery("test", set_as_current=False)
+    bucket = TokenBucket("batch", rate=0.01, capacity=1, backend=MemoryTokenBucketBackend())
+    batches = []
+    deferred = []
+
+    @app.task(base=BatchTask, flush_every=2)
+    @rate_limited(bucket)
+    def save(payloads):
+        batches.append(payloads)
+
+    def record(self, *_, **options):
+        deferred.append(([(signature.args, signature.options) for signature in self.tasks], options))
+
+    monkeypatch.setattr(group, "apply_async", record)
+    save._pool = InlinePool()
+    # the worker runs task bodies without pushing a request of a direct call over the one of the message
+    _install_stack_protection()
+    try:
+        for payloads in ([1, 2], [3, 4]):
+            requests = [StubRequest(payload) for payload in payloads]
+            save._buffer = list(requests)
+            save._flush()
+    finally:
+        reset_worker_optimizations(app)
+
+    assert batches == [[1, 2]]
+    [(messages, options)] = deferred
+    assert [args for args, _ in messages] == [(3,), (4,)]
+    # routed like the original messages, each with an id of its own
+    assert all(sent["queue"] == "batch_queue" and "task_id" not in sent for _, sent in messages)
+    assert options["countdown"] > 0
+    assert [request.settled for request in requests] == ["ack", "ack"]
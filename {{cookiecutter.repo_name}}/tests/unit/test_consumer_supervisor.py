@@ -0,0 +1,93 @@
+"""Test the supervisor of the consumer processes."""
+import os
+import signal
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app import consumer
+from app.consumer import HEALTHY_UPTIME_S, ConsumerSupervisor
+
+
+def test_crashed_consumers_restart_with_backoff():
+    """Restarts wait exponentially longer up to the maximum, and a healthy run resets the backoff."""
+    supervisor = ConsumerSupervisor(1, max_backoff=4)
+    crashed = SimpleNamespace(exitcode=1)
+
+    backoffs = []
+    for _ in range(5):
+        supervisor.children[0] = crashed
+        supervisor._started_at[0] = time.monotonic()
+        supervisor._reap(0, crashed)
+        backoffs.append(round(supervisor._restart_at.pop(0) - time.monotonic()))
+    assert backoffs == [0, 1, 3, 4, 4]
+
+    supervisor.children[0] = crashed
+    supervisor._started_at[0] = time.monotonic() - HEALTHY_UPTIME_S
+    supervisor._reap(0, crashed)
+    assert round(supervisor._restart_at[0] - time.monotonic()) == 0
+
+
+def test_stopping_consumers_are_not_restarted():
+    """Children stopping after a shutdown signal are reaped without restart."""
+    supervisor = ConsumerSupervisor(1)
+    supervisor._stopping = True
+    supervisor.children[0] = SimpleNamespace(exitcode=0)
+
+    supervisor._reap(0, supervisor.children[0])
+    assert supervisor.children == {}
+    assert supervisor._restart_at == {}
+
+
+def _wait_for_signal(_: int) -> None:
+    """Stand in for a consumer, running until a signal stops it."""
+    time.sleep(30)
+
+
+def test_shutdown_signal_is_forwarded_to_consumers(monkeypatch: pytest.MonkeyPatch):
+    """A signal to the supervisor stops every child, which no longer runs the forwarding handler."""
+    monkeypatch.setattr(consumer, "run_consumer", _wait_for_signal)
+    supervisor = ConsumerSupervisor(2)
+    exit_codes = []
+    reap = supervisor._reap
+
+    def record_exit(slot, process):
+        exit_codes.append(process.exitcode)
+        reap(slot, process)
+
+    monkeypatch.setattr(supervisor, "_reap", record_exit)
+    handlers = {sig: signal.getsignal(sig) for sig in consumer.SHUTDOWN_SIGNALS}
+    timer = threading.Timer(0.5, os.kill, (os.getpid(), signal.SIGTERM))
+    timer.start()
+    try:
+        supervisor.run()
+    finally:
+        timer.cancel()
+        for sig, handler in handlers.items():
+            signal.signal(sig, handler)
+
+    # children keeping the inherited handler would forward the signal instead of stopping
+    assert exit_codes == [-signal.SIGTERM, -signal.SIGTERM]
+    assert supervisor._restart_at == {}
+
+
+async def test_consumer_process_suffixes_its_static_member_id(monkeypatch: pytest.MonkeyPatch):
+    """The consumer of a supervisor slot joins the group as `<instance id>-<slot>`."""
+    member_ids = []
+
+    class StubService(consumer.KafkaService):
+        async def consume(self, _):
+            member_ids.append(self.consumer_configs["group_instance_id"])
+
+    async def noop():
+        pass
+
+    monkeypatch.setattr(consumer.tracer, "enabled", False)
+    monkeypatch.setattr(consumer, "KafkaService", StubService)
+    monkeypatch.setattr(consumer, "kafka_producer", SimpleNamespace(start=noop, stop=noop))
+    monkeypatch.setattr(consumer.settings, "kafka_group_instance_id", "consumer-7f9c")
+
+    await consumer.main(3)
+    assert member_ids == ["consumer-7f9c-3"]
@@ -0,0 +1,57 @@
+"""Test the instrumented database connection pool."""
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.util import greenlet_spawn
+
+from app.core.db.metrics import CONNECTIONS_OPENED, POOL_CHECKED_OUT, POOL_OVERFLOW, POOL_SIZE, POOL_TIMEOUTS
+from app.core.db.pool import InstrumentedAsyncPool
+
+
+def _value(metric, pool: str = "test") -> float:
+    """Return the value of a metric of a test pool."""
+    return metric.labels(pool=pool)._value.get()
+
+
+def _use_pool(pool: InstrumentedAsyncPool) -> None:
+    """Check connections out up to a timeout, then return them."""
+    first = pool.connect()
+    second = pool.connect()
+    assert _value(POOL_CHECKED_OUT) == 2
+    assert _value(POOL_OVERFLOW) == 1
+
+    with pytest.raises(PoolTimeoutError):
+        pool.connect()
+    assert _value(POOL_TIMEOUTS) == 1
+
+    second.close()
+    first.close()
+    assert _value(POOL_CHECKED_OUT) == 0
+
+
+async def test_pool_reports_usage():
+    """Connections in use, overflow and timeouts are exported as they change."""
+    pool = InstrumentedAsyncPool(MagicMock, pool_size=1, max_overflow=1, timeout=0.01, logging_name="test")
+    assert _value(POOL_SIZE) == 1
+
+    # the async engine checks connections out within a greenlet too
+    await greenlet_spawn(_use_pool, pool)
+
+
+def _connect_once(pool: InstrumentedAsyncPool) -> None:
+    """Open a connection and return it."""
+    pool.connect().close()
+
+
+async def test_recreated_pool_counts_connections_once():
+    """A pool recreated on dispose keeps counting every opened connection once."""
+    pool = InstrumentedAsyncPool(MagicMock, pool_size=1, max_overflow=0, logging_name="recreated")
+    await greenlet_spawn(_connect_once, pool)
+    assert _value(CONNECTIONS_OPENED, "recreated") == 1
+
+    for opened in range(2, 5):
+        pool.dispose()
+        pool = pool.recreate()
+        await greenlet_spawn(_connect_once, pool)
+        assert _value(CONNECTIONS_OPENED, "recreated") == opened
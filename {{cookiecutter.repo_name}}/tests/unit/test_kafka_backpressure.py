@@ -0,0 +1,111 @@
+"""Test pausing the consumer while the Celery queues are saturated."""
+from typing import Any
+
+from aiokafka.structs import TopicPartition
+
+from app.services.kafka.backpressure import BackpressureMonitor
+from tests.fakes import FakeBroker, FakeConsumer
+
+TOPIC = "Sample.Topic"
+QUEUE = "sample_queue"
+
+
+class FakeRedis:
+    """Redis answering `LLEN` from a dict of list lengths."""
+
+    def __init__(self) -> None:
+        self.lengths: dict[str, int] = {}
+
+    def pipeline(self, **_: Any) -> "FakePipeline":
+        """Start a pipeline."""
+        return FakePipeline(self)
+
+    async def aclose(self) -> None:
+        """Close the connection."""
+
+
+class FakePipeline:
+    """Pipeline queuing `LLEN` commands."""
+
+    def __init__(self, redis: FakeRedis) -> None:
+        self.redis = redis
+        self.keys: list[str] = []
+
+    async def __aenter__(self) -> "FakePipeline":
+        """Enter the pipeline."""
+        return self
+
+    async def __aexit__(self, *_: object) -> None:
+        """Leave the pipeline."""
+
+    def llen(self, key: str) -> None:
+        """Queue a `LLEN`."""
+        self.keys.append(key)
+
+    async def execute(self) -> list[int]:
+        """Return the queued list lengths."""
+        return [self.redis.lengths.get(key, 0) for key in self.keys]
+
+
+async def start_consumer(partitions: int = 2) -> FakeConsumer:
+    """Start a consumer assigned every partition of the topic."""
+    broker = FakeBroker(default_partitions=partitions)
+    consumer = broker.consumer(group_id="test")
+    consumer.subscribe([TOPIC])
+    await consumer.start()
+    return consumer
+
+
+async def test_depth_sums_the_priority_lists():
+    """Messages of every priority step of the monitored queues are counted, other queues are not."""
+    redis = FakeRedis()
+    redis.lengths = {QUEUE: 2, f"{QUEUE}:3": 5, f"{QUEUE}:9": 1, "other_queue": 100}
+    monitor = BackpressureMonitor(
+        await start_consumer(),
+        redis,
+        [QUEUE],
+        high_watermark=10,
+        low_watermark=2,
+        priority_steps=[0, 3, 9],
+    )
+
+    assert await monitor.depth() == 8
+
+
+async def test_pauses_above_high_watermark_and_resumes_under_low_watermark():
+    """The consumer stays paused between the watermarks, and resumes once the queues drained enough."""
+    consumer = await start_consumer()
+    redis = FakeRedis()
+    monitor = BackpressureMonitor(consumer, redis, [QUEUE], high_watermark=10, low_watermark=2)
+
+    redis.lengths[QUEUE] = 9
+    await monitor.check()
+    assert consumer.paused() == set()
+
+    redis.lengths[QUEUE] = 10
+    await monitor.check()
+    assert monitor.paused
+    assert consumer.paused() == consumer.assignment()
+
+    redis.lengths[QUEUE] = 5
+    await monitor.check()
+    assert consumer.paused() == consumer.assignment()
+
+    redis.lengths[QUEUE] = 2
+    await monitor.check()
+    assert not monitor.paused
+    assert consumer.paused() == set()
+
+
+async def test_partitions_assigned_while_paused_are_paused():
+    """A partition assigned while the queues are saturated is paused by the next check."""
+    consumer = await start_consumer(partitions=1)
+    redis = FakeRedis()
+    redis.lengths[QUEUE] = 20
+    monitor = BackpressureMonitor(consumer, redis, [QUEUE], high_watermark=10, low_watermark=2)
+    await monitor.check()
+
+    consumer.broker.create_topic("Other.Topic")
+    consumer.seek(TopicPartition("Other.Topic", 0), 0)
+    await monitor.check()
+    assert consumer.paused() == consumer.assignment()
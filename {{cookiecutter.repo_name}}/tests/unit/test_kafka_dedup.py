@@ -0,0 +1,140 @@
+"""Test the Kafka dedup cache."""
+import asyncio
+
+import pytest
+from aiokafka.structs import ConsumerRecord
+
+from app.core.config.kafka import KafkaSettings
+from app.services.kafka import KafkaService
+from app.services.kafka.dedup import Deduplicator, MemoryDedupCache, RedisDedupCache
+
+TOPIC = "Sample.Topic"
+
+
+def make_record(offset: int, key: bytes | None = None) -> ConsumerRecord:
+    """Build a consumed record."""
+    return ConsumerRecord(TOPIC, 0, offset, 0, 0, key, b"{}", None, 0, 2, ())
+
+
+async def test_redelivered_records_are_skipped():
+    """Records are only processed once, unless they failed."""
+    deduplicator = Deduplicator(MemoryDedupCache(ttl=60, max_size=100))
+    records = [make_record(0), make_record(1)]
+
+    assert await deduplicator.filter(records) == records
+    assert await deduplicator.filter([*records, make_record(2)]) == [make_record(2)]
+
+    await deduplicator.release([records[1]])
+    assert await deduplicator.filter(records) == [records[1]]
+
+
+async def test_memory_cache_is_bounded():
+    """The least recently seen keys are evicted, and keys expire."""
+    cache = MemoryDedupCache(ttl=60, max_size=2)
+    assert await cache.claim(["a", "b", "a", "c"]) == [True, True, False, True]
+    assert len(cache) == 2
+    assert await cache.claim(["b"]) == [True]
+
+    expired = MemoryDedupCache(ttl=0, max_size=2)
+    assert await expired.claim(["a", "a"]) == [True, True]
+
+
+class FakeRedis:
+    """Redis answering `SET NX` and `DEL` from a dict."""
+
+    def __init__(self) -> None:
+        self.keys: dict[str, object] = {}
+
+    def pipeline(self, **_: object) -> "FakePipeline":
+        """Start a pipeline."""
+        return FakePipeline(self)
+
+    async def delete(self, *names: str) -> None:
+        """Delete keys."""
+        for name in names:
+            self.keys.pop(name, None)
+
+
+class FakePipeline:
+    """Pipeline queuing `SET` commands."""
+
+    def __init__(self, redis: FakeRedis) -> None:
+        self.redis = redis
+        self.commands: list[tuple[str, object, bool]] = []
+
+    async def __aenter__(self) -> "FakePipeline":
+        """Enter the pipeline."""
+        return self
+
+    async def __aexit__(self, *_: object) -> None:
+        """Leave the pipeline."""
+
+    def set(self, name: str, value: object, *, nx: bool = False, **_: object) -> None:
+        """Queue a `SET`."""
+        self.commands.append((name, value, nx))
+
+    async def execute(self) -> list[bool | None]:
+        """Run the queued commands."""
+        results: list[bool | None] = []
+        for name, value, nx in self.commands:
+            if nx and name in self.redis.keys:
+                results.append(None)
+            else:
+                self.redis.keys[name] = value
+                results.append(True)
+        return results
+
+
+async def test_records_are_claimed_by_a_single_consumer():
+    """Consumers sharing the Redis cache, as the old and new owner of a partition, dispatch a record once."""
+    redis = FakeRedis()
+    old_owner = Deduplicator(RedisDedupCache(redis, ttl=60))
+    new_owner = Deduplicator(RedisDedupCache(redis, ttl=60))
+    records = [make_record(0), make_record(1)]
+
+    assert await old_owner.filter(records) == records
+    assert await new_owner.filter(records) == []
+
+    await old_owner.release(records[1:])
+    assert await new_owner.filter(records) == records[1:]
+
+
+async def test_key_strategy_uses_message_keys():
+    """With the key strategy, records sharing a key are duplicates."""
+    deduplicator = Deduplicator(MemoryDedupCache(ttl=60, max_size=100), strategy="key")
+    first, second, unkeyed = make_record(0, b"order-1"), make_record(1, b"order-1"), make_record(2)
+    assert await deduplicator.filter([first, second, unkeyed]) == [first, unkeyed]
+
+
+@pytest.mark.parametrize("error", [RuntimeError("publish failed"), asyncio.CancelledError()])
+async def test_records_of_an_interrupted_dispatch_are_processed_again(
+    monkeypatch: pytest.MonkeyPatch,
+    error: BaseException,
+):
+    """A dispatch raising or cancelled by the drain timeout leaves its records to the redelivery."""
+    service = KafkaService(KafkaSettings(kafka_brokers_tls="fake:9092", kafka_group_id="test"))
+    service.deduplicator = Deduplicator(MemoryDedupCache(ttl=60, max_size=100))
+    records = [make_record(0), make_record(1)]
+    dispatched = []
+
+    async def interrupted(*_):
+        raise error
+
+    async def dispatch(chunk, *_):
+        dispatched.extend(chunk)
+        return [(msg, ValueError("boom")) for msg in chunk if msg.offset == 1]
+
+    monkeypatch.setattr(service, "_dispatch", interrupted)
+    with pytest.raises(type(error)):
+        await service._process_route(TOPIC, records, None)
+
+    # without a retry policy the failed record stops the consumer, and is redelivered
+    monkeypatch.setattr(service, "_dispatch", dispatch)
+    with pytest.raises(ValueError, match="boom"):
+        await service._process_route(TOPIC, records, None)
+    assert dispatched == records
+
+    dispatched.clear()
+    with pytest.raises(ValueError, match="boom"):
+        await service._process_route(TOPIC, records, None)
+    assert dispatched == records[1:]
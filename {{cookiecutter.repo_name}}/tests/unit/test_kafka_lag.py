@@ -0,0 +1,36 @@
+"""Test exporting the lag of the Kafka consumer."""
+import pytest
+from aiokafka.structs import TopicPartition
+from prometheus_client import REGISTRY
+
+from app.services.kafka.lag import LagMonitor
+from tests.fakes import FakeBroker
+
+TOPIC = "Lag.Topic"
+
+
+def lag(partition: int) -> float | None:
+    """Return the exported lag of a partition."""
+    return REGISTRY.get_sample_value("kafka_consumer_partition_lag", {"topic": TOPIC, "partition": str(partition)})
+
+
+async def test_lag_of_assigned_partitions_is_exported(monkeypatch: pytest.MonkeyPatch):
+    """The lag is the high-water mark minus the position, and revoked partitions are no longer exported."""
+    broker = FakeBroker(default_partitions=2)
+    for index in range(7):
+        broker.append(TOPIC, b"{}", partition=index % 2)
+    consumer = broker.consumer(group_id="test")
+    consumer.subscribe([TOPIC])
+    await consumer.start()
+    consumer.seek(TopicPartition(TOPIC, 0), 1)
+    monitor = LagMonitor(consumer)
+
+    await monitor.update()
+    assert lag(0) == 3
+    assert lag(1) == 3
+
+    consumer.seek(TopicPartition(TOPIC, 1), 3)
+    monkeypatch.setattr(consumer, "assignment", lambda: {TopicPartition(TOPIC, 1)})
+    await monitor.update()
+    assert lag(0) is None
+    assert lag(1) == 0
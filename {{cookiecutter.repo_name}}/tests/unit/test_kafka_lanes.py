@@ -0,0 +1,109 @@
+"""Test Kafka processing lanes."""
+import asyncio
+
+import pytest
+from aiokafka.structs import ConsumerRecord, TopicPartition
+
+from app.services.kafka.lanes import LanePool, LaneRebalanceListener
+from app.services.kafka.offsets import OffsetCommitter
+from tests.fakes import FakeBroker
+
+
+def make_record(partition: int, offset: int, key: bytes | None = None) -> ConsumerRecord:
+    """Build a consumer record."""
+    return ConsumerRecord("Sample.Topic", partition, offset, 0, 0, key, b"{}", None, 0, 0, ())
+
+
+async def test_lanes_keep_partition_order():
+    """Records of a partition are processed in order while partitions run in parallel."""
+    processed: list[tuple[int, int]] = []
+
+    async def process(records):
+        # slow down partition 0 so partition 1 overtakes it
+        await asyncio.sleep(0.01 if records[0].partition == 0 else 0)
+        processed.extend((msg.partition, msg.offset) for msg in records)
+
+    lanes = LanePool(process, concurrency=2)
+    for offset in range(3):
+        await lanes.submit(TopicPartition("Sample.Topic", 0), [make_record(0, offset)])
+        await lanes.submit(TopicPartition("Sample.Topic", 1), [make_record(1, offset)])
+    await lanes.drain()
+
+    assert [offset for partition, offset in processed if partition == 0] == [0, 1, 2]
+    assert [offset for partition, offset in processed if partition == 1] == [0, 1, 2]
+    assert processed[0] == (1, 0)
+    assert lanes.partitions == set()
+
+
+async def test_lanes_split_by_key():
+    """The key strategy keeps ordering per key within a partition."""
+    processed: list[tuple[bytes, int]] = []
+
+    async def process(records):
+        processed.extend((msg.key, msg.offset) for msg in records)
+
+    lanes = LanePool(process, concurrency=4, strategy="key")
+    tp = TopicPartition("Sample.Topic", 0)
+    await lanes.submit(tp, [make_record(0, offset, key=b"a" if offset % 2 else b"b") for offset in range(6)])
+    await lanes.drain([tp])
+
+    assert [offset for key, offset in processed if key == b"a"] == [1, 3, 5]
+    assert [offset for key, offset in processed if key == b"b"] == [0, 2, 4]
+
+
+async def test_lanes_raise_processing_error():
+    """Errors raised by a lane surface on the consumer loop."""
+
+    async def process(_):
+        raise ValueError("Handler not found")
+
+    lanes = LanePool(process)
+    await lanes.submit(TopicPartition("Sample.Topic", 0), [make_record(0, 0)])
+    await lanes.drain()
+
+    with pytest.raises(ValueError, match="Handler not found"):
+        lanes.raise_for_error()
+
+
+async def test_drain_abandons_work_after_timeout():
+    """Draining gives up on records still processing after the deadline."""
+    processed: list[int] = []
+
+    async def process(records):
+        await asyncio.sleep(0 if records[0].offset == 0 else 10)
+        processed.extend(msg.offset for msg in records)
+
+    lanes = LanePool(process)
+    tp = TopicPartition("Sample.Topic", 0)
+    await lanes.submit(tp, [make_record(0, 0)])
+    await lanes.submit(tp, [make_record(0, 1)])
+
+    assert await lanes.drain(timeout=0.1) == {tp}
+    assert processed == [0]
+    assert lanes.partitions == set()
+
+
+async def test_revoke_commits_only_drained_partitions():
+    """Partitions still processing when the rebalance drain times out keep their committed offsets."""
+    broker = FakeBroker()
+    consumer = broker.consumer(group_id="sample-group", enable_auto_commit=False)
+    committer = OffsetCommitter(consumer)
+    fast, slow = TopicPartition("Sample.Topic", 0), TopicPartition("Sample.Topic", 1)
+
+    async def process(records):
+        tp = TopicPartition(records[0].topic, records[0].partition)
+        if tp == slow and records[0].offset > 0:
+            await asyncio.sleep(10)
+        committer.ack(tp, [msg.offset for msg in records])
+
+    lanes = LanePool(process, concurrency=2)
+    listener = LaneRebalanceListener(lanes, committer, drain_timeout=0.1)
+    for tp in (fast, slow):
+        for offset in range(2):
+            committer.track(tp, [offset])
+            await lanes.submit(tp, [make_record(tp.partition, offset)])
+
+    await listener.on_partitions_revoked({fast, slow})
+
+    assert broker.committed["sample-group"] == {fast: 2}
+    assert lanes.partitions == set()
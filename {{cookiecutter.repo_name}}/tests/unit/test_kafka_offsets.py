@@ -0,0 +1,32 @@
+"""Test Kafka offset tracking."""
+from aiokafka.structs import TopicPartition
+
+from app.services.kafka.offsets import OffsetTracker
+
+TP = TopicPartition("Sample.Topic", 0)
+
+
+def test_tracker_commits_contiguous_offsets_only():
+    """Offsets processed out of order only become committable once the gap is filled."""
+    tracker = OffsetTracker()
+    tracker.track(TP, [5, 6, 7, 8])
+
+    assert tracker.ack(TP, [6, 8]) == 0
+    assert tracker.pop_committable() == {}
+
+    assert tracker.ack(TP, [5]) == 2
+    assert tracker.pop_committable() == {TP: 7}
+
+    assert tracker.ack(TP, [7]) == 2
+    assert tracker.pop_committable() == {TP: 9}
+
+
+def test_tracker_forgets_revoked_partitions():
+    """Revoked partitions are no longer committed."""
+    tracker = OffsetTracker()
+    tracker.track(TP, [0, 1])
+    tracker.ack(TP, [0])
+    tracker.forget([TP])
+
+    assert tracker.ack(TP, [1]) == 0
+    assert tracker.pop_committable() == {}
@@ -0,0 +1,71 @@
+"""Test the process-wide Kafka producer."""
+import asyncio
+
+from app.core.config.kafka import KafkaSettings
+from app.services.kafka.producer import KafkaProducerManager, ProducerMessage
+from tests.fakes import FakeBroker, FakeProducer
+
+TOPIC = "Sample.Topic"
+
+
+def make_manager(broker: FakeBroker) -> tuple[KafkaProducerManager, list[FakeProducer]]:
+    """Build a producer manager writing to the broker, with the producers it created."""
+    created: list[FakeProducer] = []
+
+    def make_producer(**configs):
+        created.append(broker.producer(**configs))
+        return created[-1]
+
+    manager = KafkaProducerManager(KafkaSettings(kafka_brokers_tls="fake:9092"))
+    manager.producer_class = make_producer
+    return manager, created
+
+
+async def test_start_and_stop_are_idempotent():
+    """Concurrent and repeated starts share one producer, and stopping twice is harmless."""
+    manager, created = make_manager(FakeBroker())
+
+    first, second = await asyncio.gather(manager.start(), manager.start())
+    assert first is second
+    assert await manager.start() is first
+    assert len(created) == 1
+    assert manager.started
+
+    await manager.stop()
+    await manager.stop()
+    assert not manager.started
+    assert not first.started
+
+    await manager.start()
+    assert len(created) == 2
+
+
+async def test_send_starts_the_producer():
+    """Sending before `start()` starts the producer on first use."""
+    broker = FakeBroker()
+    manager, created = make_manager(broker)
+
+    metadata = await (await manager.send(TOPIC, b"first", key=b"key"))
+    await manager.send_and_wait(TOPIC, b"second", key=b"key")
+
+    assert len(created) == 1
+    assert metadata.offset == 0
+    assert [(msg.key, msg.value) for msg in broker.records(TOPIC)] == [(b"key", b"first"), (b"key", b"second")]
+    await manager.stop()
+
+
+async def test_send_many_returns_metadata_in_order():
+    """Bulk sends write every message and return their metadata in the order of the messages."""
+    broker = FakeBroker(default_partitions=2)
+    manager, _ = make_manager(broker)
+    messages = [
+        ProducerMessage(TOPIC, str(index).encode(), headers=[("index", str(index).encode())]) for index in range(5)
+    ]
+
+    written = await manager.send_many(messages)
+
+    assert [broker.partitions[TOPIC][metadata.partition][metadata.offset].value for metadata in written] == [
+        msg.value for msg in messages
+    ]
+    assert sorted(msg.headers for msg in broker.records(TOPIC)) == sorted(tuple(msg.headers) for msg in messages)
+    await manager.stop()
@@ -0,0 +1,66 @@
+"""Test Kafka handler registry and codecs."""
+import pytest
+from pydantic import BaseModel, ValidationError
+
+from app.core.config.kafka import KafkaSettings
+from app.services.kafka import KafkaService
+from app.services.kafka.codecs import get_codec, to_builtins
+from app.services.kafka.registry import HandlerRegistry, discover_handlers
+from app.tasks.simple_task import simple_task
+
+
+class SampleEvent(BaseModel):
+    """Sample event schema."""
+
+    id: int
+    name: str
+
+
+@pytest.mark.parametrize("codec", ["json", "orjson", "msgpack"])
+def test_codecs_round_trip(codec: str):
+    """Codecs decode what they encode."""
+    data = {"id": 1, "name": "sample", "tags": ["a", "b"]}
+
+    assert get_codec(codec).decode(get_codec(codec).encode(data)) == data
+
+
+@pytest.mark.parametrize("codec", ["json", "msgpack"])
+def test_handler_validates_schema(codec: str):
+    """Values are decoded and validated once by the registered handler."""
+    registry = HandlerRegistry()
+    handler = registry.register("Sample.Event", simple_task, codec=codec, schema=SampleEvent)
+    encoded = handler.codec.encode({"id": 1, "name": "sample"})
+
+    assert to_builtins(handler.decode(encoded)) == {"id": 1, "name": "sample"}
+    with pytest.raises(ValidationError):
+        handler.decode(handler.codec.encode({"id": "not a number"}))
+
+
+def test_registry_rejects_second_handler_for_topic():
+    """A topic can only have one handler."""
+    registry = HandlerRegistry()
+    registry.register("Sample.Event", simple_task)
+
+    with pytest.raises(ValueError, match="already handled"):
+        registry.register("Sample.Event", object())
+
+
+def test_discover_handlers_finds_tasks():
+    """Decorated tasks are registered when their module is discovered."""
+    handler = discover_handlers().get("Sample.Topic")
+
+    assert handler is not None
+    assert handler.handler is simple_task
+    assert handler.codec.name == "orjson"
+
+
+def test_topic_queue_and_priority_override_the_task():
+    """Tasks of a topic are published with its queue and priority, and the consumer watches that queue."""
+    registry = HandlerRegistry()
+    registry.register("Sample.Event", simple_task)
+    urgent = registry.register("Urgent.Event", simple_task, queue="realtime_queue", priority=0)
+    service = KafkaService(KafkaSettings(kafka_brokers_tls="fake:9092"), registry=registry)
+
+    assert registry.get("Sample.Event").publish_options == {}
+    assert urgent.publish_options == {"queue": "realtime_queue", "priority": 0}
+    assert service.dispatch_queues == {simple_task.queue, "realtime_queue"}
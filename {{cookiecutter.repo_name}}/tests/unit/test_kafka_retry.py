@@ -0,0 +1,145 @@
+"""Test Kafka retry topics."""
+import asyncio
+import time
+
+import orjson
+import pytest
+from aiokafka.structs import ConsumerRecord, TopicPartition
+
+from app.core.config.kafka import KafkaSettings
+from app.services.kafka import KafkaService, service
+from app.services.kafka.pauses import BACKPRESSURE, PauseRegistry
+from app.services.kafka.producer import KafkaProducerManager
+from app.services.kafka.registry import HandlerRegistry
+from app.services.kafka.retry import (
+    ATTEMPT_HEADER,
+    NOT_BEFORE_HEADER,
+    ORIGINAL_TOPIC_HEADER,
+    RetryGate,
+    RetryPolicy,
+    RetryTier,
+    parse_tiers,
+)
+from tests.fakes import FakeBroker, FakeConsumer
+from tests.unit.test_kafka_service import consume_until
+
+TOPIC = "Sample.Topic"
+RETRY_TOPIC = f"{TOPIC}.retry.1m"
+RETRY_TP = TopicPartition(RETRY_TOPIC, 0)
+
+
+def make_record(topic: str, headers=(), offset: int = 0) -> ConsumerRecord:
+    """Build a consumed record."""
+    return ConsumerRecord(topic, 0, offset, 0, 0, b"key", b"value", None, 5, 5, tuple(headers))
+
+
+def due_in(offset: int, seconds: float) -> ConsumerRecord:
+    """Build a record of the retry topic to process again in `seconds`."""
+    not_before = int((time.time() + seconds) * 1000)
+    return make_record(RETRY_TOPIC, [(NOT_BEFORE_HEADER, str(not_before).encode())], offset)
+
+
+async def start_consumer() -> FakeConsumer:
+    """Start a consumer assigned the retry topic."""
+    consumer = FakeBroker().consumer(group_id="test")
+    consumer.subscribe([RETRY_TOPIC])
+    await consumer.start()
+    return consumer
+
+
+def test_parse_tiers():
+    """Tiers are parsed from durations."""
+    assert parse_tiers("30s, 1m,2h") == [RetryTier("30s", 30), RetryTier("1m", 60), RetryTier("2h", 7200)]
+    with pytest.raises(ValueError, match="Invalid retry tier"):
+        parse_tiers("1d")
+
+
+def test_failed_records_go_through_tiers_then_dlq():
+    """Each failure moves the record to the next tier, and to the dead-letter topic after the last one."""
+    policy = RetryPolicy(["Sample.Topic"], parse_tiers("1m,10m"))
+
+    first = policy.next_message(make_record("Sample.Topic"), ValueError("boom"))
+    assert first.topic == "Sample.Topic.retry.1m"
+    assert (ATTEMPT_HEADER, b"1") in first.headers
+    assert (ORIGINAL_TOPIC_HEADER, b"Sample.Topic") in first.headers
+
+    second = policy.next_message(make_record(first.topic, first.headers), ValueError("boom"))
+    assert second.topic == "Sample.Topic.retry.10m"
+    assert policy.source_topic(second.topic) == "Sample.Topic"
+
+    last = policy.next_message(make_record(second.topic, second.headers), ValueError("boom"))
+    assert last.topic == "Sample.Topic.dlq"
+    assert (ATTEMPT_HEADER, b"3") in last.headers
+    assert last.key == b"key"
+    assert last.value == b"value"
+
+
+async def test_gate_holds_back_records_until_due():
+    """The partition is rewound to the first record not due yet, and paused until it is."""
+    consumer = await start_consumer()
+    gate = RetryGate(consumer, RetryPolicy([TOPIC], parse_tiers("1m")))
+    records = [due_in(0, -1), due_in(1, 0.1), due_in(2, 0.1)]
+
+    assert gate.admit(RETRY_TP, records) == records[:1]
+    assert await consumer.position(RETRY_TP) == 1
+    assert consumer.paused() == {RETRY_TP}
+
+    await asyncio.sleep(0.05)
+    assert consumer.paused() == {RETRY_TP}
+    await asyncio.sleep(0.1)
+    assert consumer.paused() == set()
+
+
+async def test_gate_and_backpressure_do_not_resume_each_other():
+    """A partition held by the gate and by backpressure resumes once both released it."""
+    consumer = await start_consumer()
+    pauses = PauseRegistry(consumer)
+    gate = RetryGate(consumer, RetryPolicy([TOPIC], parse_tiers("1m")), pauses)
+
+    gate.admit(RETRY_TP, [due_in(0, 0.05)])
+    pauses.pause(BACKPRESSURE, *consumer.assignment())
+    await asyncio.sleep(0.1)
+    assert consumer.paused() == {RETRY_TP}
+
+    pauses.resume(BACKPRESSURE, *consumer.assignment())
+    assert consumer.paused() == set()
+
+    pauses.pause(BACKPRESSURE, RETRY_TP)
+    gate.admit(RETRY_TP, [due_in(0, 60)])
+    pauses.resume(BACKPRESSURE, RETRY_TP)
+    assert consumer.paused() == {RETRY_TP}
+
+
+async def test_failing_records_end_in_the_dead_letter_topic(monkeypatch: pytest.MonkeyPatch):
+    """A record failing every attempt is republished through the retry topics, then to the dead-letter topic."""
+    broker = FakeBroker()
+    broker.append(TOPIC, orjson.dumps({"index": 1}), key=b"key")
+    producer = KafkaProducerManager(KafkaSettings(kafka_brokers_tls="fake:9092"))
+    producer.producer_class = broker.producer
+    monkeypatch.setattr(service, "kafka_producer", producer)
+
+    attempts = []
+
+    async def fail(value: dict) -> None:
+        attempts.append(value)
+        raise ValueError("boom")
+
+    registry = HandlerRegistry()
+    registry.register(TOPIC, fail)
+    settings = KafkaSettings(
+        kafka_brokers_tls="fake:9092",
+        kafka_group_id="test",
+        kafka_retry_enabled=True,
+        kafka_retry_tiers="0s,0s",
+    )
+    kafka_service = KafkaService(settings, registry=registry)
+    kafka_service.consumer_class = broker.consumer
+
+    await consume_until(kafka_service, lambda: broker.records(f"{TOPIC}.dlq"))
+
+    assert attempts == [{"index": 1}] * 3
+    assert [msg.topic for msg in broker.records(f"{TOPIC}.retry.0s")] == [f"{TOPIC}.retry.0s"] * 2
+    [dead] = broker.records(f"{TOPIC}.dlq")
+    assert dead.key == b"key"
+    assert (ATTEMPT_HEADER, b"3") in dead.headers
+    assert (ORIGINAL_TOPIC_HEADER, TOPIC.encode()) in dead.headers
@@ -0,0 +1,37 @@
+"""Test routing Kafka records by headers and key."""
+import pytest
+from aiokafka.structs import ConsumerRecord
+from pydantic import ValidationError
+
+from app.core.config.kafka import KafkaRouteRule
+from app.services.kafka.routing import Router
+
+
+def make_record(offset: int, key: bytes | None = None, headers=(), topic: str = "Sample.Topic") -> ConsumerRecord:
+    """Build a consumed record."""
+    return ConsumerRecord(topic, 0, offset, 0, 0, key, b"not decoded", None, 0, 0, tuple(headers))
+
+
+def test_router_drops_and_routes_records():
+    """The first matching rule applies, unmatched records keep the handler queue."""
+    router = Router(
+        [
+            KafkaRouteRule(headers={"event-type": "heartbeat"}, action="drop"),
+            KafkaRouteRule(topic="Sample.Topic", key="vip-*", queue="priority_queue"),
+            KafkaRouteRule(topic="Other.Topic", action="drop"),
+        ],
+    )
+    heartbeat = make_record(0, b"vip-1", headers=[("event-type", b"heartbeat")])
+    vip = make_record(1, b"vip-2", headers=[("event-type", b"order")])
+    regular = make_record(2, b"regular")
+    unkeyed = make_record(3)
+
+    assert router.split([heartbeat, vip, regular, unkeyed]) == {"priority_queue": [vip], None: [regular, unkeyed]}
+    assert router.match(make_record(4, topic="Other.Topic")).action == "drop"
+    assert router.queues == {"priority_queue"}
+
+
+def test_route_rule_requires_queue():
+    """Routing rules must name their queue."""
+    with pytest.raises(ValidationError, match="queue is required"):
+        KafkaRouteRule(key="vip-*")
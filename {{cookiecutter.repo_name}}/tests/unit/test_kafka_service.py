@@ -0,0 +1,234 @@
+"""Test consuming with the in-memory Kafka broker."""
+import asyncio
+
+import orjson
+import pytest
+from aiokafka.coordinator.assignors.range import RangePartitionAssignor
+from aiokafka.coordinator.assignors.sticky.sticky_assignor import StickyPartitionAssignor
+from aiokafka.structs import ConsumerRecord, TopicPartition
+
+from app.core.config.kafka import KafkaSettings
+from app.services.kafka import KafkaService, service
+from app.services.kafka.lanes import LanePool
+from app.services.kafka.producer import KafkaProducerManager
+from app.services.kafka.registry import HandlerRegistry
+from tests.fakes import CelerySink, FakeBroker
+
+TOPIC = "Sample.Topic"
+
+
+def make_record(offset: int, key: bytes | None = None, topic: str = TOPIC) -> ConsumerRecord:
+    """Build a consumed record of partition 0."""
+    value = orjson.dumps({"index": offset})
+    return ConsumerRecord(topic, 0, offset, 0, 0, key, value, None, len(key or b""), len(value), ())
+
+
+async def consume_until(service: KafkaService, done, timeout: float = 5) -> None:
+    """Run the consumer until `done()` holds."""
+    shutdown_event = asyncio.Event()
+    task = asyncio.create_task(service.consume(shutdown_event))
+    async with asyncio.timeout(timeout):
+        while not done():
+            await asyncio.sleep(0.01)
+    shutdown_event.set()
+    await task
+
+
+@pytest.mark.parametrize("consume_mode", ["message", "batch"])
+@pytest.mark.parametrize("commit_mode", ["auto", "manual"])
+async def test_consume_dispatches_records_in_order(consume_mode: str, commit_mode: str):
+    """Every record is dispatched once, in partition order, and its offset committed."""
+    broker = FakeBroker(default_partitions=2)
+    for index in range(50):
+        broker.append(TOPIC, orjson.dumps({"index": index}), key=str(index % 5).encode())
+
+    sink = CelerySink()
+    registry = HandlerRegistry()
+    registry.register(TOPIC, sink.task("sample"))
+    settings = KafkaSettings(
+        kafka_brokers_tls="fake:9092",
+        kafka_group_id="test",
+        kafka_consume_mode=consume_mode,
+        kafka_commit_mode=commit_mode,
+        kafka_max_poll_records="7",
+        kafka_concurrency=2,
+    )
+    service = KafkaService(settings, registry=registry)
+    service.consumer_class = broker.consumer
+
+    await consume_until(service, lambda: sink.count == 50)
+
+    for partition in broker.partitions[TOPIC]:
+        expected = [orjson.loads(msg.value) for msg in partition]
+        dispatched = [payload for payload in sink.payloads["sample"] if payload in expected]
+        assert dispatched == expected
+    assert sum(broker.committed["test"].values()) == 50
+
+
+async def test_records_of_partitions_revoked_while_fetching_are_dropped(monkeypatch: pytest.MonkeyPatch):
+    """A partition revoked while earlier partitions of the same fetch were submitted does not get a lane."""
+    broker = FakeBroker(default_partitions=2)
+    for partition in range(2):
+        broker.append(TOPIC, b"{}", partition=partition)
+    settings = KafkaSettings(kafka_brokers_tls="fake:9092", kafka_group_id="test")
+    service = KafkaService(settings, registry=HandlerRegistry())
+    consumer = broker.consumer(group_id="test")
+    consumer.subscribe([TOPIC])
+    await consumer.start()
+
+    processed: list[int] = []
+
+    async def process(records):
+        processed.extend(msg.partition for msg in records)
+
+    lanes = LanePool(process, concurrency=2)
+    submit = lanes.submit
+
+    async def submit_then_revoke(tp, records):
+        await submit(tp, records)
+        await consumer.revoke({TopicPartition(TOPIC, 1)})
+
+    monkeypatch.setattr(lanes, "submit", submit_then_revoke)
+    await service._fetch(consumer, lanes, settings, asyncio.get_running_loop().create_future())
+
+    assert lanes.partitions == {TopicPartition(TOPIC, 0)}
+    await lanes.drain()
+    assert processed == [0]
+
+
+def test_consumer_configs_use_sticky_assignment_and_static_membership(monkeypatch: pytest.MonkeyPatch):
+    """Sticky assignment falls back to range, and consumer processes of a pod get distinct member ids."""
+    monkeypatch.delenv("POD_NAME", raising=False)
+    settings = KafkaSettings(kafka_brokers_tls="fake:9092", kafka_group_id="test")
+
+    configs = KafkaService(settings, registry=HandlerRegistry()).consumer_configs
+    assert configs["partition_assignment_strategy"] == (StickyPartitionAssignor, RangePartitionAssignor)
+    assert "group_instance_id" not in configs
+
+    monkeypatch.setenv("POD_NAME", "consumer-7f9c")
+    configs = KafkaService(settings, registry=HandlerRegistry(), instance_index=2).consumer_configs
+    assert configs["group_instance_id"] == "consumer-7f9c-2"
+
+
+async def test_revoked_partitions_commit_their_drained_offsets():
+    """In manual commit mode, a revoked partition commits its dispatched records before changing owner."""
+    broker = FakeBroker(default_partitions=2)
+    for index in range(10):
+        broker.append(TOPIC, orjson.dumps({"index": index}), partition=index % 2)
+    consumers = []
+
+    def make_consumer(**configs):
+        consumers.append(broker.consumer(**configs))
+        return consumers[-1]
+
+    sink = CelerySink()
+    registry = HandlerRegistry()
+    registry.register(TOPIC, sink.task("sample"))
+    # neither the size nor the time threshold commits while the test runs
+    settings = KafkaSettings(
+        kafka_brokers_tls="fake:9092",
+        kafka_group_id="test",
+        kafka_commit_mode="manual",
+        kafka_commit_interval_ms=60000,
+    )
+    service = KafkaService(settings, registry=registry)
+    service.consumer_class = make_consumer
+
+    shutdown_event = asyncio.Event()
+    task = asyncio.create_task(service.consume(shutdown_event))
+    async with asyncio.timeout(5):
+        while sink.count < 10:
+            await asyncio.sleep(0.01)
+    await consumers[0].revoke({TopicPartition(TOPIC, 0)})
+
+    assert broker.committed["test"][TopicPartition(TOPIC, 0)] == 5
+    shutdown_event.set()
+    await task
+
+
+async def test_async_handlers_share_the_concurrency_bound():
+    """Records with distinct keys run concurrently, but never more than `kafka_async_handler_concurrency`."""
+    running, peak = 0, 0
+
+    async def handle(_: dict) -> None:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    registry = HandlerRegistry()
+    registry.register(TOPIC, handle)
+    settings = KafkaSettings(kafka_brokers_tls="fake:9092", kafka_async_handler_concurrency=2)
+    kafka_service = KafkaService(settings, registry=registry)
+
+    failures = await kafka_service._dispatch([make_record(offset, key=bytes([offset])) for offset in range(6)])
+
+    assert failures == []
+    assert peak == 2
+
+
+async def test_async_handlers_keep_the_order_of_a_key():
+    """Records sharing a key are handled one after another, while other keys overtake them."""
+    handled: list[tuple[bytes, int]] = []
+
+    async def handle(value: dict) -> None:
+        # the records of key "a" are slower, so those of key "b" finish first
+        await asyncio.sleep(0.01 if value["index"] % 2 == 0 else 0)
+        handled.append((b"a" if value["index"] % 2 == 0 else b"b", value["index"]))
+
+    registry = HandlerRegistry()
+    registry.register(TOPIC, handle)
+    settings = KafkaSettings(kafka_brokers_tls="fake:9092", kafka_async_handler_concurrency=10)
+    kafka_service = KafkaService(settings, registry=registry)
+
+    records = [make_record(offset, key=b"a" if offset % 2 == 0 else b"b") for offset in range(6)]
+    await kafka_service._dispatch(records)
+
+    assert [index for key, index in handled if key == b"a"] == [0, 2, 4]
+    assert [index for key, index in handled if key == b"b"] == [1, 3, 5]
+    assert handled[:3] == [(b"b", 1), (b"b", 3), (b"b", 5)]
+
+
+async def test_async_handler_timeouts_are_retried(monkeypatch: pytest.MonkeyPatch):
+    """A handler running past its timeout fails the record, which goes to the retry topic or stops the consumer."""
+    broker = FakeBroker()
+    producer = KafkaProducerManager(KafkaSettings(kafka_brokers_tls="fake:9092"))
+    producer.producer_class = broker.producer
+    monkeypatch.setattr(service, "kafka_producer", producer)
+
+    async def hang(_: dict) -> None:
+        await asyncio.sleep(10)
+
+    registry = HandlerRegistry()
+    registry.register(TOPIC, hang, timeout=0.01)
+    settings = KafkaSettings(kafka_brokers_tls="fake:9092", kafka_retry_enabled=True, kafka_retry_tiers="1m")
+
+    await KafkaService(settings, registry=registry)._process_route(TOPIC, [make_record(0, key=b"key")], None)
+    [retried] = broker.records(f"{TOPIC}.retry.1m")
+    assert retried.key == b"key"
+
+    settings = KafkaSettings(kafka_brokers_tls="fake:9092")
+    with pytest.raises(TimeoutError):
+        await KafkaService(settings, registry=registry)._process_route(TOPIC, [make_record(0)], None)
+
+
+async def test_topics_without_async_handler_are_published_to_celery():
+    """Only topics with an `async def` handler run in the consumer, Celery tasks are still published."""
+    handled: list[dict] = []
+
+    async def handle(value: dict) -> None:
+        handled.append(value)
+
+    sink = CelerySink()
+    registry = HandlerRegistry()
+    registry.register(TOPIC, handle)
+    registry.register("Other.Topic", sink.task("other"))
+    kafka_service = KafkaService(KafkaSettings(kafka_brokers_tls="fake:9092"), registry=registry)
+
+    await kafka_service._dispatch([make_record(0)])
+    await kafka_service._dispatch([make_record(1, topic="Other.Topic")])
+
+    assert handled == [{"index": 0}]
+    assert sink.payloads == {"other": [{"index": 1}]}
+    assert set(kafka_service.handlers) == {"Other.Topic"}
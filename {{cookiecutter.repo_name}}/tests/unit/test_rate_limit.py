@@ -0,0 +1,48 @@
+"""Test the token bucket rate limiter."""
+import time
+
+import pytest
+from celery import Celery
+
+from app.services.rate_limit import MemoryTokenBucketBackend, RateLimitError, TokenBucket, rate_limited
+
+
+def test_bucket_bursts_up_to_capacity_then_refills_at_rate():
+    """Tokens are taken until the bucket is empty, then the wait matches the refill rate."""
+    bucket = TokenBucket("test", rate=10, capacity=3, backend=MemoryTokenBucketBackend())
+
+    assert [bucket.take() for _ in range(3)] == [0, 0, 0]
+    assert bucket.take() == pytest.approx(0.1, abs=0.01)
+    with pytest.raises(ValueError, match="Cannot take"):
+        bucket.take(4)
+
+
+async def test_limit_waits_for_tokens():
+    """The context manager waits for tokens, or raises when they would take longer than allowed."""
+    bucket = TokenBucket("test", rate=50, capacity=1, backend=MemoryTokenBucketBackend())
+
+    start = time.monotonic()
+    async with bucket.limit():
+        pass
+    async with bucket.limit():
+        pass
+    assert time.monotonic() - start >= 0.015
+
+    with pytest.raises(RateLimitError):
+        async with bucket.limit(max_wait=0):
+            pass
+
+
+def test_rate_limited_eager_task_waits_for_tokens():
+    """Outside a worker the task waits for its tokens instead of being deferred."""
+    app = Celery("test", set_as_current=False)
+    app.conf.task_always_eager = True
+    bucket = TokenBucket("test", rate=100, capacity=1, backend=MemoryTokenBucketBackend())
+
+    @app.task
+    @rate_limited(bucket)
+    def double(value: int) -> int:
+        return value * 2
+
+    assert [double.delay(value).result for value in range(3)] == [0, 2, 4]
+    assert double(3) == 6
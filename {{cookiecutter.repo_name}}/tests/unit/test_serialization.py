@@ -0,0 +1,75 @@
+"""Test the serialization of Celery messages."""
+import os
+import uuid
+from datetime import UTC, date, datetime, time
+from decimal import Decimal
+
+import pytest
+
+from app.utils.serialization import CLAIM_CHECK, COMPRESSED, RAW, ClaimCheckError, ClaimCheckStore, MessageCodec
+
+
+class MemoryStore(ClaimCheckStore):
+    """Claim-check store keeping bodies in a dict."""
+
+    def __init__(self) -> None:
+        super().__init__("redis://unused")
+        self.bodies: dict[bytes, bytes] = {}
+
+    def put(self, data: bytes) -> bytes:
+        """Store a body."""
+        key = f"{self.prefix}{len(data)}".encode()
+        self.bodies[key] = data
+        return key
+
+    def get(self, key: bytes) -> bytes:
+        """Return a stored body."""
+        if key not in self.bodies:
+            raise ClaimCheckError(key)
+        return self.bodies[key]
+
+
+def test_small_bodies_are_plain_msgpack():
+    """Bodies under the thresholds are neither compressed nor claim-checked."""
+    codec = MessageCodec(compress_above=1024, claim_check_above=4096, store=MemoryStore())
+    body = ([{"id": 1}], {}, {"callbacks": None})
+    encoded = codec.dumps(body)
+    assert encoded[:1] == RAW
+    assert codec.loads(encoded) == [[{"id": 1}], {}, {"callbacks": None}]
+
+
+def test_large_bodies_are_compressed_then_claim_checked():
+    """Large bodies are compressed, and only referenced when still above the claim-check threshold."""
+    store = MemoryStore()
+    compressible = [["x" * 10_000], {}, {}]
+    incompressible = [[os.urandom(16_384)], {}, {}]
+
+    codec = MessageCodec(compress_above=1024, claim_check_above=4096, store=store)
+    encoded = codec.dumps(compressible)
+    assert encoded[:1] == COMPRESSED
+    assert codec.loads(encoded) == compressible
+
+    encoded = codec.dumps(incompressible)
+    assert encoded == CLAIM_CHECK + next(iter(store.bodies))
+    assert codec.loads(encoded) == incompressible
+
+    store.bodies.clear()
+    with pytest.raises(ClaimCheckError):
+        codec.loads(encoded)
+
+
+def test_values_supported_by_json_round_trip():
+    """Datetimes, dates, times, UUIDs and decimals decode to the values which were sent."""
+    codec = MessageCodec()
+    values = {
+        "naive": datetime(2024, 5, 1, 12, 30, 15, 250),  # noqa: DTZ001
+        "aware": datetime(2024, 5, 1, 12, 30, tzinfo=UTC),
+        "date": date(2024, 5, 1),
+        "time": time(12, 30),
+        "id": uuid.uuid4(),
+        "amount": Decimal("12.30"),
+    }
+    assert codec.loads(codec.dumps([[values], {}, {}])) == [[values], {}, {}]
+
+    with pytest.raises(TypeError, match="Cannot serialize"):
+        codec.dumps([[object()], {}, {}])
@@ -0,0 +1,69 @@
+"""Test the metrics recorded by the Celery signal handlers of the worker."""
+import time
+from datetime import UTC, datetime
+from types import SimpleNamespace
+
+from celery import Celery
+from prometheus_client import REGISTRY
+
+from app import worker
+from app.utils.metrics import ENQUEUED_AT_HEADER
+
+app = Celery("test", set_as_current=False)
+
+
+@app.task(name="metrics.sample")
+def sample() -> None:
+    """Run for a little while."""
+    time.sleep(0.02)
+
+
+def sample_value(name: str, **labels: str) -> float:
+    """Return the value of a metric sample, 0 before the first observation."""
+    return REGISTRY.get_sample_value(name, {"task": sample.name, **labels}) or 0
+
+
+def run_in_worker(**headers: object) -> None:
+    """Run the task through its signal handlers, with message headers in its request as a worker would."""
+    sample.push_request(id="task-id", **headers)
+    try:
+        worker.on_task_prerun("task-id", sample)
+        sample()
+        worker.on_task_postrun("task-id", sample, state="SUCCESS")
+    finally:
+        sample.pop_request()
+
+
+def test_eager_run_records_the_runtime():
+    """Tasks run eagerly only record their runtime, as no message was published for them."""
+    runs = sample_value("celery_task_runtime_seconds_count", state="SUCCESS")
+    waits = sample_value("celery_task_queue_wait_seconds_count")
+
+    sample.apply()
+
+    assert sample_value("celery_task_runtime_seconds_count", state="SUCCESS") == runs + 1
+    assert sample_value("celery_task_runtime_seconds_bucket", state="SUCCESS", le="0.01") == 0
+    assert sample_value("celery_task_queue_wait_seconds_count") == waits
+
+
+def test_queue_wait_starts_at_publishing_or_eta():
+    """The wait is measured from the published time, or from the ETA of a scheduled task."""
+    headers: dict = {}
+    worker.on_before_task_publish(headers=headers)
+    headers[ENQUEUED_AT_HEADER] -= 30
+    waited = sample_value("celery_task_queue_wait_seconds_sum")
+
+    run_in_worker(**headers, eta=None)
+    assert 30 <= sample_value("celery_task_queue_wait_seconds_sum") - waited < 31
+
+    waited = sample_value("celery_task_queue_wait_seconds_sum")
+    eta = datetime.fromtimestamp(time.time() - 5, UTC).isoformat()
+    run_in_worker(**headers, eta=eta)
+    assert 5 <= sample_value("celery_task_queue_wait_seconds_sum") - waited < 6
+
+
+def test_payload_size_is_recorded():
+    """The size of received message bodies is observed per task."""
+    size = sample_value("celery_task_payload_bytes_sum")
+    worker.on_task_received(SimpleNamespace(task_name=sample.name, body=b"x" * 300))
+    assert sample_value("celery_task_payload_bytes_sum") == size + 300